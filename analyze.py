@@ -5,12 +5,178 @@ Strava Activity Analysis with DuckDB
 Loads Strava activity data into DuckDB for analysis and visualization.
 """
 
+import argparse
+import hashlib
 import json
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
 import duckdb
 
+from dashboard import DashboardRegistry, record_table_version
+from snapshot import (
+    current_snapshot,
+    input_state,
+    is_up_to_date,
+    prepare_in_place,
+    prepare_staging,
+    publish,
+    published_path,
+    restamp_load_state,
+    retire_current,
+    save_load_state,
+)
+from tracing import tracer
+
+# Default heart rate zones as (zone, label, lower bound in bpm). Each zone runs
+# up to the next zone's lower bound. Copied per athlete into hr_zone_thresholds,
+# where they can be edited to match personal zones.
+DEFAULT_HR_ZONES = [
+    (1, "Zone 1 (Recovery)", 0),
+    (2, "Zone 2 (Aerobic)", 130),
+    (3, "Zone 3 (Tempo)", 145),
+    (4, "Zone 4 (Threshold)", 160),
+    (5, "Zone 5 (VO2Max)", 175),
+]
+
+# Metrics aggregated into the daily rollup cube, as rollup column prefix ->
+# activities column. Each gets _n, _sum, _sumsq, _min and _max columns.
+ROLLUP_METRICS = {
+    "distance": "distance",
+    "moving_time": "moving_time",
+    "elevation": "total_elevation_gain",
+    "heartrate": "average_heartrate",
+    "max_heartrate": "max_heartrate",
+    "suffer_score": "suffer_score",
+}
+
+# Foot sports whose streams get a grade-adjusted pace
+GAP_SPORTS = ["Run", "TrailRun", "VirtualRun", "Walk", "Hike"]
+
+# Length in meters of the stream segments a grade is measured over. Shorter
+# segments follow the terrain more closely but amplify altitude noise.
+GAP_SEGMENT_METERS = 50
+
+# Split lengths in meters stored in activity_splits
+SPLIT_UNITS = {"km": 1000.0, "mile": 1609.344}
+
+# Default mileage alerts in km per gear kind. Copied into gear_thresholds,
+# where they can be edited.
+DEFAULT_GEAR_THRESHOLDS_KM = {
+    "shoe": [500, 700, 900],
+    "bike": [5000, 10000, 20000],
+}
+
+# Features describing an activity for similarity search, as name -> SQL
+# expression over activities (a), activity_gap (g), heart rate zone shares (z)
+# and km split pacing (sp). Each is standardized per sport type before use.
+ACTIVITY_FEATURES = {
+    "distance": "ln(1 + a.distance)",
+    "moving_time": "ln(1 + a.moving_time)",
+    "elevation_gain": "ln(1 + a.total_elevation_gain)",
+    "climb_rate": "a.total_elevation_gain / NULLIF(a.distance, 0) * 1000",
+    "speed": "a.average_speed",
+    "gap_speed": "COALESCE(g.gap_speed, a.average_speed)",
+    "heartrate": "a.average_heartrate",
+    "max_heartrate": "a.max_heartrate",
+    "hard_zone_share": "z.hard_share",
+    "pace_variability": "sp.variability",
+}
+
+# Persisted feature vectors built from a different feature set are discarded
+FEATURES_VERSION = hashlib.sha256(json.dumps(ACTIVITY_FEATURES).encode()).hexdigest()
+
+# Lloyd iterations when clustering feature vectors into the IVF index
+KMEANS_ITERATIONS = 6
+
+# A sport type's feature scaling and clusters are retrained once it has this
+# many times the activities they were trained on. In between, new and changed
+# activities are only scaled and assigned to their nearest cluster.
+FEATURE_RETRAIN_GROWTH = 1.5
+
+# Activity fields read from the exports, as a json_transform structure: each
+# becomes an activities column, except the lat/lng pairs, the athlete (kept as
+# athlete_id and in athletes) and the map (kept in activity_maps)
+EXPORT_FIELDS: Dict[str, Any] = {
+    "id": "BIGINT",
+    "name": "VARCHAR",
+    "distance": "DOUBLE",
+    "moving_time": "INTEGER",
+    "elapsed_time": "INTEGER",
+    "total_elevation_gain": "DOUBLE",
+    "type": "VARCHAR",
+    "sport_type": "VARCHAR",
+    "workout_type": "INTEGER",
+    "start_date": "TIMESTAMP",
+    "start_date_local": "TIMESTAMP",
+    "timezone": "VARCHAR",
+    "utc_offset": "INTEGER",
+    "location_city": "VARCHAR",
+    "location_state": "VARCHAR",
+    "location_country": "VARCHAR",
+    "achievement_count": "INTEGER",
+    "kudos_count": "INTEGER",
+    "comment_count": "INTEGER",
+    "athlete_count": "INTEGER",
+    "photo_count": "INTEGER",
+    "trainer": "BOOLEAN",
+    "commute": "BOOLEAN",
+    "manual": "BOOLEAN",
+    "private": "BOOLEAN",
+    "flagged": "BOOLEAN",
+    "gear_id": "VARCHAR",
+    "start_latlng": ["DOUBLE"],
+    "end_latlng": ["DOUBLE"],
+    "average_speed": "DOUBLE",
+    "max_speed": "DOUBLE",
+    "average_cadence": "DOUBLE",
+    "average_temp": "INTEGER",
+    "average_watts": "DOUBLE",
+    "max_watts": "INTEGER",
+    "weighted_average_watts": "INTEGER",
+    "device_watts": "BOOLEAN",
+    "kilojoules": "DOUBLE",
+    "has_heartrate": "BOOLEAN",
+    "average_heartrate": "DOUBLE",
+    "max_heartrate": "INTEGER",
+    "elev_high": "DOUBLE",
+    "elev_low": "DOUBLE",
+    "upload_id": "BIGINT",
+    "external_id": "VARCHAR",
+    "pr_count": "INTEGER",
+    "total_photo_count": "INTEGER",
+    "suffer_score": "INTEGER",
+    "athlete": {"id": "BIGINT", "resource_state": "INTEGER"},
+    "map": {
+        "id": "VARCHAR",
+        "summary_polyline": "VARCHAR",
+        "resource_state": "INTEGER",
+    },
+}
+
+# One entry of the splits_metric/splits_standard lists of detailed exports
+STRAVA_SPLIT_FIELDS = {
+    "distance": "DOUBLE",
+    "elapsed_time": "INTEGER",
+    "elevation_difference": "DOUBLE",
+    "moving_time": "INTEGER",
+    "split": "INTEGER",
+    "average_heartrate": "DOUBLE",
+    "average_grade_adjusted_speed": "DOUBLE",
+}
+
+
+def split_statements(sql: str) -> List[str]:
+    """Split a query file into statements that return rows."""
+    statements = []
+    for statement in sql.split(";"):
+        lines = [
+            line for line in statement.splitlines() if not line.strip().startswith("--")
+        ]
+        if "\n".join(lines).strip():
+            statements.append(statement)
+    return statements
+
 
 class StravaAnalyzer:
     """Analyzes Strava activities using DuckDB."""
@@ -18,19 +184,74 @@ class StravaAnalyzer:
     def __init__(self, db_path: str = "strava_activities.duckdb"):
         self.db_path = db_path
         self.conn = duckdb.connect(db_path)
+        tracer.profile_connection(self.conn)
+        self.dashboard = DashboardRegistry(self.conn)
+        # Row counts the loaded tables must end up with, checked by validate_load
+        self.expected_rows: Dict[str, int] = {}
 
+    def _execute(
+        self, stage: str, sql: str, params: Optional[List[Any]] = None
+    ) -> duckdb.DuckDBPyConnection:
+        """Run a statement inside a tracing span."""
+        return tracer.execute(self.conn, stage, sql, params)
+
+    @tracer.traced("create tables")
     def create_tables(self) -> None:
         """Create the necessary tables for Strava data."""
         print("Creating database tables...")
 
+        # Activities and maps are kept across reloads and only updated where
+        # the exports changed. Databases from before the export merge rebuilt
+        # them on every load, so those start over once.
+        merged = self.conn.execute("""
+            SELECT COUNT(*) FROM duckdb_tables() WHERE table_name = 'export_activities'
+        """).fetchone()[0]
+
         # Drop tables in correct order (dependent tables first)
-        self.conn.execute("DROP TABLE IF EXISTS activity_maps CASCADE")
-        self.conn.execute("DROP TABLE IF EXISTS activities CASCADE")
+        self.conn.execute("DROP TABLE IF EXISTS activity_streams CASCADE")
+        if not merged:
+            self.conn.execute("DROP TABLE IF EXISTS daily_rollup")
+            self.conn.execute("DROP TABLE IF EXISTS activity_maps CASCADE")
+            self.conn.execute("DROP TABLE IF EXISTS activities CASCADE")
         self.conn.execute("DROP TABLE IF EXISTS athletes CASCADE")
+        self.conn.execute("DROP TABLE IF EXISTS gear CASCADE")
+
+        # Export files already merged, skipped while their size and mtime (or
+        # content hash) are unchanged
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS export_files (
+                file VARCHAR PRIMARY KEY,
+                size BIGINT,
+                mtime_ns BIGINT,
+                file_hash VARCHAR,
+                merged_at TIMESTAMP
+            )
+        """)
+
+        # Newest version of every activity across all exports, with the file
+        # it came from (version is the export date in its name, as YYYYMMDD)
+        # and a content hash
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS export_activities (
+                id BIGINT PRIMARY KEY,
+                content_hash UBIGINT,
+                file VARCHAR,
+                version BIGINT,
+                activity JSON
+            )
+        """)
+
+        # Versions used to be file mtimes, so touching an older export made it
+        # win. Those merges start over once.
+        if self.conn.execute(
+            "SELECT COUNT(*) FROM export_activities WHERE version > 99991231"
+        ).fetchone()[0]:
+            self.conn.execute("DELETE FROM export_files")
+            self.conn.execute("DELETE FROM export_activities")
 
         # Main activities table
         self.conn.execute("""
-            CREATE TABLE activities (
+            CREATE TABLE IF NOT EXISTS activities (
                 id BIGINT PRIMARY KEY,
                 name VARCHAR,
                 distance DOUBLE,
@@ -80,7 +301,8 @@ class StravaAnalyzer:
                 external_id VARCHAR,
                 pr_count INTEGER,
                 total_photo_count INTEGER,
-                suffer_score INTEGER
+                suffer_score INTEGER,
+                athlete_id BIGINT
             )
         """)
 
@@ -94,7 +316,7 @@ class StravaAnalyzer:
 
         # Map polylines table (separate due to potentially large size)
         self.conn.execute("""
-            CREATE TABLE activity_maps (
+            CREATE TABLE IF NOT EXISTS activity_maps (
                 activity_id BIGINT,
                 map_id VARCHAR,
                 summary_polyline TEXT,
@@ -103,144 +325,1575 @@ class StravaAnalyzer:
             )
         """)
 
+        # Per-sample streams (one row per activity, one array per stream type)
+        self.conn.execute("""
+            CREATE TABLE activity_streams (
+                activity_id BIGINT PRIMARY KEY,
+                time INTEGER[],
+                distance DOUBLE[],
+                altitude DOUBLE[],
+                heartrate INTEGER[],
+                moving BOOLEAN[]
+            )
+        """)
+
+        # Heart rate zone thresholds per athlete, kept across reloads so
+        # custom zones survive
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS hr_zone_thresholds (
+                athlete_id BIGINT,
+                zone INTEGER,
+                label VARCHAR,
+                min_hr INTEGER,
+                PRIMARY KEY (athlete_id, zone)
+            )
+        """)
+
+        # Cached time-in-zone histograms, kept across reloads and only
+        # recomputed when the stream or the athlete's zones change
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS activity_hr_zones (
+                activity_id BIGINT PRIMARY KEY,
+                athlete_id BIGINT,
+                zone_bounds INTEGER[],
+                stream_hash UBIGINT,
+                zone_seconds INTEGER[]
+            )
+        """)
+
+        # Cached grade-adjusted pace per activity, kept across reloads and only
+        # recomputed when the stream changes. Caches from before moving_distance
+        # counted paused distance in equivalent_distance and start over once.
+        gap_columns = self.conn.execute("""
+            SELECT COUNT(*) FILTER (column_name = 'moving_distance'), COUNT(*)
+            FROM duckdb_columns() WHERE table_name = 'activity_gap'
+        """).fetchone()
+        if gap_columns[1] and not gap_columns[0]:
+            self.conn.execute("DROP TABLE activity_gap")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS activity_gap (
+                activity_id BIGINT PRIMARY KEY,
+                stream_hash UBIGINT,
+                distance DOUBLE,
+                moving_distance DOUBLE,
+                moving_time INTEGER,
+                elevation_gain DOUBLE,
+                equivalent_distance DOUBLE,
+                gap_speed DOUBLE,
+                km_gap_speed DOUBLE[]
+            )
+        """)
+
+        # Per-km and per-mile splits, kept across reloads. split_sources records
+        # the stream or export each activity was split from, so only activities
+        # whose source changed are split again. Splits from before it were
+        # rebuilt on every load and start over once.
+        split_sources = self.conn.execute("""
+            SELECT COUNT(*) FROM duckdb_tables() WHERE table_name = 'split_sources'
+        """).fetchone()[0]
+        if not split_sources:
+            self.conn.execute("DROP TABLE IF EXISTS activity_splits")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS split_sources (
+                activity_id BIGINT PRIMARY KEY,
+                source VARCHAR,
+                source_hash UBIGINT
+            )
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS activity_splits (
+                activity_id BIGINT,
+                unit VARCHAR,
+                split BIGINT,
+                distance DOUBLE,
+                moving_time INTEGER,
+                elapsed_time INTEGER,
+                elevation_change DOUBLE,
+                average_heartrate DOUBLE,
+                gap_speed DOUBLE,
+                source VARCHAR
+            )
+        """)
+
+        # Shoes and bikes as returned by /gear/{id}
+        self.conn.execute("""
+            CREATE TABLE gear (
+                id VARCHAR PRIMARY KEY,
+                kind VARCHAR,
+                name VARCHAR,
+                nickname VARCHAR,
+                brand_name VARCHAR,
+                model_name VARCHAR,
+                frame_type INTEGER,
+                is_primary BOOLEAN,
+                retired BOOLEAN,
+                strava_distance DOUBLE
+            )
+        """)
+
+        # Per-activity gear contributions already counted in gear_usage, kept
+        # across reloads so each load only applies what changed
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS gear_ledger (
+                activity_id BIGINT PRIMARY KEY,
+                gear_id VARCHAR,
+                distance DOUBLE,
+                moving_time INTEGER,
+                elevation_gain DOUBLE
+            )
+        """)
+
+        # Running totals per shoe or bike, maintained from gear_ledger deltas
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS gear_usage (
+                gear_id VARCHAR PRIMARY KEY,
+                activities INTEGER,
+                distance DOUBLE,
+                moving_time BIGINT,
+                elevation_gain DOUBLE
+            )
+        """)
+
+        # Mileage alert thresholds per gear kind, and the alerts already raised
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS gear_thresholds (
+                kind VARCHAR,
+                threshold_km INTEGER,
+                PRIMARY KEY (kind, threshold_km)
+            )
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS gear_alerts (
+                gear_id VARCHAR,
+                threshold_km INTEGER,
+                distance_km DOUBLE,
+                raised_at TIMESTAMP,
+                PRIMARY KEY (gear_id, threshold_km)
+            )
+        """)
+
+        # Feature vectors, their per sport type scaling and the IVF clusters,
+        # kept across reloads. Databases from before that, or built from a
+        # different feature set, start over once.
+        current_features = self.conn.execute("""
+            SELECT COUNT(*) FROM duckdb_tables() WHERE table_name = 'feature_scales'
+        """).fetchone()[0]
+        if current_features:
+            current_features = not self.conn.execute(
+                "SELECT COUNT(*) FROM feature_scales WHERE features_version != ?",
+                [FEATURES_VERSION],
+            ).fetchone()[0]
+        if not current_features:
+            for table in ["activity_features", "feature_centroids", "feature_scales"]:
+                self.conn.execute(f"DROP TABLE IF EXISTS {table}")
+
+        dims = len(ACTIVITY_FEATURES)
+        scale_columns = ",\n                ".join(
+            f"{name}_mean DOUBLE,\n                {name}_std DOUBLE"
+            for name in ACTIVITY_FEATURES
+        )
+        self.conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS feature_scales (
+                sport_type VARCHAR PRIMARY KEY,
+                features_version VARCHAR,
+                trained_count BIGINT,
+                {scale_columns}
+            )
+        """)
+        self.conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS activity_features (
+                activity_id BIGINT PRIMARY KEY,
+                sport_type VARCHAR,
+                raw_hash UBIGINT,
+                centroid INTEGER,
+                features FLOAT[{dims}]
+            )
+        """)
+        self.conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS feature_centroids (
+                sport_type VARCHAR,
+                centroid INTEGER,
+                vector FLOAT[{dims}]
+            )
+        """)
+
         print("Database tables created")
 
-    def load_json_data(self, json_file: Path) -> None:
-        """Load Strava activities from JSON file into DuckDB."""
-        print(f"Loading data from {json_file}...")
+    @tracer.traced("merge exports")
+    def merge_exports(self, activities_dir: Path) -> None:
+        """Merge every export into export_activities, newest version first.
+
+        Exports are ordered by the date fetch.py puts in their name, then by
+        name, so touching or copying an older export does not bring its data
+        back. Exports whose size and mtime match export_files are not read
+        again, and neither are ones whose content hash matches. Activities that
+        are new or changed are left in the export_changes temp table for
+        load_activities.
+        """
+        exports = sorted(activities_dir.glob("*_export.json"))
+        print(f"Merging {len(exports)} export files...")
+
+        manifest = {
+            file: (size, mtime_ns, file_hash)
+            for file, size, mtime_ns, file_hash in self.conn.execute(
+                "SELECT file, size, mtime_ns, file_hash FROM export_files"
+            ).fetchall()
+        }
+
+        # A removed export may have held the newest version of some
+        # activities, so merge the remaining ones from scratch
+        if set(manifest) - {export.name for export in exports}:
+            print("   Export files were removed, merging all of them again")
+            self.conn.execute("DELETE FROM export_files")
+            self.conn.execute("DELETE FROM export_activities")
+            manifest = {}
+
+        changed = []
+        for export in exports:
+            stat = export.stat()
+            recorded = manifest.get(export.name)
+            if recorded and recorded[:2] == (stat.st_size, stat.st_mtime_ns):
+                continue
+
+            with tracer.span("hash export", bytes=stat.st_size):
+                with open(export, "rb") as f:
+                    file_hash = hashlib.file_digest(f, "sha256").hexdigest()
+            if recorded and recorded[2] == file_hash:
+                # Copied or touched, same content
+                self.conn.execute(
+                    "UPDATE export_files SET size = ?, mtime_ns = ? WHERE file = ?",
+                    [stat.st_size, stat.st_mtime_ns, export.name],
+                )
+                continue
+
+            self.conn.execute(
+                """
+                INSERT OR REPLACE INTO export_files
+                VALUES (?, ?, ?, ?, current_timestamp)
+            """,
+                [export.name, stat.st_size, stat.st_mtime_ns, file_hash],
+            )
+            changed.append(export)
 
-        if not json_file.exists():
-            print(f"File {json_file} does not exist")
+        if not changed:
+            self.conn.execute("""
+                CREATE OR REPLACE TEMP TABLE export_changes AS
+                SELECT * FROM export_activities LIMIT 0
+            """)
+            print("   All exports already merged")
             return
 
-        with open(json_file, "r") as f:
-            activities = json.load(f)
+        # Deduplicate by id, newest file first. Hashing the minified JSON
+        # ignores formatting, so only real content changes count.
+        self.conn.execute("""
+            CREATE OR REPLACE TEMP MACRO export_version(file) AS COALESCE(
+                TRY_CAST(
+                    replace(regexp_extract(file, '([0-9-]{10})_export[.]json$', 1), '-', '')
+                    AS BIGINT
+                ),
+                0
+            )
+        """)
+        read_exports = """
+            SELECT * FROM (
+                SELECT
+                    (r.json ->> 'id')::BIGINT as id,
+                    hash(json(r.json)) as content_hash,
+                    parse_filename(r.filename) as file,
+                    export_version(parse_filename(r.filename)) as version,
+                    json(r.json) as activity
+                FROM read_json_objects(?, format = 'array', filename = true) r
+            )
+            WHERE id IS NOT NULL
+        """
+        newest_first = "PARTITION BY id ORDER BY version DESC, file DESC"
+        with tracer.span(
+            "read exports", bytes=sum(export.stat().st_size for export in changed)
+        ):
+            self._execute(
+                "table export_incoming",
+                f"CREATE OR REPLACE TEMP TABLE export_incoming AS {read_exports}",
+                [[str(export) for export in changed]],
+            )
+        self._execute(
+            "table export_changes",
+            f"""
+            CREATE OR REPLACE TEMP TABLE export_changes AS
+            WITH latest AS (
+                SELECT * FROM export_incoming
+                QUALIFY row_number() OVER ({newest_first}) = 1
+            )
+            SELECT l.*
+            FROM latest l
+            LEFT JOIN export_activities e ON e.id = l.id
+            WHERE e.id IS NULL
+            OR (
+                (l.version > e.version OR (l.version = e.version AND l.file >= e.file))
+                AND l.content_hash != e.content_hash
+            )
+        """,
+        )
 
-        print(f"   Found {len(activities)} activities")
+        # Activities a changed export no longer holds fall back to the newest
+        # other export that has them, or are dropped
+        dropped = [
+            activity_id
+            for (activity_id,) in self.conn.execute(
+                """
+                SELECT e.id FROM export_activities e
+                WHERE e.file IN (SELECT UNNEST(?))
+                AND e.id NOT IN (SELECT id FROM export_changes)
+                AND NOT EXISTS (
+                    SELECT 1 FROM export_incoming i WHERE i.id = e.id AND i.file = e.file
+                )
+            """,
+                [[export.name for export in changed]],
+            ).fetchall()
+        ]
+        if dropped:
+            self.conn.execute(
+                "DELETE FROM export_activities WHERE id IN (SELECT UNNEST(?))", [dropped]
+            )
+            candidates = "SELECT * FROM export_incoming"
+            params: List[Any] = []
+            others = [str(export) for export in exports if export not in changed]
+            if others:
+                candidates += f" UNION ALL {read_exports}"
+                params.append(others)
+            self._execute(
+                "insert export fallbacks",
+                f"""
+                INSERT INTO export_changes
+                SELECT * FROM ({candidates})
+                WHERE id IN (SELECT UNNEST(?))
+                QUALIFY row_number() OVER ({newest_first}) = 1
+            """,
+                params + [dropped],
+            )
 
-        # Process activities
-        for activity in activities:
-            self._insert_activity(activity)
+        self._execute(
+            "upsert export_activities",
+            """
+            INSERT INTO export_activities SELECT * FROM export_changes
+            ON CONFLICT (id) DO UPDATE SET
+                content_hash = EXCLUDED.content_hash,
+                file = EXCLUDED.file,
+                version = EXCLUDED.version,
+                activity = EXCLUDED.activity
+        """,
+        )
 
-        print(f"Loaded {len(activities)} activities into database")
+        changes = self.conn.execute("SELECT COUNT(*) FROM export_changes").fetchone()[0]
+        tracer.annotate(rows=changes)
+        print(f"   {len(changed)} new or changed files, {changes} changed activities")
+        if dropped:
+            print(f"   {len(dropped)} activities no longer in their export")
 
-    def _insert_activity(self, activity: Dict[str, Any]) -> None:
-        """Insert a single activity into the database."""
-        # Extract start/end coordinates
-        start_lat = start_lon = end_lat = end_lon = None
-        if activity.get("start_latlng"):
-            start_lat, start_lon = activity["start_latlng"]
-        if activity.get("end_latlng"):
-            end_lat, end_lon = activity["end_latlng"]
+    @tracer.traced("load activities")
+    def load_activities(self) -> None:
+        """Apply the activity changes found by merge_exports to the loaded tables."""
+        print("Loading activities...")
+        fields = json.dumps(EXPORT_FIELDS)
 
-        # Insert main activity
-        self.conn.execute(
+        # Day/sport cells of daily_rollup whose activities change in this load,
+        # recomputed by build_rollups
+        self._execute(
+            "table rollup_changes",
             """
-            INSERT INTO activities VALUES (
-                ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?,
-                ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?,
-                ?, ?, ?, ?, ?, ?, ?, ?
+            CREATE OR REPLACE TEMP TABLE rollup_changes AS
+            SELECT DISTINCT start_date::DATE as day, sport_type
+            FROM activities
+            WHERE id IN (SELECT id FROM export_changes)
+            OR id NOT IN (SELECT id FROM export_activities)
+        """,
+        )
+
+        # Changed activities are replaced, ones no export holds anymore dropped
+        for table, key in [("activity_maps", "activity_id"), ("activities", "id")]:
+            self._execute(
+                f"delete {table}",
+                f"""
+                DELETE FROM {table}
+                WHERE {key} IN (SELECT id FROM export_changes)
+                OR {key} NOT IN (SELECT id FROM export_activities)
+            """,
+            )
+
+        self._execute(
+            "insert activities",
+            f"""
+            INSERT INTO activities BY NAME
+            SELECT
+                * EXCLUDE (start_latlng, end_latlng, athlete, map),
+                start_latlng[1] as start_latitude,
+                start_latlng[2] as start_longitude,
+                end_latlng[1] as end_latitude,
+                end_latlng[2] as end_longitude,
+                athlete.id as athlete_id
+            FROM (
+                SELECT unnest(json_transform(activity, '{fields}')) FROM export_changes
             )
         """,
-            [
-                activity.get("id"),
-                activity.get("name"),
-                activity.get("distance"),
-                activity.get("moving_time"),
-                activity.get("elapsed_time"),
-                activity.get("total_elevation_gain"),
-                activity.get("type"),
-                activity.get("sport_type"),
-                activity.get("workout_type"),
-                activity.get("start_date"),
-                activity.get("start_date_local"),
-                activity.get("timezone"),
-                activity.get("utc_offset"),
-                activity.get("location_city"),
-                activity.get("location_state"),
-                activity.get("location_country"),
-                activity.get("achievement_count"),
-                activity.get("kudos_count"),
-                activity.get("comment_count"),
-                activity.get("athlete_count"),
-                activity.get("photo_count"),
-                activity.get("trainer"),
-                activity.get("commute"),
-                activity.get("manual"),
-                activity.get("private"),
-                activity.get("flagged"),
-                activity.get("gear_id"),
-                start_lat,
-                start_lon,
-                end_lat,
-                end_lon,
-                activity.get("average_speed"),
-                activity.get("max_speed"),
-                activity.get("average_cadence"),
-                activity.get("average_temp"),
-                activity.get("average_watts"),
-                activity.get("max_watts"),
-                activity.get("weighted_average_watts"),
-                activity.get("device_watts"),
-                activity.get("kilojoules"),
-                activity.get("has_heartrate"),
-                activity.get("average_heartrate"),
-                activity.get("max_heartrate"),
-                activity.get("elev_high"),
-                activity.get("elev_low"),
-                activity.get("upload_id"),
-                activity.get("external_id"),
-                activity.get("pr_count"),
-                activity.get("total_photo_count"),
-                activity.get("suffer_score"),
-            ],
-        )
-
-        # Insert athlete if present
-        if "athlete" in activity:
-            athlete = activity["athlete"]
-            self.conn.execute(
+        )
+
+        self.conn.execute("""
+            INSERT INTO rollup_changes
+            SELECT DISTINCT start_date::DATE, sport_type
+            FROM activities
+            WHERE id IN (SELECT id FROM export_changes)
+        """)
+
+        self._execute(
+            "insert activity_maps",
+            f"""
+            INSERT INTO activity_maps
+            SELECT id, map.id, map.summary_polyline, map.resource_state
+            FROM (
+                SELECT unnest(json_transform(activity, '{fields}')) FROM export_changes
+            )
+            WHERE map IS NOT NULL
+        """,
+        )
+
+        self._execute(
+            "insert athletes",
+            """
+            INSERT INTO athletes
+            SELECT
+                (activity -> 'athlete' ->> 'id')::INTEGER as id,
+                any_value((activity -> 'athlete' ->> 'resource_state')::INTEGER)
+            FROM export_activities
+            WHERE activity -> 'athlete' ->> 'id' IS NOT NULL
+            GROUP BY 1
+        """,
+        )
+
+        for table in ["activities", "athletes", "activity_maps"]:
+            record_table_version(self.conn, table)
+
+        # Checked by validate_load: the loaded tables must match the merge
+        activities, athletes, maps = self.conn.execute(
+            """
+            SELECT
+                COUNT(*),
+                COUNT(DISTINCT activity -> 'athlete' ->> 'id'),
+                COUNT(*) FILTER (WHERE json_type(activity, '$.map') = 'OBJECT')
+            FROM export_activities
+        """
+        ).fetchone()
+        self.expected_rows.update(
+            activities=activities, athletes=athletes, activity_maps=maps
+        )
+
+        changes = self.conn.execute("SELECT COUNT(*) FROM export_changes").fetchone()[0]
+        tracer.annotate(rows=changes)
+        print(f"Loaded {changes} new or changed activities ({activities} in total)")
+
+    @tracer.traced("load streams")
+    def load_streams(self, streams_dir: Path) -> None:
+        """Bulk load cached activity streams into DuckDB."""
+        stream_files = list(streams_dir.glob("*.json")) if streams_dir.exists() else []
+
+        if not stream_files:
+            print("No activity streams found, skipping stream analysis")
+            return
+
+        print(f"Loading streams from {streams_dir}...")
+
+        self._execute(
+            "insert activity_streams",
+            """
+            INSERT INTO activity_streams
+            SELECT activity_id, time, distance, altitude, heartrate, moving
+            FROM read_json(?, columns = {
+                activity_id: 'BIGINT',
+                time: 'INTEGER[]',
+                distance: 'DOUBLE[]',
+                altitude: 'DOUBLE[]',
+                heartrate: 'INTEGER[]',
+                moving: 'BOOLEAN[]'
+            })
+            WHERE activity_id IN (SELECT id FROM activities)
+        """,
+            [str(streams_dir / "*.json")],
+        )
+
+        record_table_version(self.conn, "activity_streams")
+        count = self.conn.execute("SELECT COUNT(*) FROM activity_streams").fetchone()[0]
+        tracer.annotate(rows=count, bytes=sum(f.stat().st_size for f in stream_files))
+        print(f"Loaded streams for {count} activities")
+
+    @tracer.traced("load gear")
+    def load_gear(self, gear_dir: Path) -> None:
+        """Bulk load cached gear details into DuckDB."""
+        if not gear_dir.exists() or not any(gear_dir.glob("*.json")):
+            print("No gear details found, gear will be listed by id only")
+            return
+
+        self._execute(
+            "insert gear",
+            """
+            INSERT INTO gear
+            SELECT
+                id,
+                CASE WHEN id LIKE 'b%' THEN 'bike' ELSE 'shoe' END,
+                name,
+                nickname,
+                brand_name,
+                model_name,
+                frame_type,
+                "primary",
+                retired,
+                distance
+            FROM read_json(?, columns = {
+                id: 'VARCHAR',
+                name: 'VARCHAR',
+                nickname: 'VARCHAR',
+                brand_name: 'VARCHAR',
+                model_name: 'VARCHAR',
+                frame_type: 'INTEGER',
+                "primary": 'BOOLEAN',
+                retired: 'BOOLEAN',
+                distance: 'DOUBLE'
+            })
+        """,
+            [str(gear_dir / "*.json")],
+        )
+
+        record_table_version(self.conn, "gear")
+        count = self.conn.execute("SELECT COUNT(*) FROM gear").fetchone()[0]
+        tracer.annotate(rows=count)
+        print(f"Loaded {count} gear items")
+
+    @tracer.traced("build gear usage")
+    def build_gear_usage(self) -> None:
+        """Apply changed activities to the gear totals and raise mileage alerts."""
+        print("Updating gear usage...")
+
+        if not self.conn.execute("SELECT COUNT(*) FROM gear_thresholds").fetchone()[0]:
+            self.conn.executemany(
+                "INSERT INTO gear_thresholds VALUES (?, ?)",
+                [
+                    [kind, threshold]
+                    for kind, thresholds in DEFAULT_GEAR_THRESHOLDS_KM.items()
+                    for threshold in thresholds
+                ],
+            )
+
+        # Contributions that differ from the ledger: removed or changed ones are
+        # subtracted, new or changed ones added
+        self.conn.execute("""
+            CREATE OR REPLACE TEMP TABLE gear_current AS
+            SELECT
+                id as activity_id,
+                gear_id,
+                COALESCE(distance, 0) as distance,
+                COALESCE(moving_time, 0) as moving_time,
+                COALESCE(total_elevation_gain, 0) as elevation_gain
+            FROM activities
+            WHERE gear_id IS NOT NULL
+        """)
+        self.conn.execute("""
+            CREATE OR REPLACE TEMP TABLE gear_changes AS
+            SELECT -1 as sign, * FROM (SELECT * FROM gear_ledger EXCEPT SELECT * FROM gear_current)
+            UNION ALL
+            SELECT 1 as sign, * FROM (SELECT * FROM gear_current EXCEPT SELECT * FROM gear_ledger)
+        """)
+        changed = self.conn.execute("SELECT COUNT(*) FROM gear_changes").fetchone()[0]
+
+        self.conn.execute("BEGIN TRANSACTION")
+        try:
+            self._execute(
+                "upsert gear_usage",
                 """
-                INSERT OR IGNORE INTO athletes VALUES (?, ?)
+                INSERT INTO gear_usage
+                SELECT
+                    gear_id,
+                    SUM(sign),
+                    SUM(sign * distance),
+                    SUM(sign * moving_time),
+                    SUM(sign * elevation_gain)
+                FROM gear_changes
+                GROUP BY gear_id
+                ON CONFLICT (gear_id) DO UPDATE SET
+                    activities = activities + EXCLUDED.activities,
+                    distance = distance + EXCLUDED.distance,
+                    moving_time = moving_time + EXCLUDED.moving_time,
+                    elevation_gain = elevation_gain + EXCLUDED.elevation_gain
             """,
-                [athlete.get("id"), athlete.get("resource_state")],
             )
+            self.conn.execute("""
+                DELETE FROM gear_ledger
+                WHERE activity_id IN (SELECT activity_id FROM gear_changes WHERE sign = -1)
+            """)
+            self.conn.execute("""
+                INSERT INTO gear_ledger
+                SELECT activity_id, gear_id, distance, moving_time, elevation_gain
+                FROM gear_changes
+                WHERE sign = 1
+            """)
+            self.conn.execute("DELETE FROM gear_usage WHERE activities <= 0")
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
 
-        # Insert map data if present
-        if "map" in activity and activity["map"]:
-            map_data = activity["map"]
-            self.conn.execute(
+        record_table_version(self.conn, "gear_usage")
+        tracer.annotate(rows=changed)
+        print(f"Gear usage updated from {changed} changed contributions")
+
+        # Thresholds crossed for the first time (retired gear stays quiet)
+        alerts = self.conn.execute("""
+            INSERT INTO gear_alerts
+            SELECT u.gear_id, t.threshold_km, u.distance / 1000, current_timestamp::TIMESTAMP
+            FROM gear_usage u
+            LEFT JOIN gear g ON g.id = u.gear_id
+            JOIN gear_thresholds t
+                ON t.kind = CASE WHEN u.gear_id LIKE 'b%' THEN 'bike' ELSE 'shoe' END
+            WHERE u.distance / 1000 >= t.threshold_km
+            AND NOT COALESCE(g.retired, false)
+            ON CONFLICT DO NOTHING
+            RETURNING gear_id, threshold_km, distance_km
+        """).fetchall()
+        crossed: Dict[str, Any] = {}
+        for gear_id, threshold_km, distance_km in sorted(alerts):
+            crossed[gear_id] = (threshold_km, distance_km)  # Highest threshold wins
+        for gear_id, (threshold_km, distance_km) in crossed.items():
+            name = self.conn.execute(
+                "SELECT COALESCE(nickname, name) FROM gear WHERE id = ?", [gear_id]
+            ).fetchone()
+            label = name[0] if name and name[0] else gear_id
+            print(f"   Gear alert: {label} passed {threshold_km} km ({distance_km:.0f} km)")
+
+    @tracer.traced("build hr zones")
+    def build_hr_zones(self) -> None:
+        """Compute time-in-zone histograms from heart rate streams."""
+        print("Computing heart rate zones...")
+
+        # Give every athlete without custom zones the default thresholds
+        missing_athletes = self.conn.execute("""
+            SELECT id FROM athletes
+            WHERE id NOT IN (SELECT athlete_id FROM hr_zone_thresholds)
+        """).fetchall()
+        for (athlete_id,) in missing_athletes:
+            self.conn.executemany(
+                "INSERT INTO hr_zone_thresholds VALUES (?, ?, ?, ?)",
+                [[athlete_id, *zone] for zone in DEFAULT_HR_ZONES],
+            )
+
+        # Drop cached histograms whose stream or zones are outdated
+        self._execute(
+            "delete stale hr zones",
+            """
+            DELETE FROM activity_hr_zones
+            WHERE activity_id NOT IN (
+                SELECT s.activity_id
+                FROM activity_streams s
+                JOIN activities a ON a.id = s.activity_id
+                JOIN (
+                    SELECT athlete_id, list(min_hr ORDER BY zone) as zone_bounds
+                    FROM hr_zone_thresholds
+                    GROUP BY athlete_id
+                ) b ON b.athlete_id = a.athlete_id
+                JOIN activity_hr_zones c ON c.activity_id = s.activity_id
+                WHERE c.zone_bounds = b.zone_bounds
+                AND c.stream_hash = hash(s.time, s.heartrate, s.moving)
+            )
+        """,
+        )
+
+        # Bin every heart rate sample of the remaining activities in one pass:
+        # each sample counts for the time until the next sample, and paused
+        # samples (moving = false) are ignored
+        self._execute(
+            "insert activity_hr_zones",
+            """
+            INSERT INTO activity_hr_zones
+            WITH zones AS (
+                SELECT
+                    athlete_id,
+                    zone,
+                    min_hr,
+                    LEAD(min_hr, 1, 1000) OVER (PARTITION BY athlete_id ORDER BY zone) as max_hr
+                FROM hr_zone_thresholds
+            ),
+            bounds AS (
+                SELECT athlete_id, list(min_hr ORDER BY zone) as zone_bounds
+                FROM hr_zone_thresholds
+                GROUP BY athlete_id
+            ),
+            pending AS (
+                SELECT
+                    s.activity_id,
+                    a.athlete_id,
+                    b.zone_bounds,
+                    hash(s.time, s.heartrate, s.moving) as stream_hash,
+                    s.time,
+                    s.heartrate,
+                    s.moving
+                FROM activity_streams s
+                JOIN activities a ON a.id = s.activity_id
+                JOIN bounds b ON b.athlete_id = a.athlete_id
+                WHERE s.heartrate IS NOT NULL
+                AND s.activity_id NOT IN (SELECT activity_id FROM activity_hr_zones)
+            ),
+            samples AS (
+                SELECT
+                    activity_id,
+                    athlete_id,
+                    UNNEST(time) as t,
+                    UNNEST(heartrate) as hr,
+                    UNNEST(moving) as is_moving
+                FROM pending
+            ),
+            deltas AS (
+                SELECT
+                    activity_id,
+                    athlete_id,
+                    hr,
+                    COALESCE(is_moving, true) as is_moving,
+                    LEAD(t) OVER (PARTITION BY activity_id ORDER BY t) - t as dt
+                FROM samples
+            ),
+            binned AS (
+                SELECT d.activity_id, z.zone, SUM(d.dt) as seconds
+                FROM deltas d
+                JOIN zones z
+                    ON z.athlete_id = d.athlete_id
+                    AND d.hr >= z.min_hr
+                    AND d.hr < z.max_hr
+                WHERE d.is_moving
+                AND d.dt IS NOT NULL
+                GROUP BY d.activity_id, z.zone
+            )
+            SELECT
+                p.activity_id,
+                p.athlete_id,
+                p.zone_bounds,
+                p.stream_hash,
+                list(COALESCE(b.seconds, 0)::INTEGER ORDER BY z.zone) as zone_seconds
+            FROM pending p
+            JOIN zones z ON z.athlete_id = p.athlete_id
+            LEFT JOIN binned b ON b.activity_id = p.activity_id AND b.zone = z.zone
+            GROUP BY p.activity_id, p.athlete_id, p.zone_bounds, p.stream_hash
+        """,
+        )
+
+        record_table_version(self.conn, "activity_hr_zones")
+        count = self.conn.execute("SELECT COUNT(*) FROM activity_hr_zones").fetchone()[0]
+        tracer.annotate(rows=count)
+        print(f"Heart rate zones available for {count} activities")
+
+    @tracer.traced("build gap")
+    def build_gap(self) -> None:
+        """Compute grade-adjusted pace from distance and altitude streams."""
+        print("Computing grade-adjusted pace...")
+
+        # Energy cost of running in J/kg/m at a given grade (Minetti et al. 2002),
+        # valid for grades between -45% and +45%. Flat ground costs 3.6.
+        self.conn.execute("""
+            CREATE OR REPLACE MACRO minetti_cost(grade) AS (
+                WITH g AS (SELECT greatest(-0.45, least(0.45, grade)) as i)
+                SELECT 155.4 * i^5 - 30.4 * i^4 - 43.3 * i^3 + 46.3 * i^2 + 19.5 * i + 3.6
+                FROM g
+            )
+        """)
+
+        # Drop cached results whose stream changed or disappeared
+        self._execute(
+            "delete stale gap",
+            """
+            DELETE FROM activity_gap
+            WHERE activity_id NOT IN (
+                SELECT s.activity_id
+                FROM activity_streams s
+                JOIN activity_gap g ON g.activity_id = s.activity_id
+                WHERE g.stream_hash = hash(s.time, s.distance, s.altitude, s.moving)
+            )
+        """,
+        )
+
+        # Every sample contributes the distance, climb and moving time until the
+        # next sample. Samples are grouped into fixed-length segments whose
+        # average grade scales their moving distance by minetti_cost(grade) /
+        # flat cost, so the pace divides moving distance by moving time.
+        # Segments then add up into per-km splits and activity totals.
+        self._execute(
+            "insert activity_gap",
+            f"""
+            INSERT INTO activity_gap
+            WITH pending AS (
+                SELECT
+                    s.activity_id,
+                    hash(s.time, s.distance, s.altitude, s.moving) as stream_hash,
+                    s.time,
+                    s.distance,
+                    s.altitude,
+                    s.moving
+                FROM activity_streams s
+                JOIN activities a ON a.id = s.activity_id
+                WHERE a.sport_type IN ({", ".join(f"'{sport}'" for sport in GAP_SPORTS)})
+                AND s.distance IS NOT NULL
+                AND s.altitude IS NOT NULL
+                AND s.activity_id NOT IN (SELECT activity_id FROM activity_gap)
+            ),
+            samples AS (
+                SELECT
+                    activity_id,
+                    UNNEST(time) as t,
+                    UNNEST(distance) as d,
+                    UNNEST(altitude) as alt,
+                    UNNEST(moving) as is_moving
+                FROM pending
+            ),
+            deltas AS (
+                SELECT
+                    activity_id,
+                    floor(d / {GAP_SEGMENT_METERS})::INTEGER as segment,
+                    LEAD(d) OVER w - d as dd,
+                    LEAD(alt) OVER w - alt as dalt,
+                    COALESCE(is_moving, true) as is_moving,
+                    LEAD(t) OVER w - t as dt
+                FROM samples
+                WINDOW w AS (PARTITION BY activity_id ORDER BY t)
+            ),
+            segments AS (
+                SELECT
+                    activity_id,
+                    segment,
+                    SUM(dd) as distance,
+                    SUM(dalt) as climb,
+                    COALESCE(SUM(dd) FILTER (is_moving), 0) as moving_distance,
+                    COALESCE(SUM(dt) FILTER (is_moving), 0) as moving_time
+                FROM deltas
+                WHERE dd IS NOT NULL
+                GROUP BY activity_id, segment
+            ),
+            splits AS (
+                SELECT
+                    activity_id,
+                    segment * {GAP_SEGMENT_METERS} // 1000 as km,
+                    SUM(distance) as distance,
+                    SUM(moving_distance) as moving_distance,
+                    SUM(moving_time) as moving_time,
+                    SUM(greatest(climb, 0)) as elevation_gain,
+                    SUM(
+                        moving_distance
+                        * minetti_cost(climb / NULLIF(distance, 0))
+                        / minetti_cost(0)
+                    ) as equivalent_distance
+                FROM segments
+                GROUP BY activity_id, km
+            )
+            SELECT
+                p.activity_id,
+                p.stream_hash,
+                SUM(s.distance) as distance,
+                SUM(s.moving_distance) as moving_distance,
+                SUM(s.moving_time)::INTEGER as moving_time,
+                SUM(s.elevation_gain) as elevation_gain,
+                SUM(s.equivalent_distance) as equivalent_distance,
+                SUM(s.equivalent_distance) / NULLIF(SUM(s.moving_time), 0) as gap_speed,
+                list(
+                    s.equivalent_distance / NULLIF(s.moving_time, 0) ORDER BY s.km
+                ) as km_gap_speed
+            FROM pending p
+            JOIN splits s ON s.activity_id = p.activity_id
+            GROUP BY p.activity_id, p.stream_hash
+        """,
+        )
+
+        record_table_version(self.conn, "activity_gap")
+        count = self.conn.execute("SELECT COUNT(*) FROM activity_gap").fetchone()[0]
+        tracer.annotate(rows=count)
+        print(f"Grade-adjusted pace available for {count} activities")
+
+    @tracer.traced("build splits")
+    def build_splits(self) -> None:
+        """Derive per-km and per-mile splits from streams or Strava's own splits.
+
+        Uses the minetti_cost macro, so it runs after build_gap.
+        """
+        print("Building splits...")
+
+        units = ", ".join(f"('{unit}', {meters})" for unit, meters in SPLIT_UNITS.items())
+        strava_splits = json.dumps(
+            {
+                "splits_metric": [STRAVA_SPLIT_FIELDS],
+                "splits_standard": [STRAVA_SPLIT_FIELDS],
+            }
+        )
+
+        # Splits come from the streams when cached, otherwise from the
+        # splits_metric/splits_standard lists of detailed activity exports.
+        # Each activity's source and its hash decide whether cached splits
+        # still hold.
+        self._execute(
+            "table split_inputs",
+            """
+            CREATE OR REPLACE TEMP TABLE split_inputs AS
+            SELECT
+                activity_id,
+                'stream' as source,
+                hash(time, distance, altitude, heartrate, moving) as source_hash
+            FROM activity_streams
+            WHERE distance IS NOT NULL
+            UNION ALL
+            SELECT id, 'strava', content_hash
+            FROM export_activities
+            WHERE id NOT IN (
+                SELECT activity_id FROM activity_streams WHERE distance IS NOT NULL
+            )
+        """,
+        )
+
+        # Drop splits whose source changed or disappeared
+        self._execute(
+            "delete stale split_sources",
+            """
+            DELETE FROM split_sources
+            WHERE activity_id NOT IN (
+                SELECT i.activity_id
+                FROM split_inputs i
+                JOIN split_sources s ON s.activity_id = i.activity_id
+                WHERE s.source = i.source AND s.source_hash = i.source_hash
+            )
+        """,
+        )
+        self._execute(
+            "delete stale splits",
+            """
+            DELETE FROM activity_splits
+            WHERE activity_id NOT IN (SELECT activity_id FROM split_sources)
+        """,
+        )
+        self._execute(
+            "table split_pending",
+            """
+            CREATE OR REPLACE TEMP TABLE split_pending AS
+            SELECT * FROM split_inputs
+            WHERE activity_id NOT IN (SELECT activity_id FROM split_sources)
+        """,
+        )
+
+        # A sample interval crossing a unit boundary is split there, its
+        # distance, time and climb shared out in proportion to the distance on
+        # each side, so every full split is exactly one unit long. Grades are
+        # measured over the same segments as build_gap.
+        self._execute(
+            "insert activity_splits",
+            f"""
+            INSERT INTO activity_splits
+            WITH units(unit, meters) AS (VALUES {units}),
+            samples AS (
+                SELECT
+                    activity_id,
+                    UNNEST(time) as t,
+                    UNNEST(distance) as d,
+                    UNNEST(altitude) as alt,
+                    UNNEST(heartrate) as hr,
+                    UNNEST(moving) as is_moving
+                FROM activity_streams
+                WHERE activity_id IN (
+                    SELECT activity_id FROM split_pending WHERE source = 'stream'
+                )
+            ),
+            deltas AS (
+                SELECT
+                    activity_id,
+                    d,
+                    hr,
+                    COALESCE(is_moving, true) as is_moving,
+                    floor(d / {GAP_SEGMENT_METERS})::INTEGER as segment,
+                    LEAD(d) OVER w - d as dd,
+                    LEAD(alt) OVER w - alt as dalt,
+                    LEAD(t) OVER w - t as dt
+                FROM samples
+                WINDOW w AS (PARTITION BY activity_id ORDER BY t)
+            ),
+            factors AS (
+                SELECT
+                    activity_id,
+                    segment,
+                    minetti_cost(SUM(dalt) / NULLIF(SUM(dd), 0)) / minetti_cost(0) as factor
+                FROM deltas
+                WHERE dd IS NOT NULL
+                GROUP BY activity_id, segment
+            ),
+            crossings AS (
+                SELECT
+                    d.*,
+                    f.factor,
+                    u.unit,
+                    u.meters,
+                    UNNEST(range(
+                        floor(d.d / u.meters)::INTEGER,
+                        floor((d.d + GREATEST(d.dd, 0)) / u.meters)::INTEGER + 1
+                    )) as k
+                FROM deltas d
+                JOIN factors f ON f.activity_id = d.activity_id AND f.segment = d.segment
+                CROSS JOIN units u
+                WHERE d.dd IS NOT NULL
+            ),
+            pieces AS (
+                SELECT
+                    *,
+                    CASE WHEN dd > 0
+                        THEN (LEAST(d + dd, (k + 1) * meters) - GREATEST(d, k * meters)) / dd
+                        ELSE 1
+                    END as share
+                FROM crossings
+            ),
+            stream_splits AS (
+                SELECT
+                    activity_id,
+                    unit,
+                    k + 1 as split,
+                    SUM(dd * share) as distance,
+                    COALESCE(SUM(dt * share) FILTER (WHERE is_moving), 0)::INTEGER as moving_time,
+                    SUM(dt * share)::INTEGER as elapsed_time,
+                    SUM(dalt * share) as elevation_change,
+                    SUM(hr * dt * share)
+                        / NULLIF(SUM(dt * share) FILTER (WHERE hr IS NOT NULL), 0)
+                        as average_heartrate,
+                    SUM(dd * share * factor) FILTER (WHERE is_moving)
+                        / NULLIF(SUM(dt * share) FILTER (WHERE is_moving), 0)
+                        as gap_speed,
+                    'stream' as source
+                FROM pieces
+                WHERE share > 0
+                GROUP BY activity_id, unit, split
+            ),
+            export AS (
+                SELECT id, unnest(json_transform(activity, '{strava_splits}'))
+                FROM export_activities
+                WHERE id IN (SELECT activity_id FROM split_pending WHERE source = 'strava')
+            ),
+            strava_splits AS (
+                SELECT
+                    id as activity_id,
+                    unit,
+                    s.split,
+                    s.distance,
+                    s.moving_time,
+                    s.elapsed_time,
+                    s.elevation_difference as elevation_change,
+                    s.average_heartrate,
+                    s.average_grade_adjusted_speed as gap_speed,
+                    'strava' as source
+                FROM (
+                    SELECT id, 'km' as unit, UNNEST(splits_metric) as s FROM export
+                    UNION ALL
+                    SELECT id, 'mile' as unit, UNNEST(splits_standard) as s FROM export
+                )
+            )
+            SELECT * FROM stream_splits
+            UNION ALL
+            SELECT * FROM strava_splits
+        """,
+        )
+        self._execute(
+            "insert split_sources",
+            "INSERT INTO split_sources SELECT * FROM split_pending",
+        )
+
+        record_table_version(self.conn, "activity_splits")
+        pending = self.conn.execute("SELECT COUNT(*) FROM split_pending").fetchone()[0]
+        count, activities = self.conn.execute(
+            "SELECT COUNT(*), COUNT(DISTINCT activity_id) FROM activity_splits"
+        ).fetchone()
+        tracer.annotate(rows=count)
+        print(
+            f"Split {pending} new or changed activities, "
+            f"{count} splits for {activities} activities"
+        )
+
+    @tracer.traced("build features")
+    def build_features(self) -> None:
+        """Update activity feature vectors and the IVF index for similarity search.
+
+        Runs after build_hr_zones, build_gap and build_splits, whose results
+        enrich the vectors of activities with streams. Only new or changed
+        activities get a vector and a cluster, unless their sport type has
+        grown enough since it was last trained (see FEATURE_RETRAIN_GROWTH).
+        """
+        print("Building activity feature vectors...")
+        dims = len(ACTIVITY_FEATURES)
+        names = ", ".join(ACTIVITY_FEATURES)
+        raw_columns = ",\n                    ".join(
+            f"{expression} as {name}" for name, expression in ACTIVITY_FEATURES.items()
+        )
+        scale_columns = ",\n                ".join(
+            f"AVG({name}), STDDEV({name})" for name in ACTIVITY_FEATURES
+        )
+        z_scores = ",\n                    ".join(
+            f"COALESCE((r.{name} - s.{name}_mean) / NULLIF(s.{name}_std, 0), 0)"
+            for name in ACTIVITY_FEATURES
+        )
+
+        # Unscaled features of every activity, with a hash to spot the ones
+        # whose vector is outdated (changed export, new stream, zones, splits)
+        self._execute(
+            "table feature_raw",
+            f"""
+            CREATE OR REPLACE TEMP TABLE feature_raw AS
+            WITH zones AS (
+                SELECT
+                    activity_id,
+                    list_sum(zone_seconds[4:]) / NULLIF(list_sum(zone_seconds), 0) as hard_share
+                FROM activity_hr_zones
+            ),
+            split_pacing AS (
+                SELECT
+                    activity_id,
+                    STDDEV(moving_time / distance)
+                        / NULLIF(AVG(moving_time / distance), 0) as variability
+                FROM activity_splits
+                WHERE unit = 'km' AND distance >= 950 AND moving_time > 0
+                GROUP BY activity_id
+            ),
+            raw AS (
+                SELECT
+                    a.id as activity_id,
+                    a.sport_type,
+                    {raw_columns}
+                FROM activities a
+                LEFT JOIN activity_gap g ON g.activity_id = a.id
+                LEFT JOIN zones z ON z.activity_id = a.id
+                LEFT JOIN split_pacing sp ON sp.activity_id = a.id
+                WHERE a.sport_type IS NOT NULL
+            )
+            SELECT *, hash(sport_type, {names}) as raw_hash
+            FROM raw
+        """,
+        )
+
+        self._execute(
+            "delete stale features",
+            """
+            DELETE FROM activity_features
+            WHERE activity_id NOT IN (
+                SELECT f.activity_id
+                FROM activity_features f
+                JOIN feature_raw r ON r.activity_id = f.activity_id
+                WHERE r.raw_hash = f.raw_hash
+            )
+        """,
+        )
+
+        # Sport types without an index yet, or grown enough since training
+        self._execute(
+            "table feature_retrain",
+            f"""
+            CREATE OR REPLACE TEMP TABLE feature_retrain AS
+            SELECT r.sport_type
+            FROM (SELECT sport_type, COUNT(*) as n FROM feature_raw GROUP BY sport_type) r
+            LEFT JOIN feature_scales s ON s.sport_type = r.sport_type
+            WHERE s.sport_type IS NULL
+            OR r.n >= s.trained_count * {FEATURE_RETRAIN_GROWTH}
+        """,
+        )
+        retrain = [
+            sport_type
+            for (sport_type,) in self.conn.execute(
+                "SELECT sport_type FROM feature_retrain ORDER BY sport_type"
+            ).fetchall()
+        ]
+
+        # Retrained (and vanished) sport types start over with new scaling
+        for table in ["feature_scales", "activity_features", "feature_centroids"]:
+            self.conn.execute(f"""
+                DELETE FROM {table}
+                WHERE sport_type IN (SELECT sport_type FROM feature_retrain)
+                OR sport_type NOT IN (SELECT sport_type FROM feature_raw)
+            """)
+        self._execute(
+            "insert feature_scales",
+            f"""
+            INSERT INTO feature_scales
+            SELECT
+                sport_type,
+                ?,
+                COUNT(*),
+                {scale_columns}
+            FROM feature_raw
+            WHERE sport_type IN (SELECT sport_type FROM feature_retrain)
+            GROUP BY sport_type
+        """,
+            [FEATURES_VERSION],
+        )
+
+        # Standardized vectors for every activity without one, comparable
+        # within a sport type
+        self._execute(
+            "insert activity_features",
+            f"""
+            INSERT INTO activity_features
+            SELECT
+                r.activity_id,
+                r.sport_type,
+                r.raw_hash,
+                NULL,
+                [
+                    {z_scores}
+                ]::FLOAT[{dims}]
+            FROM feature_raw r
+            JOIN feature_scales s ON s.sport_type = r.sport_type
+            WHERE r.activity_id NOT IN (SELECT activity_id FROM activity_features)
+        """,
+        )
+        pending = self.conn.execute(
+            "SELECT COUNT(*) FROM activity_features WHERE centroid IS NULL"
+        ).fetchone()[0]
+
+        if retrain:
+            # IVF index: k-means with about sqrt(n) clusters per sport type,
+            # seeded with a deterministic sample of activities
+            print(f"   Training clusters for {', '.join(retrain)}")
+            self._execute(
+                "init feature_centroids",
                 """
-                INSERT INTO activity_maps VALUES (?, ?, ?, ?)
+                INSERT INTO feature_centroids
+                SELECT sport_type, centroid, features
+                FROM (
+                    SELECT
+                        sport_type,
+                        features,
+                        ROW_NUMBER() OVER (PARTITION BY sport_type ORDER BY hash(activity_id)) as centroid,
+                        COUNT(*) OVER (PARTITION BY sport_type) as n
+                    FROM activity_features
+                    WHERE sport_type IN (SELECT sport_type FROM feature_retrain)
+                )
+                WHERE centroid <= ceil(sqrt(n))
             """,
-                [
-                    activity.get("id"),
-                    map_data.get("id"),
-                    map_data.get("summary_polyline"),
-                    map_data.get("resource_state"),
-                ],
             )
+            for iteration in range(KMEANS_ITERATIONS):
+                with tracer.span("kmeans iteration", iteration=iteration):
+                    self._assign_centroids()
+                    self.conn.execute("""
+                        DELETE FROM feature_centroids
+                        WHERE sport_type IN (SELECT sport_type FROM feature_retrain)
+                    """)
+                    self.conn.execute(f"""
+                        INSERT INTO feature_centroids
+                        WITH dims AS (
+                            SELECT
+                                sport_type,
+                                centroid,
+                                generate_subscripts(features, 1) as dim,
+                                UNNEST(features) as value
+                            FROM activity_features
+                            WHERE sport_type IN (SELECT sport_type FROM feature_retrain)
+                        )
+                        SELECT sport_type, centroid, list(avg ORDER BY dim)::FLOAT[{dims}]
+                        FROM (
+                            SELECT sport_type, centroid, dim, AVG(value) as avg
+                            FROM dims
+                            GROUP BY sport_type, centroid, dim
+                        )
+                        GROUP BY sport_type, centroid
+                    """)
+        self._assign_centroids()
 
+        # Top-k search: scan only the nprobe clusters closest to the target
+        self._execute(
+            "macro similar_activities",
+            """
+            CREATE OR REPLACE MACRO similar_activities(target_id, k := 10, nprobe := 3) AS TABLE
+            WITH target AS (
+                SELECT sport_type, features
+                FROM activity_features
+                WHERE activity_id = target_id
+            ),
+            probes AS (
+                SELECT c.centroid
+                FROM feature_centroids c
+                JOIN target t ON t.sport_type = c.sport_type
+                ORDER BY array_distance(c.vector, t.features)
+                LIMIT nprobe
+            )
+            SELECT
+                a.id as activity_id,
+                a.name,
+                a.start_date,
+                a.sport_type,
+                ROUND(a.distance / 1000, 2) as distance_km,
+                ROUND(a.moving_time / 60, 0) as moving_min,
+                ROUND(a.total_elevation_gain, 0) as elevation_gain_m,
+                ROUND(a.average_heartrate, 0) as avg_hr,
+                ROUND(array_distance(f.features, t.features), 3) as feature_distance
+            FROM activity_features f
+            JOIN target t ON t.sport_type = f.sport_type
+            JOIN activities a ON a.id = f.activity_id
+            WHERE f.centroid IN (SELECT centroid FROM probes)
+            AND f.activity_id != target_id
+            ORDER BY feature_distance
+            LIMIT k
+        """,
+        )
+
+        record_table_version(self.conn, "activity_features")
+        count, clusters = self.conn.execute(
+            "SELECT (SELECT COUNT(*) FROM activity_features), COUNT(*) FROM feature_centroids"
+        ).fetchone()
+        tracer.annotate(rows=count)
+        print(
+            f"Indexed {count} activities in {clusters} clusters "
+            f"({pending} new or changed vectors)"
+        )
+
+    def _assign_centroids(self) -> None:
+        """Point unassigned vectors, and those of retrained sports, at their nearest centroid."""
+        self._execute(
+            "assign centroids",
+            """
+            UPDATE activity_features f
+            SET centroid = nearest.centroid
+            FROM (
+                SELECT
+                    f.activity_id,
+                    arg_min(c.centroid, array_distance(f.features, c.vector)) as centroid
+                FROM (
+                    SELECT activity_id, sport_type, features
+                    FROM activity_features
+                    WHERE centroid IS NULL
+                    OR sport_type IN (SELECT sport_type FROM feature_retrain)
+                ) f
+                JOIN feature_centroids c ON c.sport_type = f.sport_type
+                GROUP BY f.activity_id
+            ) nearest
+            WHERE nearest.activity_id = f.activity_id
+        """,
+        )
+
+    @tracer.traced("build session gaps")
+    def build_session_gaps(self) -> None:
+        """Precompute gaps between sessions and rolling training density."""
+        print("Building session gaps...")
+
+        # Sessions are ordered across all sports and within their own sport.
+        # Consecutive sessions of one sport form a streak; the session before
+        # the streak is the last one of another sport (cross-sport gap).
+        # Days are local calendar days, so rest days match the athlete's week.
+        # Rolling counts add the previous 6 (or 27) days to the sessions of the
+        # same day up to this one, so later sessions that day are not counted.
+        self._execute(
+            "table session_gaps",
+            """
+            CREATE OR REPLACE TABLE session_gaps AS
+            WITH sessions AS (
+                SELECT
+                    id as activity_id,
+                    sport_type,
+                    start_date,
+                    COALESCE(start_date_local, start_date)::DATE as day,
+                    moving_time,
+                    suffer_score,
+                    average_heartrate,
+                    max_heartrate
+                FROM activities
+                WHERE start_date IS NOT NULL
+                AND sport_type IS NOT NULL
+            ),
+            ordered AS (
+                SELECT *,
+                    LAG(activity_id) OVER all_sports as prev_activity_id,
+                    LAG(sport_type) OVER all_sports as prev_sport_type,
+                    LAG(start_date) OVER all_sports as prev_start_date,
+                    LAG(day) OVER all_sports as prev_day,
+                    LAG(day) OVER same_sport as prev_same_sport_day,
+                    LAG(suffer_score) OVER same_sport as prev_same_sport_suffer_score,
+                    COUNT(*) OVER prior_days_6 + COUNT(*) OVER same_day as sessions_7d,
+                    COUNT(*) OVER prior_days_27 + COUNT(*) OVER same_day as sessions_28d,
+                    COUNT(*) OVER same_sport_prior_days_6 + COUNT(*) OVER same_sport_same_day
+                        as same_sport_sessions_7d,
+                    COUNT(*) OVER same_sport_prior_days_27 + COUNT(*) OVER same_sport_same_day
+                        as same_sport_sessions_28d,
+                    (COALESCE(SUM(moving_time) OVER prior_days_6, 0)
+                        + SUM(moving_time) OVER same_day) / 3600 as hours_7d,
+                    (COALESCE(SUM(moving_time) OVER prior_days_27, 0)
+                        + SUM(moving_time) OVER same_day) / 3600 as hours_28d
+                FROM sessions
+                WINDOW
+                    all_sports AS (ORDER BY start_date, activity_id),
+                    same_sport AS (PARTITION BY sport_type ORDER BY start_date, activity_id),
+                    same_day AS (PARTITION BY day ORDER BY start_date, activity_id),
+                    same_sport_same_day AS (
+                        PARTITION BY sport_type, day ORDER BY start_date, activity_id
+                    ),
+                    prior_days_6 AS (
+                        ORDER BY day
+                        RANGE BETWEEN INTERVAL 6 DAYS PRECEDING AND INTERVAL 1 DAY PRECEDING
+                    ),
+                    prior_days_27 AS (
+                        ORDER BY day
+                        RANGE BETWEEN INTERVAL 27 DAYS PRECEDING AND INTERVAL 1 DAY PRECEDING
+                    ),
+                    same_sport_prior_days_6 AS (
+                        PARTITION BY sport_type ORDER BY day
+                        RANGE BETWEEN INTERVAL 6 DAYS PRECEDING AND INTERVAL 1 DAY PRECEDING
+                    ),
+                    same_sport_prior_days_27 AS (
+                        PARTITION BY sport_type ORDER BY day
+                        RANGE BETWEEN INTERVAL 27 DAYS PRECEDING AND INTERVAL 1 DAY PRECEDING
+                    )
+            ),
+            streaks AS (
+                SELECT *,
+                    SUM(CASE WHEN sport_type = prev_sport_type THEN 0 ELSE 1 END)
+                        OVER (ORDER BY start_date, activity_id) as streak
+                FROM ordered
+            )
+            SELECT
+                activity_id,
+                sport_type,
+                start_date,
+                day,
+                moving_time,
+                suffer_score,
+                average_heartrate,
+                max_heartrate,
+                prev_activity_id,
+                prev_sport_type,
+                date_diff('minute', prev_start_date, start_date) / 60.0 as hours_since_prev,
+                GREATEST(date_diff('day', prev_day, day) - 1, 0) as rest_days,
+                date_diff('day', prev_same_sport_day, day) as days_since_same_sport,
+                prev_same_sport_suffer_score,
+                FIRST_VALUE(prev_sport_type) OVER streak_order as prev_other_sport_type,
+                date_diff(
+                    'minute', FIRST_VALUE(prev_start_date) OVER streak_order, start_date
+                ) / 60.0 as hours_since_other_sport,
+                sessions_7d,
+                sessions_28d,
+                same_sport_sessions_7d,
+                same_sport_sessions_28d,
+                hours_7d,
+                hours_28d
+            FROM streaks
+            WINDOW streak_order AS (PARTITION BY streak ORDER BY start_date, activity_id)
+            ORDER BY sport_type, start_date
+        """,
+        )
+
+        record_table_version(self.conn, "session_gaps")
+        count = self.conn.execute("SELECT COUNT(*) FROM session_gaps").fetchone()[0]
+        tracer.annotate(rows=count)
+        print(f"Session gaps built for {count} activities")
+
+    @tracer.traced("build rollups")
+    def build_rollups(self) -> None:
+        """Build the daily x sport_type rollup cube used by weekly/monthly queries.
+
+        Cells are also split on whether the activities have a moving time, so
+        per-session averages can leave out zero-duration entries with
+        `WHERE timed`.
+        """
+        print("Building daily rollups...")
+
+        metric_columns = ",\n                ".join(
+            f"COUNT({column}) as {prefix}_n,\n"
+            f"                SUM({column}) as {prefix}_sum,\n"
+            f"                SUM({column}::DOUBLE * {column}) as {prefix}_sumsq,\n"
+            f"                MIN({column}) as {prefix}_min,\n"
+            f"                MAX({column}) as {prefix}_max"
+            for prefix, column in ROLLUP_METRICS.items()
+        )
+
+        cells = f"""
+            SELECT 
+                start_date::DATE as day,
+                sport_type,
+                COALESCE(moving_time > 0, false) as timed,
+                COUNT(*) as activities,
+                {metric_columns}
+            FROM activities a
+            WHERE start_date IS NOT NULL
+            {{where}}
+            GROUP BY day, sport_type, timed
+        """
+
+        # The cube is kept across loads: only the day/sport cells that
+        # load_activities touched are recomputed. Without a cube yet (or one
+        # from before the timed split) it is built from every activity.
+        current = self.conn.execute("""
+            SELECT COUNT(*) FROM duckdb_columns()
+            WHERE table_name = 'daily_rollup' AND column_name = 'timed'
+        """).fetchone()[0]
+        if not current:
+            self._execute(
+                "table daily_rollup",
+                "CREATE OR REPLACE TABLE daily_rollup AS"
+                + cells.format(where="")
+                + "ORDER BY day, sport_type, timed",
+            )
+        else:
+            self._execute(
+                "delete changed rollup cells",
+                """
+                DELETE FROM daily_rollup r
+                USING rollup_changes c
+                WHERE r.day = c.day AND r.sport_type IS NOT DISTINCT FROM c.sport_type
+            """,
+            )
+            self._execute(
+                "insert changed rollup cells",
+                "INSERT INTO daily_rollup"
+                + cells.format(
+                    where="""AND EXISTS (
+                        SELECT 1 FROM rollup_changes c
+                        WHERE c.day = a.start_date::DATE
+                        AND c.sport_type IS NOT DISTINCT FROM a.sport_type
+                    )"""
+                ),
+            )
+
+        # Helpers to turn rollup sums back into averages and deviations
+        self._execute(
+            "macro rollup_avg",
+            """
+            CREATE OR REPLACE MACRO rollup_avg(total, n) AS
+                total / NULLIF(n, 0)
+        """,
+        )
+        self._execute(
+            "macro rollup_stddev",
+            """
+            CREATE OR REPLACE MACRO rollup_stddev(total, sumsq, n) AS
+                sqrt(GREATEST((sumsq - total * total / n) / NULLIF(n - 1, 0), 0))
+        """,
+        )
+
+        record_table_version(self.conn, "daily_rollup")
+        count = self.conn.execute("SELECT COUNT(*) FROM daily_rollup").fetchone()[0]
+        tracer.annotate(rows=count)
+        print(f"Daily rollups built ({count} day/sport cells)")
+
+    @tracer.traced("activity summary")
     def get_activity_summary(self) -> Dict[str, Any]:
         """Get summary statistics of all activities."""
         print("Generating activity summary...")
 
         # Basic counts
-        total_activities = self.conn.execute(
-            "SELECT COUNT(*) FROM activities"
+        total_activities = self._execute(
+            "query activity count", "SELECT COUNT(*) FROM activities"
         ).fetchone()[0]
 
         # Sport type breakdown
-        sport_breakdown = self.conn.execute("""
+        sport_breakdown = self._execute(
+            "query sport breakdown",
+            """
             SELECT sport_type, COUNT(*) as count
             FROM activities 
             WHERE sport_type IS NOT NULL
             GROUP BY sport_type 
             ORDER BY count DESC
-        """).fetchall()
+        """,
+        ).fetchall()
 
         # Distance and time totals
-        totals = self.conn.execute("""
+        totals = self._execute(
+            "query totals",
+            """
             SELECT 
                 ROUND(SUM(distance)/1000, 2) as total_km,
                 ROUND(SUM(moving_time)/3600, 2) as total_hours,
@@ -248,16 +1901,20 @@ class StravaAnalyzer:
                 COUNT(*) as activity_count
             FROM activities
             WHERE distance IS NOT NULL
-        """).fetchone()
+        """,
+        ).fetchone()
 
         # Date range
-        date_range = self.conn.execute("""
+        date_range = self._execute(
+            "query date range",
+            """
             SELECT 
                 MIN(start_date) as first_activity,
                 MAX(start_date) as last_activity
             FROM activities
             WHERE start_date IS NOT NULL
-        """).fetchone()
+        """,
+        ).fetchone()
 
         return {
             "total_activities": total_activities,
@@ -273,51 +1930,66 @@ class StravaAnalyzer:
 
     def get_monthly_summary(self) -> List[Dict[str, Any]]:
         """Get monthly activity summary."""
-        return self.conn.execute("""
+        return self._execute(
+            "query monthly summary",
+            """
             SELECT 
-                strftime('%Y-%m', start_date) as month,
+                strftime('%Y-%m', day) as month,
                 sport_type,
-                COUNT(*) as activities,
-                ROUND(SUM(distance)/1000, 2) as total_km,
-                ROUND(SUM(moving_time)/3600, 2) as total_hours,
-                ROUND(AVG(average_heartrate), 1) as avg_hr
-            FROM activities
-            WHERE start_date IS NOT NULL
+                SUM(activities) as activities,
+                ROUND(SUM(distance_sum)/1000, 2) as total_km,
+                ROUND(SUM(moving_time_sum)/3600, 2) as total_hours,
+                ROUND(rollup_avg(SUM(heartrate_sum), SUM(heartrate_n)), 1) as avg_hr
+            FROM daily_rollup
             GROUP BY month, sport_type
             ORDER BY month DESC, activities DESC
-        """).fetchall()
+        """,
+        ).fetchall()
 
+    @tracer.traced("personal records")
     def get_personal_records(self) -> Dict[str, Any]:
         """Get personal records across different metrics."""
         return {
-            "longest_distance": self.conn.execute("""
+            "longest_distance": self._execute(
+                "query longest distance",
+                """
                 SELECT name, distance/1000 as km, start_date, sport_type 
                 FROM activities 
                 WHERE distance IS NOT NULL 
                 ORDER BY distance DESC 
                 LIMIT 1
-            """).fetchone(),
-            "longest_time": self.conn.execute("""
+            """,
+            ).fetchone(),
+            "longest_time": self._execute(
+                "query longest time",
+                """
                 SELECT name, moving_time/3600 as hours, start_date, sport_type 
                 FROM activities 
                 WHERE moving_time IS NOT NULL 
                 ORDER BY moving_time DESC 
                 LIMIT 1
-            """).fetchone(),
-            "highest_elevation": self.conn.execute("""
+            """,
+            ).fetchone(),
+            "highest_elevation": self._execute(
+                "query highest elevation",
+                """
                 SELECT name, total_elevation_gain as elevation_m, start_date, sport_type 
                 FROM activities 
                 WHERE total_elevation_gain IS NOT NULL 
                 ORDER BY total_elevation_gain DESC 
                 LIMIT 1
-            """).fetchone(),
-            "max_heartrate": self.conn.execute("""
+            """,
+            ).fetchone(),
+            "max_heartrate": self._execute(
+                "query max heartrate",
+                """
                 SELECT name, max_heartrate, start_date, sport_type 
                 FROM activities 
                 WHERE max_heartrate IS NOT NULL 
                 ORDER BY max_heartrate DESC 
                 LIMIT 1
-            """).fetchone(),
+            """,
+            ).fetchone(),
         }
 
     def print_summary(self) -> None:
@@ -361,293 +2033,113 @@ class StravaAnalyzer:
                 f"   Highest Elevation: {elevation:.0f} m - {name} ({sport}, {date_str})"
             )
 
+    def validate_load(self) -> None:
+        """Check loaded and derived tables before the database is published."""
+        problems = []
+        for table, expected in self.expected_rows.items():
+            actual = self.conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            if actual != expected:
+                problems.append(f"{table} has {actual} rows, expected {expected}")
+
+        # Derived tables must cover every loaded activity
+        rollup_activities, activities = self.conn.execute(
+            """
+            SELECT
+                (SELECT COALESCE(SUM(activities), 0) FROM daily_rollup),
+                (SELECT COUNT(*) FROM activities WHERE start_date IS NOT NULL)
+        """
+        ).fetchone()
+        if rollup_activities != activities:
+            problems.append(
+                f"daily_rollup covers {rollup_activities} activities, expected {activities}"
+            )
+
+        if problems:
+            raise ValueError("Load validation failed: " + "; ".join(problems))
+        print("Load validated")
+
     def create_dashboard_views(self) -> None:
-        """Create SQL views for dashboard functionality."""
+        """Create (or refresh) every dashboard view now."""
         print("Creating dashboard views...")
-        
-        # Weekly summary view
-        self.conn.execute("""
-            CREATE OR REPLACE VIEW v_weekly_summary AS
-            SELECT 
-                strftime('%Y-W%W', start_date) as week,
-                COUNT(*) as activities,
-                COUNT(DISTINCT sport_type) as sport_types,
-                ROUND(SUM(CASE WHEN distance > 0 THEN distance/1000 ELSE 0 END), 2) as total_km,
-                ROUND(SUM(moving_time)/3600, 2) as total_hours,
-                ROUND(AVG(average_heartrate), 0) as avg_hr,
-                ROUND(SUM(total_elevation_gain), 0) as total_elevation_m,
-                ROUND(AVG(suffer_score), 1) as avg_suffer_score
-            FROM activities
-            WHERE start_date >= current_date - INTERVAL '12 weeks'
-            AND start_date IS NOT NULL
-            GROUP BY week
-            ORDER BY week DESC
-        """)
-        
-        # Monthly trends view
-        self.conn.execute("""
-            CREATE OR REPLACE VIEW v_monthly_trends AS
-            SELECT 
-                strftime('%Y-%m', start_date) as month,
-                sport_type,
-                COUNT(*) as activities,
-                ROUND(SUM(CASE WHEN distance > 0 THEN distance/1000 ELSE 0 END), 2) as total_km,
-                ROUND(AVG(CASE WHEN distance > 0 THEN distance/1000 ELSE 0 END), 2) as avg_km,
-                ROUND(SUM(moving_time)/3600, 2) as total_hours,
-                ROUND(AVG(average_heartrate), 0) as avg_hr,
-                ROUND(SUM(total_elevation_gain), 0) as total_elevation_m
-            FROM activities
-            WHERE start_date >= current_date - INTERVAL '12 months'
-            AND start_date IS NOT NULL
-            GROUP BY month, sport_type
-            ORDER BY month DESC, sport_type
-        """)
-        
-        # Personal records view
-        self.conn.execute("""
-            CREATE OR REPLACE VIEW v_personal_records AS
-            SELECT 
-                'Longest Distance' as record_type,
-                sport_type,
-                name,
-                ROUND(distance/1000, 2) as value,
-                'km' as unit,
-                start_date
-            FROM activities
-            WHERE distance IS NOT NULL
-            AND distance = (SELECT MAX(distance) FROM activities a2 WHERE a2.sport_type = activities.sport_type)
-            
-            UNION ALL
-            
-            SELECT 
-                'Longest Duration' as record_type,
-                sport_type,
-                name,
-                ROUND(moving_time/3600, 2) as value,
-                'hours' as unit,
-                start_date
-            FROM activities
-            WHERE moving_time IS NOT NULL
-            AND moving_time = (SELECT MAX(moving_time) FROM activities a2 WHERE a2.sport_type = activities.sport_type)
-            
-            UNION ALL
-            
-            SELECT 
-                'Highest Elevation' as record_type,
-                sport_type,
-                name,
-                total_elevation_gain as value,
-                'm' as unit,
-                start_date
-            FROM activities
-            WHERE total_elevation_gain IS NOT NULL
-            AND total_elevation_gain = (SELECT MAX(total_elevation_gain) FROM activities a2 WHERE a2.sport_type = activities.sport_type)
-            
-            ORDER BY record_type, sport_type
-        """)
-        
-        # Training balance view
-        self.conn.execute("""
-            CREATE OR REPLACE VIEW v_training_balance AS
-            SELECT 
-                sport_type,
-                COUNT(*) as sessions,
-                ROUND(COUNT(*) * 100.0 / SUM(COUNT(*)) OVER(), 2) as percentage,
-                ROUND(SUM(CASE WHEN distance > 0 THEN distance/1000 ELSE 0 END), 2) as total_km,
-                ROUND(SUM(moving_time)/3600, 2) as total_hours,
-                ROUND(AVG(average_heartrate), 0) as avg_hr,
-                ROUND(AVG(suffer_score), 1) as avg_intensity
-            FROM activities
-            WHERE start_date >= current_date - INTERVAL '6 months'
-            AND start_date IS NOT NULL
-            GROUP BY sport_type
-            ORDER BY sessions DESC
-        """)
-        
-        # Recent activities view (last 30 days)
-        self.conn.execute("""
-            CREATE OR REPLACE VIEW v_recent_activities AS
-            SELECT 
-                start_date,
-                sport_type,
-                name,
-                ROUND(distance/1000, 2) as distance_km,
-                ROUND(moving_time/60, 1) as duration_min,
-                ROUND(total_elevation_gain, 0) as elevation_m,
-                average_heartrate as avg_hr,
-                suffer_score,
-                CASE WHEN average_speed > 0 AND distance > 0 
-                     THEN ROUND(1000 / (average_speed * 60), 2) 
-                     ELSE NULL 
-                END as pace_min_per_km
-            FROM activities
-            WHERE start_date >= current_date - INTERVAL '30 days'
-            AND start_date IS NOT NULL
-            ORDER BY start_date DESC
-        """)
-        
+        for name, artifact in self.dashboard.artifacts.items():
+            if artifact.kind == "view":
+                self.dashboard.build(name)
         print("Dashboard views created successfully")
 
     def create_dashboard_tables(self) -> None:
-        """Create pre-computed dashboard tables for faster access."""
+        """Create (or refresh) every pre-computed dashboard table now."""
         print("Creating dashboard tables...")
-        
-        # Dashboard metrics table - key performance indicators
-        self.conn.execute("""
-            CREATE OR REPLACE TABLE dashboard_metrics AS
-            WITH current_week AS (
-                SELECT 
-                    COUNT(*) as activities_this_week,
-                    ROUND(SUM(CASE WHEN distance > 0 THEN distance/1000 ELSE 0 END), 2) as km_this_week,
-                    ROUND(SUM(moving_time)/3600, 2) as hours_this_week,
-                    ROUND(AVG(suffer_score), 1) as avg_intensity_this_week
-                FROM activities 
-                WHERE start_date >= current_date - INTERVAL '7 days'
-                AND start_date < current_date
-            ),
-            last_week AS (
-                SELECT 
-                    COUNT(*) as activities_last_week,
-                    ROUND(SUM(CASE WHEN distance > 0 THEN distance/1000 ELSE 0 END), 2) as km_last_week,
-                    ROUND(SUM(moving_time)/3600, 2) as hours_last_week,
-                    ROUND(AVG(suffer_score), 1) as avg_intensity_last_week
-                FROM activities 
-                WHERE start_date >= current_date - INTERVAL '14 days'
-                AND start_date < current_date - INTERVAL '7 days'
-            ),
-            current_month AS (
-                SELECT 
-                    COUNT(*) as activities_this_month,
-                    ROUND(SUM(CASE WHEN distance > 0 THEN distance/1000 ELSE 0 END), 2) as km_this_month,
-                    ROUND(SUM(moving_time)/3600, 2) as hours_this_month
-                FROM activities 
-                WHERE start_date >= date_trunc('month', current_date)
-            )
-            SELECT 
-                'summary' as metric_type,
-                current_timestamp as updated_at,
-                cw.activities_this_week,
-                cw.km_this_week,
-                cw.hours_this_week,
-                cw.avg_intensity_this_week,
-                lw.activities_last_week,
-                lw.km_last_week,
-                lw.hours_last_week,
-                lw.avg_intensity_last_week,
-                cm.activities_this_month,
-                cm.km_this_month,
-                cm.hours_this_month,
-                -- Week over week changes
-                ROUND((cw.activities_this_week - lw.activities_last_week) * 100.0 / NULLIF(lw.activities_last_week, 0), 1) as activities_change_pct,
-                ROUND((cw.km_this_week - lw.km_last_week) * 100.0 / NULLIF(lw.km_last_week, 0), 1) as km_change_pct,
-                ROUND((cw.hours_this_week - lw.hours_last_week) * 100.0 / NULLIF(lw.hours_last_week, 0), 1) as hours_change_pct
-            FROM current_week cw
-            CROSS JOIN last_week lw  
-            CROSS JOIN current_month cm
-        """)
-        
-        # Dashboard trends table - time series data for charts
-        self.conn.execute("""
-            CREATE OR REPLACE TABLE dashboard_trends AS
-            SELECT 
-                'weekly' as period_type,
-                strftime('%Y-W%W', start_date) as period,
-                start_date as period_start,
-                sport_type,
-                COUNT(*) as activities,
-                ROUND(SUM(CASE WHEN distance > 0 THEN distance/1000 ELSE 0 END), 2) as total_km,
-                ROUND(SUM(moving_time)/3600, 2) as total_hours,
-                ROUND(AVG(average_heartrate), 0) as avg_hr,
-                ROUND(SUM(total_elevation_gain), 0) as total_elevation_m,
-                ROUND(AVG(suffer_score), 1) as avg_suffer_score
-            FROM activities
-            WHERE start_date >= current_date - INTERVAL '6 months'
-            AND start_date IS NOT NULL
-            GROUP BY period_type, period, period_start, sport_type
-            
-            UNION ALL
-            
-            SELECT 
-                'monthly' as period_type,
-                strftime('%Y-%m', start_date) as period,
-                date_trunc('month', start_date) as period_start,
-                sport_type,
-                COUNT(*) as activities,
-                ROUND(SUM(CASE WHEN distance > 0 THEN distance/1000 ELSE 0 END), 2) as total_km,
-                ROUND(SUM(moving_time)/3600, 2) as total_hours,
-                ROUND(AVG(average_heartrate), 0) as avg_hr,
-                ROUND(SUM(total_elevation_gain), 0) as total_elevation_m,
-                ROUND(AVG(suffer_score), 1) as avg_suffer_score
-            FROM activities
-            WHERE start_date >= current_date - INTERVAL '12 months'
-            AND start_date IS NOT NULL
-            GROUP BY period_type, period, period_start, sport_type
-            
-            ORDER BY period_start DESC, sport_type
-        """)
-        
-        # Dashboard comparisons table - performance comparisons
-        self.conn.execute("""
-            CREATE OR REPLACE TABLE dashboard_comparisons AS
-            WITH sport_averages AS (
-                SELECT 
-                    sport_type,
-                    ROUND(AVG(CASE WHEN distance > 0 THEN distance/1000 ELSE 0 END), 2) as avg_distance_km,
-                    ROUND(AVG(moving_time/60), 1) as avg_duration_min,
-                    ROUND(AVG(average_heartrate), 0) as avg_hr,
-                    ROUND(AVG(suffer_score), 1) as avg_suffer_score,
-                    ROUND(AVG(CASE WHEN distance > 0 AND average_speed > 0 
-                              THEN 1000 / (average_speed * 60) ELSE NULL END), 2) as avg_pace_min_km
-                FROM activities
-                WHERE start_date >= current_date - INTERVAL '6 months'
-                AND start_date IS NOT NULL
-                GROUP BY sport_type
-            ),
-            recent_averages AS (
-                SELECT 
-                    sport_type,
-                    ROUND(AVG(CASE WHEN distance > 0 THEN distance/1000 ELSE 0 END), 2) as recent_avg_distance_km,
-                    ROUND(AVG(moving_time/60), 1) as recent_avg_duration_min,
-                    ROUND(AVG(average_heartrate), 0) as recent_avg_hr,
-                    ROUND(AVG(suffer_score), 1) as recent_avg_suffer_score,
-                    ROUND(AVG(CASE WHEN distance > 0 AND average_speed > 0 
-                              THEN 1000 / (average_speed * 60) ELSE NULL END), 2) as recent_avg_pace_min_km
-                FROM activities
-                WHERE start_date >= current_date - INTERVAL '30 days'
-                AND start_date IS NOT NULL
-                GROUP BY sport_type
-            )
-            SELECT 
-                sa.sport_type,
-                sa.avg_distance_km as six_month_avg_distance,
-                ra.recent_avg_distance_km as recent_avg_distance,
-                ROUND((ra.recent_avg_distance_km - sa.avg_distance_km) * 100.0 / NULLIF(sa.avg_distance_km, 0), 1) as distance_change_pct,
-                sa.avg_duration_min as six_month_avg_duration,
-                ra.recent_avg_duration_min as recent_avg_duration,
-                ROUND((ra.recent_avg_duration_min - sa.avg_duration_min) * 100.0 / NULLIF(sa.avg_duration_min, 0), 1) as duration_change_pct,
-                sa.avg_hr as six_month_avg_hr,
-                ra.recent_avg_hr as recent_avg_hr,
-                ROUND((ra.recent_avg_hr - sa.avg_hr) * 100.0 / NULLIF(sa.avg_hr, 0), 1) as hr_change_pct,
-                sa.avg_pace_min_km as six_month_avg_pace,
-                ra.recent_avg_pace_min_km as recent_avg_pace,
-                ROUND((ra.recent_avg_pace_min_km - sa.avg_pace_min_km) * 100.0 / NULLIF(sa.avg_pace_min_km, 0), 1) as pace_change_pct
-            FROM sport_averages sa
-            LEFT JOIN recent_averages ra ON sa.sport_type = ra.sport_type
-            ORDER BY sa.sport_type
-        """)
-        
+        for name, artifact in self.dashboard.artifacts.items():
+            if artifact.kind == "table":
+                self.dashboard.build(name)
         print("Dashboard tables created successfully")
 
+    def refresh_dashboard(self) -> None:
+        """Build the dashboard views and tables that are missing or outdated."""
+        print("Refreshing dashboard...")
+        rebuilt = self.dashboard.ensure_all()
+        if rebuilt:
+            print(f"Rebuilt {len(rebuilt)} dashboard artifacts: {', '.join(rebuilt)}")
+        else:
+            print("Dashboard already up to date")
+
     def close(self) -> None:
         """Close the database connection."""
         if self.conn:
             self.conn.close()
 
 
-def main() -> None:
-    """Main entry point."""
-    # Find the most recent activity export file
-    activities_dir = Path("activities")
+def refresh_published_dashboard(live_db: Path) -> Optional[Path]:
+    """Bring the published database's dashboard up to date without a load.
+
+    Readers may have the published file open, so stale artifacts are built in
+    a staging copy, published in the same mode (snapshot or replace) as the
+    current database. Returns the database to open, or None if it failed.
+    """
+    source = published_path(live_db)
+    try:
+        conn = duckdb.connect(str(source), read_only=True)
+    except duckdb.IOException as e:
+        print(f"Cannot open {source}: {str(e).splitlines()[0]}")
+        return None
+    try:
+        registry = DashboardRegistry(conn)
+        stale = [name for name in registry.artifacts if registry.is_stale(name)]
+    finally:
+        conn.close()
+    if not stale:
+        print("Dashboard already up to date")
+        return source
+
+    try:
+        staging = prepare_staging(live_db)
+    except RuntimeError as e:
+        print(f"Cannot stage the dashboard refresh: {e}")
+        return None
+    analyzer = StravaAnalyzer(str(staging))
+    try:
+        analyzer.refresh_dashboard()
+    finally:
+        analyzer.close()
+
+    try:
+        db_path = publish(staging, live_db, versioned=current_snapshot(live_db) is not None)
+    except RuntimeError as e:
+        print(f"Cannot publish the dashboard refresh: {e}")
+        return None
+    restamp_load_state(live_db)
+    return db_path
+
+
+def load(
+    activities_dir: Path = Path("activities"),
+    dashboard: bool = False,
+    snapshot: bool = False,
+    in_place: bool = False,
+    force: bool = False,
+) -> None:
+    """Merge the exports into the database and publish it."""
+    streams_dir = activities_dir / "streams"
 
     if not activities_dir.exists():
         print("Activities directory not found. Run fetch.py first.")
@@ -659,32 +2151,116 @@ def main() -> None:
         print("No activity export files found. Run fetch.py first.")
         return
 
-    # Use the most recent file
-    latest_file = max(json_files, key=lambda f: f.stat().st_mtime)
-    print(f"Using activity file: {latest_file}")
+    # Nothing changed since the last load: leave the loaded tables untouched,
+    # but still bring the dashboard up to date if asked
+    live_db = Path("strava_activities.duckdb")
+    state = input_state(activities_dir)
+    if not force and is_up_to_date(live_db, state):
+        print(f"Nothing new to load, {published_path(live_db)} is up to date")
+        if dashboard:
+            db_path = refresh_published_dashboard(live_db)
+            if db_path:
+                print(f"Launch dashboard with: duckdb -ui {db_path}")
+        return
+
+    # Build into a staging copy unless asked to write the live database
+    try:
+        if in_place:
+            db_path = prepare_in_place(live_db)
+        else:
+            db_path = prepare_staging(live_db)
+            print(f"Loading into staging database: {db_path}")
+    except RuntimeError as e:
+        print(f"Cannot stage the load: {e}")
+        return
 
     # Initialize analyzer
-    analyzer = StravaAnalyzer()
+    analyzer = StravaAnalyzer(str(db_path))
 
     try:
         # Create tables and load data
         analyzer.create_tables()
-        analyzer.load_json_data(latest_file)
-        
-        # Create dashboard views and tables
+        analyzer.merge_exports(activities_dir)
+        analyzer.load_activities()
+        analyzer.load_streams(streams_dir)
+        analyzer.load_gear(activities_dir / "gear")
+        analyzer.build_gear_usage()
+        analyzer.build_hr_zones()
+        analyzer.build_gap()
+        analyzer.build_splits()
+        analyzer.build_features()
+        analyzer.build_session_gaps()
+        analyzer.build_rollups()
+
+        # Views store no data, so they are always created; dashboard tables
+        # are built on first access, or now if asked
         analyzer.create_dashboard_views()
-        analyzer.create_dashboard_tables()
+        if dashboard:
+            analyzer.refresh_dashboard()
+
+        if not in_place:
+            analyzer.validate_load()
 
         # Print summary
         analyzer.print_summary()
 
-        print(f"\nDatabase saved as: {analyzer.db_path}")
-        print("You can now query the data using DuckDB CLI or any SQL client")
-        print("Launch dashboard with: duckdb -ui strava_activities.duckdb")
+    except ValueError as e:
+        print(f"{e}\nStaging database kept for inspection: {db_path}")
+        print(f"Readers still see: {published_path(live_db)}")
+        return
 
     finally:
         analyzer.close()
 
+    if in_place:
+        retire_current(live_db)
+    else:
+        try:
+            db_path = publish(db_path, live_db, versioned=snapshot)
+        except RuntimeError as e:
+            print(f"Cannot publish the load: {e}")
+            return
+    save_load_state(live_db, state)
+
+    print(f"\nDatabase saved as: {db_path}")
+    print("You can now query the data using DuckDB CLI or any SQL client")
+    if not dashboard:
+        print("Build dashboard tables with: uv run analyze.py --dashboard")
+    print(f"Launch dashboard with: duckdb -ui {db_path}")
+
+
+def main() -> None:
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="Load Strava exports into DuckDB")
+    parser.add_argument(
+        "--dashboard",
+        action="store_true",
+        help="also build outdated dashboard views/tables now (e.g. before duckdb -ui)",
+    )
+    parser.add_argument(
+        "--snapshot",
+        action="store_true",
+        help="publish a versioned copy under snapshots/ instead of replacing the database",
+    )
+    parser.add_argument(
+        "--in-place",
+        action="store_true",
+        help="load straight into the live database (no staging copy or validation)",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="reload even if the export and caches did not change since the last load",
+    )
+    args = parser.parse_args()
+
+    load(
+        dashboard=args.dashboard,
+        snapshot=args.snapshot,
+        in_place=args.in_place,
+        force=args.force,
+    )
+
 
 if __name__ == "__main__":
     main()
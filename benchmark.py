@@ -0,0 +1,478 @@
+#!/usr/bin/env python3
+"""
+Strava Query Benchmarks
+
+Generates deterministic synthetic Strava exports and times ingestion, view and
+table creation, and every query in queries/ at several history sizes.
+Results are written as JSON so runs can be compared between commits.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import duckdb
+
+from analyze import StravaAnalyzer, split_statements
+
+# 1M activities takes a while to generate and load, so it is opt-in via --sizes
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+
+# Last day of the generated history. Fixed so a seed gives the same data on
+# any day and runs stay comparable.
+DEFAULT_END_DATE = date(2026, 1, 1)
+SCRIPTS_DIR = Path(__file__).resolve().parent
+QUERIES_DIR = Path("queries")
+RESULTS_DIR = Path("benchmarks")
+
+# Sport mix as (sport_type, weight, typical distance km, typical speed m/s,
+# typical average heart rate). Strength sessions have no distance.
+SPORT_MIX = [
+    ("Run", 40, 10.0, 3.2, 148),
+    ("TrailRun", 10, 18.0, 2.4, 145),
+    ("Ride", 20, 45.0, 7.5, 135),
+    ("Crossfit", 10, 0.0, 0.0, 140),
+    ("WeightTraining", 10, 0.0, 0.0, 118),
+    ("Walk", 5, 5.0, 1.4, 100),
+    ("Hike", 5, 12.0, 1.1, 115),
+]
+
+# Roughly how many activities one athlete logs over the generated history
+ACTIVITIES_PER_ATHLETE = 5_000
+HISTORY_YEARS = 10
+
+
+def encode_polyline(points: List[tuple]) -> str:
+    """Encode (lat, lng) points with Google's polyline algorithm."""
+    encoded = []
+    prev_lat = prev_lng = 0
+
+    for lat, lng in points:
+        lat_e5, lng_e5 = round(lat * 1e5), round(lng * 1e5)
+        for delta in (lat_e5 - prev_lat, lng_e5 - prev_lng):
+            value = ~(delta << 1) if delta < 0 else delta << 1
+            while value >= 0x20:
+                encoded.append(chr((0x20 | (value & 0x1F)) + 63))
+                value >>= 5
+            encoded.append(chr(value + 63))
+        prev_lat, prev_lng = lat_e5, lng_e5
+
+    return "".join(encoded)
+
+
+class SyntheticExport:
+    """Deterministic generator of Strava-like activity exports."""
+
+    def __init__(self, seed: int = 42, end_date: Optional[date] = None):
+        self.seed = seed
+        self.end_date = end_date or DEFAULT_END_DATE
+
+    def activities(self, count: int) -> Iterator[Dict[str, Any]]:
+        """Generate `count` activities in the Strava summary activity format, one at a time."""
+        rng = random.Random(self.seed)
+        sports = [sport for sport, *_ in SPORT_MIX]
+        weights = [weight for _, weight, *_ in SPORT_MIX]
+        profiles = {sport: profile for sport, _, *profile in SPORT_MIX}
+        athletes = max(1, count // ACTIVITIES_PER_ATHLETE)
+        history_seconds = HISTORY_YEARS * 365 * 86400
+        end = datetime.combine(self.end_date, datetime.min.time())
+
+        for i in range(count):
+            sport = rng.choices(sports, weights)[0]
+            distance_km, speed, avg_hr = profiles[sport]
+            athlete_id = 1000 + i % athletes
+
+            start = end - timedelta(seconds=rng.randrange(history_seconds))
+            has_distance = distance_km > 0
+            gear_prefix = "b" if sport == "Ride" else "g"  # Strava's bike/shoe ids
+            distance = (
+                max(0.5, rng.gauss(distance_km, distance_km * 0.4)) * 1000
+                if has_distance
+                else 0.0
+            )
+            if has_distance:
+                average_speed = max(0.5, rng.gauss(speed, speed * 0.12))
+                moving_time = int(distance / average_speed)
+            else:
+                average_speed = 0.0
+                moving_time = int(max(900, rng.gauss(3600, 900)))
+            elevation = (
+                rng.expovariate(1 / (distance / 1000 * 15)) if has_distance else 0.0
+            )
+            has_heartrate = rng.random() < 0.85
+            heartrate = rng.gauss(avg_hr, 8) if has_heartrate else None
+
+            start_lat = 45.0 + (athlete_id % 50) * 0.1 + rng.uniform(-0.05, 0.05)
+            start_lng = 5.0 + (athlete_id % 30) * 0.1 + rng.uniform(-0.05, 0.05)
+            points = [(start_lat, start_lng)]
+            if has_distance:
+                for _ in range(49):
+                    lat, lng = points[-1]
+                    points.append(
+                        (lat + rng.uniform(-1e-3, 1e-3), lng + rng.uniform(-1e-3, 1e-3))
+                    )
+
+            activity_id = 10_000_000_000 + i
+            yield {
+                "resource_state": 2,
+                "athlete": {"id": athlete_id, "resource_state": 1},
+                "name": f"Synthetic {sport} {i}",
+                "distance": round(distance, 1),
+                "moving_time": moving_time,
+                "elapsed_time": int(moving_time * rng.uniform(1.0, 1.2)),
+                "total_elevation_gain": round(elevation, 1),
+                "type": sport,
+                "sport_type": sport,
+                "workout_type": rng.choice([None, 0, 1, 2, 3]),
+                "id": activity_id,
+                "start_date": start.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                "start_date_local": (start + timedelta(hours=2)).strftime(
+                    "%Y-%m-%dT%H:%M:%SZ"
+                ),
+                "timezone": "(GMT+01:00) Europe/Paris",
+                "utc_offset": 7200.0,
+                "location_city": None,
+                "location_state": None,
+                "location_country": "France",
+                "achievement_count": rng.randint(0, 5),
+                "kudos_count": rng.randint(0, 30),
+                "comment_count": rng.randint(0, 3),
+                "athlete_count": rng.randint(1, 4),
+                "photo_count": 0,
+                "map": {
+                    "id": f"a{activity_id}",
+                    "summary_polyline": encode_polyline(points) if has_distance else "",
+                    "resource_state": 2,
+                },
+                "trainer": False,
+                "commute": False,
+                "manual": False,
+                "private": False,
+                "visibility": "everyone",
+                "flagged": False,
+                "gear_id": f"{gear_prefix}{athlete_id}{rng.randint(1, 3)}"
+                if has_distance
+                else None,
+                "start_latlng": [round(start_lat, 6), round(start_lng, 6)],
+                "end_latlng": [round(points[-1][0], 6), round(points[-1][1], 6)],
+                "average_speed": round(average_speed, 3),
+                "max_speed": round(average_speed * rng.uniform(1.3, 2.0), 3),
+                "average_cadence": round(rng.gauss(85, 4), 1) if has_distance else None,
+                "average_watts": round(rng.gauss(190, 30), 1) if sport == "Ride" else None,
+                "max_watts": rng.randint(400, 900) if sport == "Ride" else None,
+                "weighted_average_watts": rng.randint(170, 260) if sport == "Ride" else None,
+                "device_watts": sport == "Ride",
+                "kilojoules": round(moving_time * 0.19, 1) if sport == "Ride" else None,
+                "has_heartrate": has_heartrate,
+                "average_heartrate": round(heartrate, 1) if has_heartrate else None,
+                "max_heartrate": round(heartrate + rng.uniform(10, 30)) if has_heartrate else None,
+                "heartrate_opt_out": False,
+                "display_hide_heartrate_option": has_heartrate,
+                "elev_high": round(300 + elevation, 1) if has_distance else None,
+                "elev_low": 300.0 if has_distance else None,
+                "upload_id": activity_id + 1,
+                "upload_id_str": str(activity_id + 1),
+                "external_id": f"synthetic-{i}.fit",
+                "from_accepted_tag": False,
+                "pr_count": rng.randint(0, 3),
+                "total_photo_count": 0,
+                "has_kudoed": False,
+                "suffer_score": max(0, round(moving_time / 60 * (heartrate - 90) / 40))
+                if has_heartrate
+                else None,
+            }
+
+    def streams(self, activity: Dict[str, Any]) -> Dict[str, Any]:
+        """Generate 10-second streams in the shape fetch.py caches."""
+        rng = random.Random(activity["id"])
+        samples = max(2, activity["moving_time"] // 10)
+        speed = activity["average_speed"]
+        avg_hr = activity["average_heartrate"] or 0
+
+        time_stream, distance, altitude, heartrate = [], [], [], []
+        for s in range(samples):
+            time_stream.append(s * 10)
+            distance.append(round(s * 10 * speed, 1))
+            altitude.append(round(300 + 50 * math.sin(s / 30) + rng.uniform(-1, 1), 1))
+            heartrate.append(int(avg_hr + 12 * math.sin(s / 45) + rng.gauss(0, 4)))
+
+        record = {
+            "activity_id": activity["id"],
+            "time": time_stream,
+            "moving": [True] * samples,
+        }
+        if speed > 0:
+            record["distance"] = distance
+            record["altitude"] = altitude
+        if activity["has_heartrate"]:
+            record["heartrate"] = heartrate
+        return record
+
+    def write(self, count: int, directory: Path, with_streams: int = 0) -> Path:
+        """Write an export (and optionally streams) the way fetch.py lays them out.
+
+        Activities are written as they are generated, so memory use does not
+        grow with `count`.
+        """
+        directory.mkdir(parents=True, exist_ok=True)
+        streams_dir = directory / "streams"
+        if with_streams:
+            streams_dir.mkdir(exist_ok=True)
+
+        export_file = directory / f"synthetic_{self.end_date}_export.json"
+        with open(export_file, "w") as f:
+            f.write("[")
+            for i, activity in enumerate(self.activities(count)):
+                f.write(",\n" if i else "\n")
+                json.dump(activity, f)
+                if i < with_streams:
+                    with open(streams_dir / f"{activity['id']}.json", "w") as stream:
+                        json.dump(self.streams(activity), stream)
+            f.write("\n]")
+
+        return export_file
+
+
+class Benchmark:
+    """Times the analysis pipeline and query library on synthetic data."""
+
+    def __init__(self, repeat: int = 3, streams: int = 200, seed: int = 42):
+        self.repeat = repeat
+        self.streams = streams
+        self.generator = SyntheticExport(seed=seed)
+
+    def _time(self, func: Callable[[], Any]) -> float:
+        """Run func once and return its wall time, with pipeline output silenced."""
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            func()
+        return time.perf_counter() - start
+
+    def run_size(self, size: int) -> Dict[str, Any]:
+        """Benchmark every pipeline stage and query at one history size."""
+        print(f"Benchmarking {size:,} activities...")
+        steps: Dict[str, Dict[str, Any]] = {}
+
+        with tempfile.TemporaryDirectory() as tmp:
+            data_dir = Path(tmp) / "activities"
+            start = time.perf_counter()
+            self.generator.write(size, data_dir, min(size, self.streams))
+            steps["generate"] = {"seconds": time.perf_counter() - start}
+            print(f"   generate: {steps['generate']['seconds']:.2f}s")
+
+            analyzer = StravaAnalyzer(str(Path(tmp) / "bench.duckdb"))
+            try:
+                pipeline = [
+                    ("create_tables", analyzer.create_tables),
+                    ("merge_exports", lambda: analyzer.merge_exports(data_dir)),
+                    ("ingest", analyzer.load_activities),
+                    # Second merge of the same export: only stats the file
+                    ("merge_exports_unchanged", lambda: analyzer.merge_exports(data_dir)),
+                    ("load_streams", lambda: analyzer.load_streams(data_dir / "streams")),
+                    ("build_gear_usage", analyzer.build_gear_usage),
+                    ("build_hr_zones", analyzer.build_hr_zones),
+                    ("build_gap", analyzer.build_gap),
+                    ("build_splits", analyzer.build_splits),
+                    ("build_features", analyzer.build_features),
+                    ("build_session_gaps", analyzer.build_session_gaps),
+                    ("build_rollups", analyzer.build_rollups),
+                    ("create_dashboard_views", analyzer.create_dashboard_views),
+                    ("create_dashboard_tables", analyzer.create_dashboard_tables),
+                ]
+                for name, func in pipeline:
+                    steps[name] = {"seconds": self._time(func)}
+                    print(f"   {name}: {steps[name]['seconds']:.2f}s")
+
+                for query_file in sorted(QUERIES_DIR.glob("*/*.sql")):
+                    statements = split_statements(query_file.read_text())
+                    for index, statement in enumerate(statements, 1):
+                        name = str(query_file.relative_to(QUERIES_DIR))
+                        if len(statements) > 1:
+                            name = f"{name}#{index}"
+                        steps[f"query:{name}"] = self._time_query(analyzer.conn, statement)
+                print(f"   {len(steps) - len(pipeline) - 1} queries timed")
+            finally:
+                analyzer.close()
+
+        return {"size": size, "steps": steps}
+
+    def _time_query(self, conn: duckdb.DuckDBPyConnection, sql: str) -> Dict[str, Any]:
+        """Best-of-N wall time and row count for one statement."""
+        timings = []
+        rows = 0
+        try:
+            for _ in range(self.repeat):
+                start = time.perf_counter()
+                rows = len(conn.execute(sql).fetchall())
+                timings.append(time.perf_counter() - start)
+        except duckdb.Error as e:
+            return {"error": str(e).splitlines()[0]}
+        return {"seconds": min(timings), "rows": rows}
+
+    def run_startup(self) -> Dict[str, Dict[str, Any]]:
+        """Best-of-N wall time of CLI commands that should return immediately."""
+        print("Benchmarking startup...")
+        commands = {
+            "import fetch": ["-c", "import fetch"],
+            "import analyze": ["-c", "import analyze"],
+            "strava.py --help": [str(SCRIPTS_DIR / "strava.py"), "--help"],
+            "strava.py load (nothing new)": [str(SCRIPTS_DIR / "strava.py"), "load"],
+            "analyze.py (nothing new)": [str(SCRIPTS_DIR / "analyze.py")],
+        }
+        steps: Dict[str, Dict[str, Any]] = {}
+
+        with tempfile.TemporaryDirectory() as tmp:
+            self.generator.write(100, Path(tmp) / "activities", 0)
+            env = {**os.environ, "PYTHONPATH": str(SCRIPTS_DIR)}
+
+            def launch(args: List[str]) -> None:
+                subprocess.run(
+                    [sys.executable, *args],
+                    cwd=tmp,
+                    env=env,
+                    stdout=subprocess.DEVNULL,
+                    check=True,
+                )
+
+            # First load, so the timed ones find nothing new
+            launch([str(SCRIPTS_DIR / "analyze.py")])
+            for name, args in commands.items():
+                timings = []
+                for _ in range(self.repeat):
+                    start = time.perf_counter()
+                    launch(args)
+                    timings.append(time.perf_counter() - start)
+                steps[f"startup:{name}"] = {"seconds": min(timings)}
+                print(f"   {name}: {min(timings) * 1000:.0f}ms")
+
+        return steps
+
+    def run(self, sizes: List[int], startup: bool = False) -> Dict[str, Any]:
+        """Benchmark all sizes and return the result document."""
+        results = {
+            "commit": git_commit(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "duckdb": duckdb.__version__,
+            "platform": platform.platform(),
+            "repeat": self.repeat,
+            "streams": self.streams,
+            "seed": self.generator.seed,
+            "end_date": self.generator.end_date.isoformat(),
+            "runs": [self.run_size(size) for size in sizes],
+        }
+        if startup:
+            results["startup"] = self.run_startup()
+        return results
+
+
+def git_commit() -> str:
+    """Short hash of the checked-out commit, or 'unknown' outside git."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def save_results(results: Dict[str, Any]) -> Path:
+    """Save results to benchmarks/<commit>_<timestamp>.json."""
+    RESULTS_DIR.mkdir(exist_ok=True)
+    stamp = results["timestamp"].replace(":", "").replace("-", "")
+    filename = RESULTS_DIR / f"{results['commit']}_{stamp}.json"
+    with open(filename, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results saved to {filename}")
+    return filename
+
+
+def compare_results(baseline_file: Path, current_file: Path, threshold: float) -> int:
+    """Print per-step slowdowns between two result files, return regression count."""
+    with open(baseline_file) as f:
+        baseline = json.load(f)
+    with open(current_file) as f:
+        current = json.load(f)
+
+    print(f"\nComparing {current['commit']} against {baseline['commit']}")
+    baseline_runs = {run["size"]: run["steps"] for run in baseline["runs"]}
+    sections = []
+    for run in current["runs"]:
+        before = baseline_runs.get(run["size"])
+        if before is not None:
+            sections.append((f"{run['size']:,} activities", before, run["steps"]))
+    if "startup" in baseline and "startup" in current:
+        sections.append(("Startup", baseline["startup"], current["startup"]))
+
+    regressions = 0
+    for title, before, steps in sections:
+        print(f"\n{title}:")
+        for step, result in steps.items():
+            old = before.get(step, {}).get("seconds")
+            new = result.get("seconds")
+            if not old or new is None:
+                continue
+            ratio = new / old
+            flag = ""
+            if ratio > 1 + threshold:
+                flag = "  <- slower"
+                regressions += 1
+            print(f"   {step}: {old:.4f}s -> {new:.4f}s ({ratio:.2f}x){flag}")
+
+    print(f"\n{regressions} steps slower by more than {threshold:.0%}")
+    return regressions
+
+
+def main() -> None:
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="Benchmark the analysis pipeline")
+    parser.add_argument(
+        "--sizes",
+        default=",".join(str(size) for size in DEFAULT_SIZES),
+        help="comma-separated activity counts (default: 1k,10k,100k; add 1000000 for 1M)",
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="query repetitions")
+    parser.add_argument(
+        "--streams", type=int, default=200, help="activities that get streams"
+    )
+    parser.add_argument("--seed", type=int, default=42, help="generator seed")
+    parser.add_argument(
+        "--compare", type=Path, help="baseline results file to compare against"
+    )
+    parser.add_argument(
+        "--threshold", type=float, default=0.2, help="slowdown flagged as regression"
+    )
+    parser.add_argument(
+        "--startup",
+        action="store_true",
+        help="also time CLI startup and no-op loads",
+    )
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+    benchmark = Benchmark(repeat=args.repeat, streams=args.streams, seed=args.seed)
+    results = benchmark.run(sizes, startup=args.startup)
+    results_file = save_results(results)
+
+    if args.compare:
+        regressions = compare_results(args.compare, results_file, args.threshold)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,535 @@
+"""
+Dashboard Artifacts
+
+Declares every dashboard view and table with the tables it reads from. Views
+store no data and are created on every load; tables are materialized lazily:
+built on first access and rebuilt only when their SQL, one of their inputs or
+(for date-windowed tables) the current date changed since the last build.
+"""
+
+import hashlib
+import re
+from datetime import date
+from typing import Dict, List, Optional
+
+import duckdb
+
+from tracing import tracer
+
+
+class Artifact:
+    """A dashboard view or table and the tables it reads from."""
+
+    def __init__(
+        self,
+        name: str,
+        kind: str,
+        sql: str,
+        inputs: List[str],
+        description: str = "",
+        daily: bool = False,
+    ):
+        self.name = name
+        self.kind = kind
+        self.sql = sql
+        self.inputs = inputs
+        self.description = description
+        # Tables filtered on current_date go stale when the day changes
+        self.daily = daily
+
+    def create_sql(self) -> str:
+        """Statement that (re)creates the artifact."""
+        return f"CREATE OR REPLACE {self.kind.upper()} {self.name} AS{self.sql}"
+
+
+def record_table_version(conn: duckdb.DuckDBPyConnection, table: str) -> None:
+    """Store a content fingerprint of a loaded table for staleness checks."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS _table_versions (
+            table_name VARCHAR PRIMARY KEY,
+            fingerprint VARCHAR,
+            updated_at TIMESTAMP
+        )
+    """)
+    fingerprint = _content_fingerprint(conn, table)
+    conn.execute(
+        "INSERT OR REPLACE INTO _table_versions VALUES (?, ?, current_timestamp)",
+        [table, fingerprint],
+    )
+
+
+def _content_fingerprint(conn: duckdb.DuckDBPyConnection, table: str) -> str:
+    """Row count and order-independent hash of every row of a table."""
+    count, row_hash = conn.execute(
+        f"SELECT COUNT(*), bit_xor(hash(t)) FROM {table} t"
+    ).fetchone()
+    return f"{count}:{row_hash}"
+
+
+class DashboardRegistry:
+    """Materializes dashboard artifacts on first access, rebuilding only stale ones."""
+
+    def __init__(
+        self,
+        conn: duckdb.DuckDBPyConnection,
+        artifacts: Optional[List[Artifact]] = None,
+    ):
+        self.conn = conn
+        self.artifacts: Dict[str, Artifact] = {
+            artifact.name: artifact for artifact in (artifacts or ARTIFACTS)
+        }
+        self._initialized = False
+
+    def _init_state(self) -> None:
+        """Create the bookkeeping tables on first use."""
+        if self._initialized:
+            return
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS _artifact_builds (
+                name VARCHAR PRIMARY KEY,
+                fingerprint VARCHAR,
+                built_at TIMESTAMP
+            )
+        """)
+        self._initialized = True
+
+    def input_fingerprint(self, table: str) -> str:
+        """Fingerprint of an input: an artifact's own, the recorded one, or computed."""
+        if table in self.artifacts:
+            return self.fingerprint(table)
+
+        exists = self.conn.execute(
+            "SELECT COUNT(*) FROM duckdb_tables() WHERE table_name = '_table_versions'"
+        ).fetchone()[0]
+        if exists:
+            row = self.conn.execute(
+                "SELECT fingerprint FROM _table_versions WHERE table_name = ?", [table]
+            ).fetchone()
+            if row:
+                return row[0]
+
+        # Not recorded by the loader (e.g. hand-edited config tables)
+        return _content_fingerprint(self.conn, table)
+
+    def fingerprint(self, name: str) -> str:
+        """Hash of everything an artifact's contents depend on."""
+        artifact = self.artifacts[name]
+        parts = [artifact.kind, artifact.sql]
+        # Views are evaluated at query time, so only tables depend on input data
+        if artifact.kind == "table":
+            parts += [
+                f"{table}={self.input_fingerprint(table)}" for table in artifact.inputs
+            ]
+            if artifact.daily:
+                parts.append(date.today().isoformat())
+        return hashlib.sha256("\n".join(parts).encode()).hexdigest()
+
+    def _exists(self, name: str) -> bool:
+        """Whether the artifact's view or table is present in the database."""
+        return bool(
+            self.conn.execute(
+                """
+                SELECT COUNT(*) FROM (
+                    SELECT table_name as name FROM duckdb_tables()
+                    UNION ALL
+                    SELECT view_name as name FROM duckdb_views()
+                )
+                WHERE name = ?
+            """,
+                [name],
+            ).fetchone()[0]
+        )
+
+    def is_stale(self, name: str) -> bool:
+        """Whether the artifact is missing or was built from different inputs."""
+        if not self._exists(name) or not self._exists("_artifact_builds"):
+            return True
+        row = self.conn.execute(
+            "SELECT fingerprint FROM _artifact_builds WHERE name = ?", [name]
+        ).fetchone()
+        return row is None or row[0] != self.fingerprint(name)
+
+    def build(self, name: str) -> None:
+        """(Re)create an artifact unconditionally and record its fingerprint."""
+        self._init_state()
+        artifact = self.artifacts[name]
+        for table in artifact.inputs:
+            if table in self.artifacts:
+                self.ensure(table)
+
+        tracer.execute(self.conn, f"{artifact.kind} {name}", artifact.create_sql())
+        self.conn.execute(
+            "INSERT OR REPLACE INTO _artifact_builds VALUES (?, ?, current_timestamp)",
+            [name, self.fingerprint(name)],
+        )
+
+    def ensure(self, name: str) -> bool:
+        """Build an artifact if it is stale. Returns whether it was rebuilt."""
+        if not self.is_stale(name):
+            return False
+        self.build(name)
+        return True
+
+    @tracer.traced("ensure dashboard artifacts")
+    def ensure_all(self, kind: Optional[str] = None) -> List[str]:
+        """Bring every (or every view/table) artifact up to date."""
+        return [
+            name
+            for name, artifact in self.artifacts.items()
+            if (kind is None or artifact.kind == kind) and self.ensure(name)
+        ]
+
+    def stale_for_sql(self, sql: str) -> List[str]:
+        """Artifacts a query references that are missing or outdated (nothing is built)."""
+        return [
+            name
+            for name in self.artifacts
+            if re.search(rf"\b{name}\b", sql) and self.is_stale(name)
+        ]
+
+
+ARTIFACTS = [
+    Artifact(
+        "v_weekly_summary",
+        "view",
+        inputs=["daily_rollup"],
+        description="Weekly summary view",
+        sql="""
+        SELECT 
+            strftime('%Y-W%W', day) as week,
+            SUM(activities) as activities,
+            COUNT(DISTINCT sport_type) as sport_types,
+            ROUND(COALESCE(SUM(distance_sum), 0)/1000, 2) as total_km,
+            ROUND(SUM(moving_time_sum)/3600, 2) as total_hours,
+            ROUND(rollup_avg(SUM(heartrate_sum), SUM(heartrate_n)), 0) as avg_hr,
+            ROUND(SUM(elevation_sum), 0) as total_elevation_m,
+            ROUND(rollup_avg(SUM(suffer_score_sum), SUM(suffer_score_n)), 1) as avg_suffer_score
+        FROM daily_rollup
+        WHERE day >= current_date - INTERVAL '12 weeks'
+        GROUP BY week
+        ORDER BY week DESC
+    """,
+    ),
+    Artifact(
+        "v_monthly_trends",
+        "view",
+        inputs=["daily_rollup"],
+        description="Monthly trends view",
+        sql="""
+        SELECT 
+            strftime('%Y-%m', day) as month,
+            sport_type,
+            SUM(activities) as activities,
+            ROUND(COALESCE(SUM(distance_sum), 0)/1000, 2) as total_km,
+            ROUND(COALESCE(SUM(distance_sum), 0)/1000 / SUM(activities), 2) as avg_km,
+            ROUND(SUM(moving_time_sum)/3600, 2) as total_hours,
+            ROUND(rollup_avg(SUM(heartrate_sum), SUM(heartrate_n)), 0) as avg_hr,
+            ROUND(SUM(elevation_sum), 0) as total_elevation_m
+        FROM daily_rollup
+        WHERE day >= current_date - INTERVAL '12 months'
+        GROUP BY month, sport_type
+        ORDER BY month DESC, sport_type
+    """,
+    ),
+    Artifact(
+        "v_personal_records",
+        "view",
+        inputs=["activities"],
+        description="Personal records view",
+        sql="""
+        SELECT 
+            'Longest Distance' as record_type,
+            sport_type,
+            name,
+            ROUND(distance/1000, 2) as value,
+            'km' as unit,
+            start_date
+        FROM activities
+        WHERE distance IS NOT NULL
+        AND distance = (SELECT MAX(distance) FROM activities a2 WHERE a2.sport_type = activities.sport_type)
+
+        UNION ALL
+
+        SELECT 
+            'Longest Duration' as record_type,
+            sport_type,
+            name,
+            ROUND(moving_time/3600, 2) as value,
+            'hours' as unit,
+            start_date
+        FROM activities
+        WHERE moving_time IS NOT NULL
+        AND moving_time = (SELECT MAX(moving_time) FROM activities a2 WHERE a2.sport_type = activities.sport_type)
+
+        UNION ALL
+
+        SELECT 
+            'Highest Elevation' as record_type,
+            sport_type,
+            name,
+            total_elevation_gain as value,
+            'm' as unit,
+            start_date
+        FROM activities
+        WHERE total_elevation_gain IS NOT NULL
+        AND total_elevation_gain = (SELECT MAX(total_elevation_gain) FROM activities a2 WHERE a2.sport_type = activities.sport_type)
+
+        ORDER BY record_type, sport_type
+    """,
+    ),
+    Artifact(
+        "v_training_balance",
+        "view",
+        inputs=["daily_rollup"],
+        description="Training balance view",
+        sql="""
+        SELECT 
+            sport_type,
+            SUM(activities) as sessions,
+            ROUND(SUM(activities) * 100.0 / SUM(SUM(activities)) OVER(), 2) as percentage,
+            ROUND(COALESCE(SUM(distance_sum), 0)/1000, 2) as total_km,
+            ROUND(SUM(moving_time_sum)/3600, 2) as total_hours,
+            ROUND(rollup_avg(SUM(heartrate_sum), SUM(heartrate_n)), 0) as avg_hr,
+            ROUND(rollup_avg(SUM(suffer_score_sum), SUM(suffer_score_n)), 1) as avg_intensity
+        FROM daily_rollup
+        WHERE day >= current_date - INTERVAL '6 months'
+        GROUP BY sport_type
+        ORDER BY sessions DESC
+    """,
+    ),
+    Artifact(
+        "v_recent_activities",
+        "view",
+        inputs=["activities"],
+        description="Recent activities view (last 30 days)",
+        sql="""
+        SELECT 
+            start_date,
+            sport_type,
+            name,
+            ROUND(distance/1000, 2) as distance_km,
+            ROUND(moving_time/60, 1) as duration_min,
+            ROUND(total_elevation_gain, 0) as elevation_m,
+            average_heartrate as avg_hr,
+            suffer_score,
+            CASE WHEN average_speed > 0 AND distance > 0 
+                 THEN ROUND(1000 / (average_speed * 60), 2) 
+                 ELSE NULL 
+            END as pace_min_per_km
+        FROM activities
+        WHERE start_date >= current_date - INTERVAL '30 days'
+        AND start_date IS NOT NULL
+        ORDER BY start_date DESC
+    """,
+    ),
+    Artifact(
+        "v_hr_zone_time",
+        "view",
+        inputs=["activity_hr_zones", "activities", "hr_zone_thresholds"],
+        description="Time in heart rate zone, one row per activity and zone",
+        sql="""
+        WITH per_zone AS (
+            SELECT
+                activity_id,
+                athlete_id,
+                generate_subscripts(zone_seconds, 1) as zone,
+                UNNEST(zone_seconds) as seconds
+            FROM activity_hr_zones
+        )
+        SELECT
+            a.id as activity_id,
+            a.start_date,
+            strftime('%Y-W%W', a.start_date) as week,
+            strftime('%Y-%m', a.start_date) as month,
+            a.sport_type,
+            pz.zone,
+            t.label as hr_zone,
+            pz.seconds
+        FROM per_zone pz
+        JOIN activities a ON a.id = pz.activity_id
+        JOIN hr_zone_thresholds t ON t.athlete_id = pz.athlete_id AND t.zone = pz.zone
+    """,
+    ),
+    Artifact(
+        "v_gear_usage",
+        "view",
+        inputs=["gear_usage", "gear", "gear_thresholds"],
+        description="Mileage per shoe and bike with the next alert threshold",
+        sql="""
+        SELECT
+            u.gear_id,
+            COALESCE(g.nickname, g.name, u.gear_id) as gear,
+            CASE WHEN u.gear_id LIKE 'b%' THEN 'bike' ELSE 'shoe' END as kind,
+            g.brand_name,
+            g.model_name,
+            COALESCE(g.retired, false) as retired,
+            u.activities,
+            ROUND(u.distance / 1000, 1) as distance_km,
+            ROUND(u.moving_time / 3600, 1) as moving_hours,
+            ROUND(u.elevation_gain, 0) as elevation_gain_m,
+            (
+                SELECT MIN(t.threshold_km)
+                FROM gear_thresholds t
+                WHERE t.kind = CASE WHEN u.gear_id LIKE 'b%' THEN 'bike' ELSE 'shoe' END
+                AND t.threshold_km > u.distance / 1000
+            ) as next_alert_km
+        FROM gear_usage u
+        LEFT JOIN gear g ON g.id = u.gear_id
+        ORDER BY retired, distance_km DESC
+    """,
+    ),
+    Artifact(
+        "dashboard_metrics",
+        "table",
+        inputs=["daily_rollup"],
+        description="Dashboard metrics table - key performance indicators",
+        daily=True,
+        sql="""
+        WITH current_week AS (
+            SELECT 
+                COALESCE(SUM(activities), 0) as activities_this_week,
+                ROUND(COALESCE(SUM(distance_sum), 0)/1000, 2) as km_this_week,
+                ROUND(SUM(moving_time_sum)/3600, 2) as hours_this_week,
+                ROUND(rollup_avg(SUM(suffer_score_sum), SUM(suffer_score_n)), 1) as avg_intensity_this_week
+            FROM daily_rollup 
+            WHERE day >= current_date - INTERVAL '7 days'
+            AND day < current_date
+        ),
+        last_week AS (
+            SELECT 
+                COALESCE(SUM(activities), 0) as activities_last_week,
+                ROUND(COALESCE(SUM(distance_sum), 0)/1000, 2) as km_last_week,
+                ROUND(SUM(moving_time_sum)/3600, 2) as hours_last_week,
+                ROUND(rollup_avg(SUM(suffer_score_sum), SUM(suffer_score_n)), 1) as avg_intensity_last_week
+            FROM daily_rollup 
+            WHERE day >= current_date - INTERVAL '14 days'
+            AND day < current_date - INTERVAL '7 days'
+        ),
+        current_month AS (
+            SELECT 
+                COALESCE(SUM(activities), 0) as activities_this_month,
+                ROUND(COALESCE(SUM(distance_sum), 0)/1000, 2) as km_this_month,
+                ROUND(SUM(moving_time_sum)/3600, 2) as hours_this_month
+            FROM daily_rollup 
+            WHERE day >= date_trunc('month', current_date)
+        )
+        SELECT 
+            'summary' as metric_type,
+            current_timestamp::TIMESTAMP as updated_at,
+            cw.activities_this_week,
+            cw.km_this_week,
+            cw.hours_this_week,
+            cw.avg_intensity_this_week,
+            lw.activities_last_week,
+            lw.km_last_week,
+            lw.hours_last_week,
+            lw.avg_intensity_last_week,
+            cm.activities_this_month,
+            cm.km_this_month,
+            cm.hours_this_month,
+            -- Week over week changes
+            ROUND((cw.activities_this_week - lw.activities_last_week) * 100.0 / NULLIF(lw.activities_last_week, 0), 1) as activities_change_pct,
+            ROUND((cw.km_this_week - lw.km_last_week) * 100.0 / NULLIF(lw.km_last_week, 0), 1) as km_change_pct,
+            ROUND((cw.hours_this_week - lw.hours_last_week) * 100.0 / NULLIF(lw.hours_last_week, 0), 1) as hours_change_pct
+        FROM current_week cw
+        CROSS JOIN last_week lw  
+        CROSS JOIN current_month cm
+    """,
+    ),
+    Artifact(
+        "dashboard_trends",
+        "table",
+        inputs=["daily_rollup"],
+        description="Dashboard trends table - time series data for charts",
+        daily=True,
+        sql="""
+        SELECT 
+            'weekly' as period_type,
+            strftime('%Y-W%W', day) as period,
+            date_trunc('week', day) as period_start,
+            sport_type,
+            SUM(activities) as activities,
+            ROUND(COALESCE(SUM(distance_sum), 0)/1000, 2) as total_km,
+            ROUND(SUM(moving_time_sum)/3600, 2) as total_hours,
+            ROUND(rollup_avg(SUM(heartrate_sum), SUM(heartrate_n)), 0) as avg_hr,
+            ROUND(SUM(elevation_sum), 0) as total_elevation_m,
+            ROUND(rollup_avg(SUM(suffer_score_sum), SUM(suffer_score_n)), 1) as avg_suffer_score
+        FROM daily_rollup
+        WHERE day >= current_date - INTERVAL '6 months'
+        GROUP BY period_type, period, period_start, sport_type
+
+        UNION ALL
+
+        SELECT 
+            'monthly' as period_type,
+            strftime('%Y-%m', day) as period,
+            date_trunc('month', day) as period_start,
+            sport_type,
+            SUM(activities) as activities,
+            ROUND(COALESCE(SUM(distance_sum), 0)/1000, 2) as total_km,
+            ROUND(SUM(moving_time_sum)/3600, 2) as total_hours,
+            ROUND(rollup_avg(SUM(heartrate_sum), SUM(heartrate_n)), 0) as avg_hr,
+            ROUND(SUM(elevation_sum), 0) as total_elevation_m,
+            ROUND(rollup_avg(SUM(suffer_score_sum), SUM(suffer_score_n)), 1) as avg_suffer_score
+        FROM daily_rollup
+        WHERE day >= current_date - INTERVAL '12 months'
+        GROUP BY period_type, period, period_start, sport_type
+
+        ORDER BY period_start DESC, sport_type
+    """,
+    ),
+    Artifact(
+        "dashboard_comparisons",
+        "table",
+        inputs=["activities"],
+        description="Dashboard comparisons table - performance comparisons",
+        daily=True,
+        sql="""
+        WITH sport_averages AS (
+            SELECT 
+                sport_type,
+                ROUND(AVG(CASE WHEN distance > 0 THEN distance/1000 ELSE 0 END), 2) as avg_distance_km,
+                ROUND(AVG(moving_time/60), 1) as avg_duration_min,
+                ROUND(AVG(average_heartrate), 0) as avg_hr,
+                ROUND(AVG(suffer_score), 1) as avg_suffer_score,
+                ROUND(AVG(CASE WHEN distance > 0 AND average_speed > 0 
+                          THEN 1000 / (average_speed * 60) ELSE NULL END), 2) as avg_pace_min_km
+            FROM activities
+            WHERE start_date >= current_date - INTERVAL '6 months'
+            AND start_date IS NOT NULL
+            GROUP BY sport_type
+        ),
+        recent_averages AS (
+            SELECT 
+                sport_type,
+                ROUND(AVG(CASE WHEN distance > 0 THEN distance/1000 ELSE 0 END), 2) as recent_avg_distance_km,
+                ROUND(AVG(moving_time/60), 1) as recent_avg_duration_min,
+                ROUND(AVG(average_heartrate), 0) as recent_avg_hr,
+                ROUND(AVG(suffer_score), 1) as recent_avg_suffer_score,
+                ROUND(AVG(CASE WHEN distance > 0 AND average_speed > 0 
+                          THEN 1000 / (average_speed * 60) ELSE NULL END), 2) as recent_avg_pace_min_km
+            FROM activities
+            WHERE start_date >= current_date - INTERVAL '30 days'
+            AND start_date IS NOT NULL
+            GROUP BY sport_type
+        )
+        SELECT 
+            sa.sport_type,
+            sa.avg_distance_km as six_month_avg_distance,
+            ra.recent_avg_distance_km as recent_avg_distance,
+            ROUND((ra.recent_avg_distance_km - sa.avg_distance_km) * 100.0 / NULLIF(sa.avg_distance_km, 0), 1) as distance_change_pct,
+            sa.avg_duration_min as six_month_avg_duration,
+            ra.recent_avg_duration_min as recent_avg_duration,
+            ROUND((ra.recent_avg_duration_min - sa.avg_duration_min) * 100.0 / NULLIF(sa.avg_duration_min, 0), 1) as duration_change_pct,
+            sa.avg_hr as six_month_avg_hr,
+            ra.recent_avg_hr as recent_avg_hr,
+            ROUND((ra.recent_avg_hr - sa.avg_hr) * 100.0 / NULLIF(sa.avg_hr, 0), 1) as hr_change_pct,
+            sa.avg_pace_min_km as six_month_avg_pace,
+            ra.recent_avg_pace_min_km as recent_avg_pace,
+            ROUND((ra.recent_avg_pace_min_km - sa.avg_pace_min_km) * 100.0 / NULLIF(sa.avg_pace_min_km, 0), 1) as pace_change_pct
+        FROM sport_averages sa
+        LEFT JOIN recent_averages ra ON sa.sport_type = ra.sport_type
+        ORDER BY sa.sport_type
+    """,
+    ),
+]
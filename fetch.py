@@ -13,11 +13,41 @@ import webbrowser
 from collections import Counter
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
 from urllib.parse import urlencode
 
 import httpx
-from aiohttp import web
+
+from tracing import tracer
+
+# The OAuth callback server is only needed without a refresh token, so aiohttp
+# is imported where it is used
+if TYPE_CHECKING:
+    from aiohttp import web
+
+# Streams requested for each activity. Heart rate feeds the zone engine,
+# distance/altitude/moving are kept alongside so every stream-based analysis
+# reads from the same cached file.
+STREAM_KEYS = ["time", "distance", "altitude", "heartrate", "moving"]
+
+# Attempts per API call on network errors and 5xx responses
+MAX_ATTEMPTS = 3
+
+# Start time of the newest activity fetched so far, used to ask Strava whether
+# anything new exists before downloading the whole history again
+SYNC_STATE_FILE = Path("activities") / ".sync_state.json"
+
+
+def read_json(path: Path) -> Any:
+    """Parse a JSON file (run through asyncio.to_thread from coroutines)."""
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_json(path: Path, data: Any) -> None:
+    """Write a JSON file (run through asyncio.to_thread from coroutines)."""
+    with open(path, "w") as f:
+        json.dump(data, f)
 
 
 class StravaFetcher:
@@ -29,21 +59,41 @@ class StravaFetcher:
         self.port = port
         self.redirect_uri = f"http://localhost:{port}"
 
+    async def _get(
+        self, client: httpx.AsyncClient, url: str, stage: str, **kwargs: Any
+    ) -> httpx.Response:
+        """GET with retries on transient failures, traced as one span."""
+        with tracer.span(stage, url=url) as span:
+            for attempt in range(1, MAX_ATTEMPTS + 1):
+                try:
+                    response = await client.get(url, **kwargs)
+                    if response.status_code < 500 or attempt == MAX_ATTEMPTS:
+                        break
+                except httpx.TransportError:
+                    if attempt == MAX_ATTEMPTS:
+                        raise
+                span.add("retries")
+                await asyncio.sleep(2**attempt)
+
+            span.set(status=response.status_code, bytes=len(response.content))
+            return response
+
     async def exchange_code_for_tokens(
         self, auth_code: str
     ) -> Optional[Dict[str, Any]]:
         """Exchange authorization code for access tokens."""
         try:
             async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    "https://www.strava.com/oauth/token",
-                    data={
-                        "client_id": self.client_id,
-                        "client_secret": self.client_secret,
-                        "code": auth_code,
-                        "grant_type": "authorization_code",
-                    },
-                )
+                with tracer.span("http POST /oauth/token"):
+                    response = await client.post(
+                        "https://www.strava.com/oauth/token",
+                        data={
+                            "client_id": self.client_id,
+                            "client_secret": self.client_secret,
+                            "code": auth_code,
+                            "grant_type": "authorization_code",
+                        },
+                    )
                 response.raise_for_status()
                 tokens = response.json()
 
@@ -61,12 +111,114 @@ class StravaFetcher:
 
         return None
 
+    async def refresh_access_token(self, refresh_token: str) -> Optional[Dict[str, Any]]:
+        """Get a fresh access token from a stored refresh token."""
+        try:
+            async with httpx.AsyncClient() as client:
+                with tracer.span("http POST /oauth/token"):
+                    response = await client.post(
+                        "https://www.strava.com/oauth/token",
+                        data={
+                            "client_id": self.client_id,
+                            "client_secret": self.client_secret,
+                            "refresh_token": refresh_token,
+                            "grant_type": "refresh_token",
+                        },
+                    )
+                response.raise_for_status()
+                tokens = response.json()
+
+                if tokens.get("refresh_token") not in (None, refresh_token):
+                    print("Strava rotated your refresh token. Update your .env file with:")
+                    print(f"STRAVA_REFRESH_TOKEN={tokens['refresh_token']}")
+                    os.environ["STRAVA_REFRESH_TOKEN"] = tokens["refresh_token"]
+
+                return tokens
+
+        except httpx.HTTPStatusError as e:
+            print(f"Token refresh failed: {e.response.text}")
+        except Exception as e:
+            print(f"Error refreshing token: {e}")
+
+        return None
+
+    async def has_new_activities(self, access_token: str) -> bool:
+        """Whether Strava has activities newer than the last sync."""
+        if not SYNC_STATE_FILE.exists():
+            return True
+
+        after = (await asyncio.to_thread(read_json, SYNC_STATE_FILE))["latest_start"]
+
+        try:
+            async with httpx.AsyncClient() as client:
+                response = await self._get(
+                    client,
+                    "https://www.strava.com/api/v3/athlete/activities",
+                    "http GET /athlete/activities?after",
+                    headers={"Authorization": f"Bearer {access_token}"},
+                    params={"after": after, "per_page": 1},
+                )
+                response.raise_for_status()
+                return bool(response.json())
+        except httpx.HTTPError as e:
+            # Can't tell, so fetch everything as before
+            print(f"Could not check for new activities: {e}")
+            return True
+
+    def save_sync_state(self, activities: List[Dict[str, Any]]) -> None:
+        """Remember the newest activity start time for the next sync."""
+        starts = [
+            datetime.fromisoformat(activity["start_date"].replace("Z", "+00:00"))
+            for activity in activities
+            if activity.get("start_date")
+        ]
+        if not starts:
+            return
+
+        SYNC_STATE_FILE.parent.mkdir(exist_ok=True)
+        with open(SYNC_STATE_FILE, "w") as f:
+            json.dump({"latest_start": int(max(starts).timestamp())}, f)
+
+    def load_latest_export(self) -> List[Dict[str, Any]]:
+        """Activities of the most recently saved export, if any."""
+        exports = sorted(
+            Path("activities").glob("*_export.json"), key=lambda path: path.stat().st_mtime
+        )
+        if not exports:
+            return []
+        with open(exports[-1]) as f:
+            return json.load(f)
+
+    @tracer.traced("sync")
+    async def sync(self, refresh_token: str, force: bool = False) -> Optional[bool]:
+        """Fetch new activities without the browser flow.
+
+        Returns whether new data arrived, or None when the refresh token failed.
+        """
+        tokens = await self.refresh_access_token(refresh_token)
+        if not tokens:
+            return None
+
+        access_token = tokens["access_token"]
+        if not force and not await self.has_new_activities(access_token):
+            print("No new activities on Strava since the last sync")
+            # Streams and gear a rate limit left pending are still picked up
+            activities = self.load_latest_export()
+            fetched = await self.fetch_activity_streams(access_token, activities)
+            fetched += await self.fetch_gear(access_token, activities)
+            return fetched > 0
+
+        await self.process_activities(access_token)
+        return True
+
     async def fetch_athlete_info(self, access_token: str) -> Optional[Dict[str, Any]]:
         """Fetch athlete information."""
         try:
             async with httpx.AsyncClient() as client:
-                response = await client.get(
+                response = await self._get(
+                    client,
                     "https://www.strava.com/api/v3/athlete",
+                    "http GET /athlete",
                     headers={"Authorization": f"Bearer {access_token}"},
                 )
                 response.raise_for_status()
@@ -79,6 +231,7 @@ class StravaFetcher:
 
         return None
 
+    @tracer.traced("fetch all activities")
     async def fetch_all_activities(self, access_token: str) -> List[Dict[str, Any]]:
         """Fetch all activities using pagination."""
         all_activities = []
@@ -92,13 +245,17 @@ class StravaFetcher:
                 print(f"   Page {page}...")
 
                 try:
-                    response = await client.get(
-                        "https://www.strava.com/api/v3/athlete/activities",
-                        headers={"Authorization": f"Bearer {access_token}"},
-                        params={"per_page": per_page, "page": page},
-                    )
-                    response.raise_for_status()
-                    activities = response.json()
+                    with tracer.span("page", page=page) as span:
+                        response = await self._get(
+                            client,
+                            "https://www.strava.com/api/v3/athlete/activities",
+                            "http GET /athlete/activities",
+                            headers={"Authorization": f"Bearer {access_token}"},
+                            params={"per_page": per_page, "page": page},
+                        )
+                        response.raise_for_status()
+                        activities = response.json()
+                        span.set(rows=len(activities))
 
                     # If no activities returned, we've reached the end
                     if not activities:
@@ -127,6 +284,129 @@ class StravaFetcher:
 
         return all_activities
 
+    @tracer.traced("fetch activity streams")
+    async def fetch_activity_streams(
+        self,
+        access_token: str,
+        activities: List[Dict[str, Any]],
+        streams_dir: Path = Path("activities") / "streams",
+    ) -> int:
+        """Fetch time-series streams for activities, skipping already cached ones."""
+        await asyncio.to_thread(streams_dir.mkdir, parents=True, exist_ok=True)
+
+        pending = [
+            activity
+            for activity in activities
+            if not activity.get("manual")
+            and (activity.get("has_heartrate") or activity.get("distance"))
+            and not (streams_dir / f"{activity['id']}.json").exists()
+        ]
+
+        if not pending:
+            print("All activity streams already cached")
+            return 0
+
+        print(f"Fetching streams for {len(pending)} activities...")
+        fetched = 0
+
+        async with httpx.AsyncClient() as client:
+            for activity in pending:
+                try:
+                    response = await self._get(
+                        client,
+                        f"https://www.strava.com/api/v3/activities/{activity['id']}/streams",
+                        "http GET /activities/{id}/streams",
+                        headers={"Authorization": f"Bearer {access_token}"},
+                        params={"keys": ",".join(STREAM_KEYS), "key_by_type": "true"},
+                    )
+
+                    # Rate limited: keep what we have, the next run resumes from the cache
+                    if response.status_code == 429:
+                        print("   Rate limit reached, remaining streams will be fetched next run")
+                        break
+
+                    response.raise_for_status()
+                    streams = response.json()
+
+                    # Flatten to one array per stream type
+                    record = {"activity_id": activity["id"]}
+                    for key in STREAM_KEYS:
+                        if key in streams:
+                            record[key] = streams[key]["data"]
+
+                    await asyncio.to_thread(
+                        write_json, streams_dir / f"{activity['id']}.json", record
+                    )
+
+                    fetched += 1
+                    if fetched % 50 == 0:
+                        print(f"   Got streams for {fetched}/{len(pending)} activities")
+
+                    await asyncio.sleep(0.1)
+
+                except httpx.HTTPStatusError as e:
+                    print(f"Failed to fetch streams for {activity['id']}: {e.response.text}")
+                except Exception as e:
+                    print(f"Error fetching streams for {activity['id']}: {e}")
+                    break
+
+        print(f"{fetched} activity streams saved to {streams_dir}")
+        return fetched
+
+    @tracer.traced("fetch gear")
+    async def fetch_gear(
+        self,
+        access_token: str,
+        activities: List[Dict[str, Any]],
+        gear_dir: Path = Path("activities") / "gear",
+    ) -> int:
+        """Fetch details of every shoe and bike used, skipping already cached ones."""
+        await asyncio.to_thread(gear_dir.mkdir, parents=True, exist_ok=True)
+
+        gear_ids = {activity["gear_id"] for activity in activities if activity.get("gear_id")}
+        pending = sorted(
+            gear_id for gear_id in gear_ids if not (gear_dir / f"{gear_id}.json").exists()
+        )
+
+        if not pending:
+            print("All gear details already cached")
+            return 0
+
+        print(f"Fetching details for {len(pending)} gear items...")
+        fetched = 0
+
+        async with httpx.AsyncClient() as client:
+            for gear_id in pending:
+                try:
+                    response = await self._get(
+                        client,
+                        f"https://www.strava.com/api/v3/gear/{gear_id}",
+                        "http GET /gear/{id}",
+                        headers={"Authorization": f"Bearer {access_token}"},
+                    )
+
+                    if response.status_code == 429:
+                        print("   Rate limit reached, remaining gear will be fetched next run")
+                        break
+
+                    response.raise_for_status()
+                    await asyncio.to_thread(
+                        write_json, gear_dir / f"{gear_id}.json", response.json()
+                    )
+
+                    fetched += 1
+                    await asyncio.sleep(0.1)
+
+                except httpx.HTTPStatusError as e:
+                    print(f"Failed to fetch gear {gear_id}: {e.response.text}")
+                except Exception as e:
+                    print(f"Error fetching gear {gear_id}: {e}")
+                    break
+
+        print(f"{fetched} gear items saved to {gear_dir}")
+        return fetched
+
+    @tracer.traced("save activities")
     def save_activities(self, activities: List[Dict[str, Any]], username: str) -> Path:
         """Save activities to JSON file with timestamp."""
         # Ensure activities directory exists
@@ -141,6 +421,7 @@ class StravaFetcher:
         with open(filename, "w") as f:
             json.dump(activities, f, indent=2)
 
+        tracer.annotate(rows=len(activities), bytes=filename.stat().st_size)
         print(f"{len(activities)} total activities saved to {filename}")
         return filename
 
@@ -155,8 +436,10 @@ class StravaFetcher:
         for sport, count in sport_summary.most_common():
             print(f"   {sport}: {count}")
 
-    async def handle_auth_callback(self, request: web.Request) -> web.Response:
+    async def handle_auth_callback(self, request: "web.Request") -> "web.Response":
         """Handle OAuth callback from Strava."""
+        from aiohttp import web
+
         code = request.query.get("code")
 
         if not code:
@@ -191,6 +474,7 @@ class StravaFetcher:
 
         return web.Response(text=html_response, content_type="text/html")
 
+    @tracer.traced("process activities")
     async def process_activities(self, access_token: str) -> None:
         """Process activities: fetch athlete info and all activities."""
         # Fetch athlete info
@@ -211,10 +495,17 @@ class StravaFetcher:
         if activities:
             # Save activities
             self.save_activities(activities, username)
+            self.save_sync_state(activities)
 
             # Show summary
             self.print_activity_summary(activities)
 
+            # Fetch streams for time-in-zone and other per-sample analysis
+            await self.fetch_activity_streams(access_token, activities)
+
+            # Shoe and bike details for gear mileage tracking
+            await self.fetch_gear(access_token, activities)
+
     def create_auth_url(self) -> str:
         """Create Strava authorization URL."""
         params = {
@@ -236,6 +527,8 @@ class StravaFetcher:
 
     async def start_auth_server(self) -> None:
         """Start the OAuth callback server."""
+        from aiohttp import web
+
         app = web.Application()
         app.router.add_get("/", self.handle_auth_callback)
 
@@ -277,6 +570,11 @@ async def main() -> None:
     # Create fetcher with proper credentials
     fetcher = StravaFetcher(client_id, client_secret)
 
+    # A stored refresh token skips the browser flow
+    refresh_token = os.getenv("STRAVA_REFRESH_TOKEN")
+    if refresh_token and await fetcher.sync(refresh_token) is not None:
+        return
+
     try:
         await fetcher.start_auth_server()
     except KeyboardInterrupt:
@@ -114,33 +114,29 @@ AND distance > 1000
 GROUP BY month, sport_type
 ORDER BY month DESC, sport_type;
 
--- Heart Rate Zones Distribution (Running)
+-- Heart Rate Zones Distribution (Running, time in zone from HR streams)
 SELECT 
     sport_type,
-    CASE 
-        WHEN average_heartrate < 130 THEN 'Zone 1 (Recovery < 130)'
-        WHEN average_heartrate < 145 THEN 'Zone 2 (Aerobic 130-145)'
-        WHEN average_heartrate < 160 THEN 'Zone 3 (Tempo 145-160)'
-        WHEN average_heartrate < 175 THEN 'Zone 4 (Threshold 160-175)'
-        ELSE 'Zone 5 (VO2Max > 175)'
-    END as hr_zone,
-    COUNT(*) as runs,
-    ROUND(COUNT(*) * 100.0 / SUM(COUNT(*)) OVER (PARTITION BY sport_type), 1) as percentage,
-    ROUND(AVG(distance/1000), 2) as avg_distance_km
-FROM activities 
+    hr_zone,
+    COUNT(*) FILTER (WHERE seconds > 0) as runs,
+    ROUND(SUM(seconds)/3600, 2) as hours_in_zone,
+    ROUND(SUM(seconds) * 100.0 / SUM(SUM(seconds)) OVER (PARTITION BY sport_type), 1) as percentage
+FROM v_hr_zone_time
 WHERE sport_type IN ('Run', 'TrailRun')
-AND has_heartrate = true
-AND average_heartrate > 100
 AND start_date >= current_date - INTERVAL '6 months'
-GROUP BY sport_type, hr_zone
-ORDER BY sport_type, 
-    CASE hr_zone
-        WHEN 'Zone 1 (Recovery < 130)' THEN 1
-        WHEN 'Zone 2 (Aerobic 130-145)' THEN 2
-        WHEN 'Zone 3 (Tempo 145-160)' THEN 3
-        WHEN 'Zone 4 (Threshold 160-175)' THEN 4
-        ELSE 5
-    END;
+GROUP BY sport_type, zone, hr_zone
+ORDER BY sport_type, zone;
+
+-- Weekly Time in Zone (Last 12 Weeks)
+SELECT 
+    week,
+    hr_zone,
+    ROUND(SUM(seconds)/60, 0) as minutes_in_zone,
+    ROUND(SUM(seconds) * 100.0 / SUM(SUM(seconds)) OVER (PARTITION BY week), 1) as percentage
+FROM v_hr_zone_time
+WHERE start_date >= current_date - INTERVAL '12 weeks'
+GROUP BY week, zone, hr_zone
+ORDER BY week DESC, zone;
 
 -- ============================================================
 -- STRENGTH TRAINING ANALYSIS
@@ -148,23 +144,23 @@ ORDER BY sport_type,
 
 -- Strength Training Frequency
 SELECT 
-    strftime('%Y-%m', start_date) as month,
+    strftime('%Y-%m', day) as month,
     sport_type,
-    COUNT(*) as sessions,
-    ROUND(AVG(moving_time/60), 1) as avg_duration_min,
-    ROUND(AVG(suffer_score), 1) as avg_intensity,
+    SUM(activities) as sessions,
+    ROUND(rollup_avg(SUM(moving_time_sum), SUM(moving_time_n))/60, 1) as avg_duration_min,
+    ROUND(rollup_avg(SUM(suffer_score_sum), SUM(suffer_score_n)), 1) as avg_intensity,
     -- Sessions per week calculation
-    ROUND(COUNT(*) * 7.0 / 
-        (date_diff('day', MIN(start_date), MAX(start_date)) + 1), 1) as sessions_per_week
-FROM activities 
+    ROUND(SUM(activities) * 7.0 / 
+        (date_diff('day', MIN(day), MAX(day)) + 1), 1) as sessions_per_week
+FROM daily_rollup 
 WHERE sport_type IN ('Crossfit', 'WeightTraining')
-AND start_date >= current_date - INTERVAL '6 months'
+AND day >= current_date - INTERVAL '6 months'
 GROUP BY month, sport_type
 ORDER BY month DESC, sport_type;
 
 -- Weekly Training Schedule (Best Days)
 SELECT 
-    CASE strftime('%w', start_date)
+    CASE strftime('%w', day)
         WHEN '0' THEN 'Sunday'
         WHEN '1' THEN 'Monday' 
         WHEN '2' THEN 'Tuesday'
@@ -174,15 +170,15 @@ SELECT
         WHEN '6' THEN 'Saturday'
     END as day_name,
     sport_type,
-    COUNT(*) as sessions,
-    ROUND(COUNT(*) * 100.0 / SUM(COUNT(*)) OVER (PARTITION BY sport_type), 1) as percentage,
-    ROUND(AVG(moving_time/60), 1) as avg_duration_min,
-    ROUND(AVG(suffer_score), 1) as avg_intensity
-FROM activities 
+    SUM(activities) as sessions,
+    ROUND(SUM(activities) * 100.0 / SUM(SUM(activities)) OVER (PARTITION BY sport_type), 1) as percentage,
+    ROUND(rollup_avg(SUM(moving_time_sum), SUM(moving_time_n))/60, 1) as avg_duration_min,
+    ROUND(rollup_avg(SUM(suffer_score_sum), SUM(suffer_score_n)), 1) as avg_intensity
+FROM daily_rollup 
 WHERE sport_type IN ('Crossfit', 'WeightTraining')
-AND start_date >= current_date - INTERVAL '6 months'
-GROUP BY strftime('%w', start_date), day_name, sport_type
-ORDER BY sport_type, strftime('%w', start_date);
+AND day >= current_date - INTERVAL '6 months'
+GROUP BY strftime('%w', day), day_name, sport_type
+ORDER BY sport_type, strftime('%w', day);
 
 -- ============================================================
 -- PERSONAL RECORDS & ACHIEVEMENTS
@@ -281,15 +277,15 @@ ORDER BY sport_type;
 -- Training Consistency Score (Activities per week)
 SELECT 
     sport_type,
-    COUNT(*) as total_sessions,
-    ROUND(COUNT(*) * 52.0 / 
-        (date_diff('day', MIN(start_date), current_date) / 365.25), 1) as sessions_per_year,
-    ROUND(COUNT(*) / 
-        (date_diff('day', MIN(start_date), current_date) / 7), 1) as sessions_per_week,
-    MIN(start_date) as first_activity,
-    MAX(start_date) as last_activity
-FROM activities 
-WHERE start_date >= current_date - INTERVAL '12 months'
+    SUM(activities) as total_sessions,
+    ROUND(SUM(activities) * 52.0 / 
+        (date_diff('day', MIN(day), current_date) / 365.25), 1) as sessions_per_year,
+    ROUND(SUM(activities) / 
+        (date_diff('day', MIN(day), current_date) / 7), 1) as sessions_per_week,
+    MIN(day) as first_activity,
+    MAX(day) as last_activity
+FROM daily_rollup 
+WHERE day >= current_date - INTERVAL '12 months'
 GROUP BY sport_type
 ORDER BY sessions_per_week DESC;
 
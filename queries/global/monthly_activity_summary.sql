@@ -1,11 +1,10 @@
 -- Monthly activity summary
 SELECT 
-    strftime('%Y-%m', start_date) as month,
-    COUNT(*) as activities,
-    ROUND(SUM(distance)/1000, 2) as total_km,
-    ROUND(AVG(distance)/1000, 2) as avg_km_per_activity,
-    ROUND(SUM(moving_time)/3600, 2) as total_hours
-FROM activities
-WHERE start_date IS NOT NULL
+    strftime('%Y-%m', day) as month,
+    SUM(activities) as activities,
+    ROUND(SUM(distance_sum)/1000, 2) as total_km,
+    ROUND(rollup_avg(SUM(distance_sum), SUM(distance_n))/1000, 2) as avg_km_per_activity,
+    ROUND(SUM(moving_time_sum)/3600, 2) as total_hours
+FROM daily_rollup
 GROUP BY month
 ORDER BY month DESC;
\ No newline at end of file
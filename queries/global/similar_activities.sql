@@ -0,0 +1,8 @@
+-- Similar activities
+-- Top 10 activities most like your latest run (distance, elevation, pace, GAP, heart rate, zones, pacing)
+-- Swap the subquery for any activity id, e.g. similar_activities(1234567890, k := 20)
+SELECT *
+FROM similar_activities(
+    (SELECT id FROM activities WHERE sport_type = 'Run' ORDER BY start_date DESC LIMIT 1),
+    k := 10
+);
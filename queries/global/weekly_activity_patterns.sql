@@ -1,7 +1,7 @@
 -- Weekly activity patterns
 SELECT 
-    strftime('%w', start_date) as day_of_week,
-    CASE strftime('%w', start_date)
+    strftime('%w', day) as day_of_week,
+    CASE strftime('%w', day)
         WHEN '0' THEN 'Sunday'
         WHEN '1' THEN 'Monday' 
         WHEN '2' THEN 'Tuesday'
@@ -10,9 +10,8 @@ SELECT
         WHEN '5' THEN 'Friday'
         WHEN '6' THEN 'Saturday'
     END as day_name,
-    COUNT(*) as activities,
-    ROUND(AVG(distance)/1000, 2) as avg_distance_km
-FROM activities
-WHERE start_date IS NOT NULL
+    SUM(activities) as activities,
+    ROUND(rollup_avg(SUM(distance_sum), SUM(distance_n))/1000, 2) as avg_distance_km
+FROM daily_rollup
 GROUP BY day_of_week, day_name
 ORDER BY day_of_week;
\ No newline at end of file
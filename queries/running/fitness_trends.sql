@@ -11,6 +11,10 @@ WITH monthly_fitness AS (
         ROUND(AVG(CASE WHEN average_speed > 0 THEN 1000 / (average_speed * 60) ELSE NULL END), 2) as avg_pace_min_km,
         ROUND(AVG(average_heartrate / NULLIF(average_speed * 3.6, 0)), 1) as aerobic_efficiency,
         
+        -- Effort-normalized (grade-adjusted) pace, so hilly months compare fairly
+        ROUND(AVG(1000 / (g.gap_speed * 60)), 2) as avg_gap_pace_min_km,
+        ROUND(AVG(average_heartrate / NULLIF(g.gap_speed * 3.6, 0)), 1) as gap_aerobic_efficiency,
+        
         -- Endurance indicators
         ROUND(AVG(distance)/1000, 2) as avg_distance_km,
         ROUND(AVG(moving_time)/60, 1) as avg_duration_min,
@@ -25,7 +29,8 @@ WITH monthly_fitness AS (
         ROUND(SUM(moving_time)/3600, 1) as monthly_hours,
         ROUND(SUM(total_elevation_gain), 0) as monthly_elevation_m
         
-    FROM activities
+    FROM activities a
+    LEFT JOIN (SELECT activity_id, gap_speed FROM activity_gap) g ON g.activity_id = a.id
     WHERE sport_type IN ('Run', 'TrailRun')
     AND distance > 1000
     AND average_speed > 0
@@ -41,6 +46,16 @@ fitness_trends AS (
             ORDER BY month 
             ROWS BETWEEN 2 PRECEDING AND CURRENT ROW
         ) as pace_trend_3m,
+        AVG(avg_gap_pace_min_km) OVER (
+            PARTITION BY sport_type 
+            ORDER BY month 
+            ROWS BETWEEN 2 PRECEDING AND CURRENT ROW
+        ) as gap_pace_trend_3m,
+        AVG(gap_aerobic_efficiency) OVER (
+            PARTITION BY sport_type 
+            ORDER BY month 
+            ROWS BETWEEN 2 PRECEDING AND CURRENT ROW
+        ) as gap_efficiency_trend_3m,
         AVG(aerobic_efficiency) OVER (
             PARTITION BY sport_type 
             ORDER BY month 
@@ -60,11 +75,15 @@ SELECT
     
     -- Current month metrics
     avg_pace_min_km as current_pace,
+    avg_gap_pace_min_km as current_gap_pace,
     aerobic_efficiency as current_efficiency,
+    gap_aerobic_efficiency as current_gap_efficiency,
     monthly_volume_km as current_volume,
     
     -- Trend indicators (3-month rolling average)
     ROUND(pace_trend_3m, 2) as pace_trend_3m,
+    ROUND(gap_pace_trend_3m, 2) as gap_pace_trend_3m,
+    ROUND(gap_efficiency_trend_3m, 1) as gap_efficiency_trend_3m,
     ROUND(efficiency_trend_3m, 1) as efficiency_trend_3m,
     ROUND(volume_trend_3m, 1) as volume_trend_3m,
     
@@ -1,5 +1,32 @@
 -- Running efficiency and form analysis
 -- Analyzes cadence, heart rate efficiency, and pace consistency
+-- Within-run pacing comes from the per-km splits in activity_splits
+WITH full_splits AS (
+    SELECT
+        activity_id,
+        split,
+        -- Seconds per km, so splits of slightly different lengths compare
+        moving_time * 1000.0 / distance as pace_s,
+        COUNT(*) OVER (PARTITION BY activity_id) as splits
+    FROM activity_splits
+    WHERE unit = 'km'
+    AND distance >= 950
+    AND moving_time > 0
+),
+run_pacing AS (
+    SELECT
+        activity_id,
+        -- Variability of km pace within the run (coefficient of variation)
+        STDDEV(pace_s) / NULLIF(AVG(pace_s), 0) as split_variability,
+        -- Second half vs first half (seconds per km, negative = negative split)
+        AVG(pace_s) FILTER (WHERE split > splits / 2)
+            - AVG(pace_s) FILTER (WHERE split <= splits / 2) as half_split_delta_s,
+        -- Last km vs first km (seconds per km, positive = fading)
+        arg_max(pace_s, split) - arg_min(pace_s, split) as fade_s
+    FROM full_splits
+    WHERE splits >= 2
+    GROUP BY activity_id
+)
 SELECT 
     strftime('%Y-%m', start_date) as month,
     sport_type,
@@ -9,6 +36,13 @@ SELECT
     ROUND(AVG(CASE WHEN average_speed > 0 THEN 1000 / (average_speed * 60) ELSE NULL END), 2) as avg_pace_min_km,
     ROUND(STDDEV(CASE WHEN average_speed > 0 THEN 1000 / (average_speed * 60) ELSE NULL END), 2) as pace_consistency,
     
+    -- Pacing within runs (only runs with streams or Strava splits)
+    COUNT(p.activity_id) as runs_with_splits,
+    ROUND(AVG(p.split_variability) * 100, 1) as within_run_variability_pct,
+    ROUND(AVG((p.half_split_delta_s < 0)::INTEGER) * 100, 0) as negative_split_pct,
+    ROUND(AVG(p.half_split_delta_s), 1) as avg_half_split_delta_s,
+    ROUND(AVG(p.fade_s), 1) as avg_fade_s,
+    
     -- Heart rate efficiency (lower HR at same pace = better fitness)
     ROUND(AVG(average_heartrate), 0) as avg_hr,
     ROUND(AVG(average_heartrate / NULLIF(average_speed * 3.6, 0)), 1) as hr_per_kmh,
@@ -31,10 +65,11 @@ SELECT
     ROUND(MIN(distance)/1000, 2) as min_distance_km,
     ROUND(MAX(distance)/1000, 2) as max_distance_km
 
-FROM activities
+FROM activities a
+LEFT JOIN run_pacing p ON p.activity_id = a.id
 WHERE sport_type IN ('Run', 'TrailRun')
 AND distance > 1000
 AND average_speed > 0
 AND start_date IS NOT NULL
 GROUP BY month, sport_type
-ORDER BY month DESC, sport_type;
\ No newline at end of file
+ORDER BY month DESC, sport_type;
@@ -1,11 +1,13 @@
 -- Terrain and elevation performance analysis
 -- Compares road vs trail performance and elevation impact
+-- Grade-adjusted pace (GAP) comes from the altitude streams in activity_gap
 WITH terrain_analysis AS (
-    SELECT *,
-        CASE WHEN average_speed > 0 
-             THEN ROUND(1000 / (average_speed * 60), 2) 
+    SELECT a.*,
+        CASE WHEN a.average_speed > 0 
+             THEN ROUND(1000 / (a.average_speed * 60), 2) 
              ELSE NULL 
         END as pace_min_per_km,
+        ROUND(1000 / (g.gap_speed * 60), 2) as gap_pace_min_per_km,
         CASE 
             WHEN total_elevation_gain < 50 THEN 'Flat (< 50m)'
             WHEN total_elevation_gain < 150 THEN 'Rolling (50-150m)'
@@ -14,7 +16,8 @@ WITH terrain_analysis AS (
             ELSE 'Mountainous (> 500m)'
         END as terrain_type,
         ROUND(total_elevation_gain / (distance / 1000), 1) as elevation_per_km
-    FROM activities
+    FROM activities a
+    LEFT JOIN (SELECT activity_id, gap_speed FROM activity_gap) g ON g.activity_id = a.id
     WHERE sport_type IN ('Run', 'TrailRun')
     AND distance > 1000
     AND average_speed > 0
@@ -27,6 +30,9 @@ SELECT
     
     -- Performance metrics
     ROUND(AVG(pace_min_per_km), 2) as avg_pace_min_km,
+    COUNT(gap_pace_min_per_km) as runs_with_gap,
+    ROUND(AVG(gap_pace_min_per_km), 2) as avg_gap_pace_min_km,
+    ROUND(AVG(pace_min_per_km - gap_pace_min_per_km), 2) as terrain_cost_min_km,
     ROUND(AVG(average_heartrate), 0) as avg_hr,
     ROUND(AVG(distance)/1000, 2) as avg_distance_km,
     
@@ -36,6 +42,7 @@ SELECT
     
     -- Effort analysis
     ROUND(AVG(average_heartrate / NULLIF(average_speed * 3.6, 0)), 1) as hr_per_kmh_effort,
+    ROUND(AVG(average_heartrate / NULLIF(60 / gap_pace_min_per_km, 0)), 1) as hr_per_gap_kmh_effort,
     ROUND(AVG(suffer_score), 1) as avg_suffer_score,
     
     -- Performance range
@@ -43,7 +50,8 @@ SELECT
     ROUND(MAX(pace_min_per_km), 2) as slowest_pace_min_km,
     
     -- Recent trend (last 6 months)
-    ROUND(AVG(CASE WHEN start_date >= date('now', '-6 months') THEN pace_min_per_km END), 2) as recent_avg_pace
+    ROUND(AVG(CASE WHEN start_date >= current_date - INTERVAL 6 MONTH THEN pace_min_per_km END), 2) as recent_avg_pace,
+    ROUND(AVG(CASE WHEN start_date >= current_date - INTERVAL 6 MONTH THEN gap_pace_min_per_km END), 2) as recent_avg_gap_pace
 
 FROM terrain_analysis
 WHERE pace_min_per_km BETWEEN 3 AND 12
@@ -1,35 +1,20 @@
 -- Recovery patterns and training density analysis
 -- Analyzes rest days, training frequency, and recovery indicators
-WITH session_gaps AS (
-    SELECT 
-        sport_type,
-        start_date,
-        moving_time,
-        suffer_score,
-        average_heartrate,
-        max_heartrate,
-        LAG(start_date) OVER (PARTITION BY sport_type ORDER BY start_date) as prev_session_date,
-        LAG(suffer_score) OVER (PARTITION BY sport_type ORDER BY start_date) as prev_suffer_score
-    FROM activities
-    WHERE sport_type IN ('Crossfit', 'WeightTraining')
-    AND start_date IS NOT NULL
-    AND moving_time > 0
-),
-recovery_analysis AS (
+-- Gaps come precomputed from session_gaps (built on each load, across all sports)
+WITH recovery_analysis AS (
     SELECT *,
-        CASE WHEN prev_session_date IS NOT NULL 
-             THEN julianday(start_date) - julianday(prev_session_date)
-             ELSE NULL 
-        END as days_since_last_session,
         CASE 
-            WHEN prev_session_date IS NULL THEN NULL
-            WHEN julianday(start_date) - julianday(prev_session_date) = 1 THEN 'Back-to-back'
-            WHEN julianday(start_date) - julianday(prev_session_date) <= 2 THEN '1 day rest'
-            WHEN julianday(start_date) - julianday(prev_session_date) <= 3 THEN '2 days rest'
-            WHEN julianday(start_date) - julianday(prev_session_date) <= 7 THEN '3-6 days rest'
+            WHEN days_since_same_sport IS NULL THEN NULL
+            WHEN days_since_same_sport = 0 THEN 'Same day'
+            WHEN days_since_same_sport = 1 THEN 'Back-to-back'
+            WHEN days_since_same_sport = 2 THEN '1 day rest'
+            WHEN days_since_same_sport = 3 THEN '2 days rest'
+            WHEN days_since_same_sport <= 7 THEN '3-6 days rest'
             ELSE '7+ days rest'
         END as recovery_category
     FROM session_gaps
+    WHERE sport_type IN ('Crossfit', 'WeightTraining')
+    AND moving_time > 0
 )
 SELECT 
     sport_type,
@@ -44,10 +29,17 @@ SELECT
     ROUND(AVG(max_heartrate), 0) as avg_max_hr,
     
     -- Recovery effectiveness indicators
-    ROUND(AVG(days_since_last_session), 1) as avg_rest_days,
-    ROUND(AVG(CASE WHEN prev_suffer_score IS NOT NULL 
-                   THEN suffer_score - prev_suffer_score 
-                   ELSE NULL END), 1) as avg_intensity_change,
+    ROUND(AVG(days_since_same_sport), 1) as avg_days_since_same_sport,
+    ROUND(AVG(rest_days), 1) as avg_full_rest_days,
+    ROUND(AVG(suffer_score - prev_same_sport_suffer_score), 1) as avg_intensity_change,
+    
+    -- Other sports in between (e.g. a run the day before a WOD)
+    ROUND(AVG(CASE WHEN prev_sport_type != sport_type THEN 1.0 ELSE 0.0 END) * 100, 1) as after_other_sport_pct,
+    ROUND(AVG(hours_since_prev), 1) as avg_hours_since_any_session,
+    
+    -- Training density going into the session
+    ROUND(AVG(sessions_7d), 1) as avg_sessions_last_7d,
+    ROUND(AVG(hours_28d), 1) as avg_hours_last_28d,
     
     -- Heart rate recovery indicators
     ROUND(AVG(max_heartrate - average_heartrate), 0) as avg_hr_reserve,
@@ -60,9 +52,10 @@ WHERE recovery_category IS NOT NULL
 GROUP BY sport_type, recovery_category
 ORDER BY sport_type, 
     CASE recovery_category
+        WHEN 'Same day' THEN 0
         WHEN 'Back-to-back' THEN 1
         WHEN '1 day rest' THEN 2
         WHEN '2 days rest' THEN 3
         WHEN '3-6 days rest' THEN 4
         ELSE 5
-    END;
\ No newline at end of file
+    END;
@@ -2,31 +2,31 @@
 -- Tracks improvements in training capacity, recovery, and consistency over time
 WITH monthly_progression AS (
     SELECT 
-        strftime('%Y-%m', start_date) as month,
+        strftime('%Y-%m', day) as month,
         sport_type,
-        COUNT(*) as sessions,
-        ROUND(AVG(moving_time)/60, 1) as avg_duration_min,
-        ROUND(AVG(suffer_score), 1) as avg_suffer_score,
-        ROUND(AVG(average_heartrate), 0) as avg_hr,
-        ROUND(AVG(max_heartrate), 0) as avg_max_hr,
+        SUM(activities) as sessions,
+        ROUND(rollup_avg(SUM(moving_time_sum), SUM(moving_time_n))/60, 1) as avg_duration_min,
+        ROUND(rollup_avg(SUM(suffer_score_sum), SUM(suffer_score_n)), 1) as avg_suffer_score,
+        ROUND(rollup_avg(SUM(heartrate_sum), SUM(heartrate_n)), 0) as avg_hr,
+        ROUND(rollup_avg(SUM(max_heartrate_sum), SUM(max_heartrate_n)), 0) as avg_max_hr,
         
         -- Training load indicators
-        ROUND(SUM(moving_time)/3600, 2) as monthly_hours,
-        ROUND(SUM(suffer_score), 0) as monthly_suffer_score,
-        ROUND(MAX(suffer_score), 0) as peak_intensity,
+        ROUND(SUM(moving_time_sum)/3600, 2) as monthly_hours,
+        ROUND(SUM(suffer_score_sum), 0) as monthly_suffer_score,
+        ROUND(MAX(suffer_score_max), 0) as peak_intensity,
         
         -- Recovery and adaptation metrics
-        ROUND(AVG(max_heartrate - average_heartrate), 0) as avg_hr_reserve,
-        ROUND(STDDEV(suffer_score), 1) as intensity_variation,
+        ROUND(rollup_avg(SUM(max_heartrate_sum), SUM(max_heartrate_n)) 
+            - rollup_avg(SUM(heartrate_sum), SUM(heartrate_n)), 0) as avg_hr_reserve,
+        ROUND(rollup_stddev(SUM(suffer_score_sum), SUM(suffer_score_sumsq), SUM(suffer_score_n)), 1) as intensity_variation,
         
         -- Consistency metrics
-        COUNT(DISTINCT strftime('%W', start_date)) as weeks_active,
-        ROUND(COUNT(*) * 1.0 / COUNT(DISTINCT strftime('%W', start_date)), 1) as sessions_per_week
+        COUNT(DISTINCT strftime('%W', day)) as weeks_active,
+        ROUND(SUM(activities) * 1.0 / COUNT(DISTINCT strftime('%W', day)), 1) as sessions_per_week
         
-    FROM activities
+    FROM daily_rollup
     WHERE sport_type IN ('Crossfit', 'WeightTraining')
-    AND start_date IS NOT NULL
-    AND moving_time > 0
+    AND timed
     GROUP BY month, sport_type
 )
 SELECT 
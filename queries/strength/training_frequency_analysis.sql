@@ -1,7 +1,8 @@
 -- Strength training frequency and consistency analysis
 -- Tracks CrossFit and Weight Training patterns over time
+-- Reads session_gaps (built on each load) instead of re-windowing all activities
 SELECT 
-    strftime('%Y-%m', start_date) as month,
+    strftime('%Y-%m', day) as month,
     sport_type,
     COUNT(*) as sessions,
     ROUND(AVG(moving_time)/60, 1) as avg_duration_min,
@@ -11,20 +12,26 @@ SELECT
     
     -- Weekly frequency indicators
     ROUND(COUNT(*) * 7.0 / 
-        (julianday(MAX(start_date)) - julianday(MIN(start_date)) + 1), 1) as sessions_per_week,
+        (date_diff('day', MIN(day), MAX(day)) + 1), 1) as sessions_per_week,
+    ROUND(AVG(same_sport_sessions_7d), 1) as avg_rolling_7d_sessions,
+    ROUND(AVG(same_sport_sessions_28d) / 4, 1) as avg_rolling_28d_sessions_per_week,
     
     -- Consistency metrics
-    COUNT(DISTINCT strftime('%W', start_date)) as weeks_trained,
-    ROUND(COUNT(*) * 1.0 / COUNT(DISTINCT strftime('%W', start_date)), 1) as avg_sessions_per_week_actual,
+    COUNT(DISTINCT strftime('%W', day)) as weeks_trained,
+    ROUND(COUNT(*) * 1.0 / COUNT(DISTINCT strftime('%W', day)), 1) as avg_sessions_per_week_actual,
+    ROUND(AVG(days_since_same_sport), 1) as avg_days_between_sessions,
+    MAX(days_since_same_sport) as longest_break_days,
+    
+    -- Overall load around strength sessions (all sports)
+    ROUND(AVG(sessions_7d), 1) as avg_all_sport_sessions_7d,
     
     -- Duration distribution
     COUNT(CASE WHEN moving_time < 1800 THEN 1 END) as short_sessions_under_30min,
     COUNT(CASE WHEN moving_time BETWEEN 1800 AND 3600 THEN 1 END) as medium_sessions_30_60min,
     COUNT(CASE WHEN moving_time > 3600 THEN 1 END) as long_sessions_over_60min
 
-FROM activities
+FROM session_gaps
 WHERE sport_type IN ('Crossfit', 'WeightTraining')
-AND start_date IS NOT NULL
 AND moving_time > 0
 GROUP BY month, sport_type
-ORDER BY month DESC, sport_type;
\ No newline at end of file
+ORDER BY month DESC, sport_type;
@@ -15,9 +15,8 @@ WITH intensity_categories AS (
             WHEN moving_time < 3600 THEN 'Medium (30-60min)'
             ELSE 'Long (> 60min)'
         END as duration_category
-    FROM activities
+    FROM session_gaps
     WHERE sport_type IN ('Crossfit', 'WeightTraining')
-    AND start_date IS NOT NULL
     AND moving_time > 0
 )
 SELECT 
@@ -35,9 +34,13 @@ SELECT
                    THEN (average_heartrate * 1.0 / max_heartrate) * 100 
                    ELSE NULL END), 1) as avg_hr_intensity_pct,
     
+    -- Recovery before the session
+    ROUND(AVG(days_since_same_sport), 1) as avg_days_since_same_sport,
+    ROUND(AVG(sessions_7d), 1) as avg_sessions_last_7d,
+    
     -- Recent trend (last 3 months)
-    COUNT(CASE WHEN start_date >= date('now', '-3 months') THEN 1 END) as recent_sessions,
-    ROUND(AVG(CASE WHEN start_date >= date('now', '-3 months') 
+    COUNT(CASE WHEN day >= current_date - INTERVAL 3 MONTH THEN 1 END) as recent_sessions,
+    ROUND(AVG(CASE WHEN day >= current_date - INTERVAL 3 MONTH 
                    THEN suffer_score END), 1) as recent_avg_suffer_score
 
 FROM intensity_categories
@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+"""
+Strava Query Server
+
+Serves the queries/ library and the dashboard views/tables as JSON or Arrow
+over HTTP. Reads go to a private snapshot of the database through a pool of
+read-only DuckDB cursors, so analyze.py can keep writing the live file. A new
+snapshot is swapped in atomically whenever a load finishes.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import re
+import os
+import shutil
+import tempfile
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Set, Tuple
+
+import duckdb
+from aiohttp import web
+
+from analyze import split_statements
+from dashboard import ARTIFACTS, DashboardRegistry
+from snapshot import published_path, wal_path
+from tracing import tracer
+
+QUERIES_DIR = Path("queries")
+SNAPSHOTS_DIR = Path(".snapshots")
+ARROW_CONTENT_TYPE = "application/vnd.apache.arrow.stream"
+
+# Query and folder names allowed in URLs
+NAME_PATTERN = re.compile(r"^[\w-]+$")
+
+
+class SnapshotPool:
+    """A read-only snapshot of the database and a pool of cursors on it."""
+
+    def __init__(self, path: Path, version: str, size: int):
+        self.path = path
+        self.version = version
+        self.conn = duckdb.connect(str(path), read_only=True)
+        self.cursors: asyncio.Queue = asyncio.Queue()
+        self.size = size
+        for _ in range(size):
+            self.cursors.put_nowait(self.conn.cursor())
+
+    @asynccontextmanager
+    async def cursor(self) -> AsyncIterator[duckdb.DuckDBPyConnection]:
+        """Borrow a cursor for the duration of one request."""
+        cursor = await self.cursors.get()
+        try:
+            yield cursor
+        finally:
+            self.cursors.put_nowait(cursor)
+
+    async def close(self) -> None:
+        """Close once every borrowed cursor has been returned, then delete the file."""
+        while self.cursors.qsize() < self.size:
+            await asyncio.sleep(0.1)
+        self.conn.close()
+        self.path.unlink(missing_ok=True)
+
+
+class QueryServer:
+    """aiohttp application exposing queries and dashboard artifacts."""
+
+    def __init__(self, db_path: Path, pool_size: int = 4, poll_interval: float = 5.0,
+                 cache_size: int = 256):
+        self.db_path = db_path
+        self.pool_size = pool_size
+        self.poll_interval = poll_interval
+        self.cache_size = cache_size
+        self.pool: Optional[SnapshotPool] = None
+        self.executor = ThreadPoolExecutor(max_workers=pool_size)
+        self.cache: "OrderedDict[str, Tuple[str, bytes, str]]" = OrderedDict()
+        # Retired pools waiting for their borrowed cursors before closing
+        self.closing: Set[asyncio.Task] = set()
+
+    def _source_version(self) -> Optional[str]:
+        """Version of the published database, or None while a write is in progress."""
+        source = published_path(self.db_path)
+        if not source.exists() or wal_path(source).exists():
+            return None
+        stat = source.stat()
+        return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+    def _prepare_snapshot(self, version: str) -> Optional[Path]:
+        """Copy the published database and bring its dashboard artifacts up to date."""
+        SNAPSHOTS_DIR.mkdir(exist_ok=True)
+        # Unique per server, so several servers can share the directory
+        fd, name = tempfile.mkstemp(
+            prefix=f"{self.db_path.stem}_{version}_", suffix=".duckdb", dir=SNAPSHOTS_DIR
+        )
+        os.close(fd)
+        snapshot = Path(name)
+        try:
+            shutil.copyfile(published_path(self.db_path), snapshot)
+
+            # The file changed while we copied it: try again on the next poll
+            if self._source_version() != version:
+                snapshot.unlink(missing_ok=True)
+                return None
+
+            # The copy is private, so artifacts can be materialized into it
+            conn = duckdb.connect(str(snapshot))
+            try:
+                DashboardRegistry(conn).ensure_all()
+            finally:
+                conn.close()
+        except BaseException:
+            snapshot.unlink(missing_ok=True)
+            raise
+        return snapshot
+
+    async def refresh(self) -> bool:
+        """Swap in a fresh snapshot if the live database changed."""
+        version = self._source_version()
+        if version is None or (self.pool and self.pool.version == version):
+            return False
+
+        loop = asyncio.get_running_loop()
+        with tracer.span("prepare snapshot", version=version):
+            snapshot = await loop.run_in_executor(
+                self.executor, self._prepare_snapshot, version
+            )
+        if snapshot is None:
+            return False
+
+        old_pool, self.pool = self.pool, SnapshotPool(snapshot, version, self.pool_size)
+        self.cache.clear()
+        print(f"Serving snapshot {version}")
+        if old_pool:
+            task = asyncio.create_task(old_pool.close())
+            self.closing.add(task)
+            task.add_done_callback(self.closing.discard)
+        return True
+
+    async def watch(self, app: web.Application) -> AsyncIterator[None]:
+        """Background task polling the live database for new loads."""
+
+        async def poll() -> None:
+            while True:
+                await asyncio.sleep(self.poll_interval)
+                try:
+                    await self.refresh()
+                except Exception as e:
+                    print(f"Snapshot refresh failed: {e}")
+
+        task = asyncio.create_task(poll())
+        yield
+        task.cancel()
+        await asyncio.gather(*self.closing)
+        if self.pool:
+            await self.pool.close()
+            self.pool = None
+        self.executor.shutdown()
+
+    async def _run(self, pool: SnapshotPool, func: Callable, sql: str) -> Any:
+        """Execute a statement on a pooled cursor off the event loop."""
+        loop = asyncio.get_running_loop()
+        async with pool.cursor() as cursor:
+            try:
+                return await loop.run_in_executor(self.executor, func, cursor, sql)
+            except duckdb.Error as e:
+                raise web.HTTPInternalServerError(text=str(e).splitlines()[0])
+
+    async def _render(
+        self, pool: SnapshotPool, statements: List[str], fmt: str
+    ) -> Tuple[bytes, str]:
+        """Results of one or more statements in the requested format."""
+        if fmt == "arrow":
+            return await self._run(pool, _arrow_result, statements[0])
+        if fmt != "json":
+            raise web.HTTPBadRequest(text="format must be json or arrow")
+        results = [await self._run(pool, _json_result, sql) for sql in statements]
+        body = results[0] if len(results) == 1 else {"results": results}
+        return json.dumps(body, default=str).encode(), "application/json"
+
+    async def _cached(self, request: web.Request, build: Any) -> web.Response:
+        """Serve from the response cache with ETag revalidation.
+
+        The ETag and the response both come from the same snapshot, taken
+        before anything is served, so a swap mid-request cannot mix versions.
+        """
+        pool = self.pool
+        if pool is None:
+            raise web.HTTPServiceUnavailable(text="No database snapshot yet")
+        key = f"{pool.version}:{request.path_qs}"
+        etag = '"' + hashlib.sha256(key.encode()).hexdigest()[:32] + '"'
+
+        if request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304, headers={"ETag": etag})
+
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            _, body, content_type = self.cache[key]
+        else:
+            with tracer.span("serve", path=request.path) as span:
+                body, content_type = await build(pool)
+                span.set(bytes=len(body))
+            self.cache[key] = (etag, body, content_type)
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+        return web.Response(
+            body=body,
+            content_type=content_type,
+            headers={"ETag": etag, "Cache-Control": "no-cache"},
+        )
+
+    async def handle_health(self, request: web.Request) -> web.Response:
+        """Report which snapshot is being served."""
+        return web.json_response(
+            {"snapshot": self.pool.version if self.pool else None, "pool": self.pool_size}
+        )
+
+    async def handle_list_queries(self, request: web.Request) -> web.Response:
+        """List the query library."""
+        queries = []
+        for query_file in sorted(QUERIES_DIR.glob("*/*.sql")):
+            sql = query_file.read_text()
+            first_line = sql.splitlines()[0] if sql else ""
+            queries.append(
+                {
+                    "name": f"{query_file.parent.name}/{query_file.stem}",
+                    "description": first_line.lstrip("- ").strip(),
+                    "statements": len(split_statements(sql)),
+                }
+            )
+        return web.json_response(queries)
+
+    async def handle_query(self, request: web.Request) -> web.Response:
+        """Run one query file (or one statement of it with ?statement=N)."""
+        folder = request.match_info["folder"]
+        name = request.match_info["name"]
+        if not (NAME_PATTERN.match(folder) and NAME_PATTERN.match(name)):
+            raise web.HTTPBadRequest(text="Invalid query name")
+
+        query_file = QUERIES_DIR / folder / f"{name}.sql"
+        if not query_file.exists():
+            raise web.HTTPNotFound(text=f"Unknown query {folder}/{name}")
+
+        statements = split_statements(query_file.read_text())
+        if "statement" in request.query:
+            index = request.query["statement"]
+            if not index.isdigit() or not 1 <= int(index) <= len(statements):
+                raise web.HTTPBadRequest(text=f"statement must be 1-{len(statements)}")
+            statements = [statements[int(index) - 1]]
+
+        fmt = request.query.get("format", "json")
+        if fmt == "arrow" and len(statements) > 1:
+            raise web.HTTPBadRequest(text="Arrow output needs a single ?statement=N")
+
+        return await self._cached(
+            request, lambda pool: self._render(pool, statements, fmt)
+        )
+
+    async def handle_list_dashboard(self, request: web.Request) -> web.Response:
+        """List the dashboard views and tables."""
+        return web.json_response(
+            [
+                {"name": a.name, "kind": a.kind, "description": a.description}
+                for a in ARTIFACTS
+            ]
+        )
+
+    async def handle_dashboard(self, request: web.Request) -> web.Response:
+        """Rows of one dashboard view or table."""
+        name = request.match_info["name"]
+        if name not in {artifact.name for artifact in ARTIFACTS}:
+            raise web.HTTPNotFound(text=f"Unknown dashboard artifact {name}")
+
+        fmt = request.query.get("format", "json")
+        return await self._cached(
+            request, lambda pool: self._render(pool, [f"SELECT * FROM {name}"], fmt)
+        )
+
+    def create_app(self) -> web.Application:
+        """Build the aiohttp application."""
+        app = web.Application()
+        app.router.add_get("/health", self.handle_health)
+        app.router.add_get("/queries", self.handle_list_queries)
+        app.router.add_get("/queries/{folder}/{name}", self.handle_query)
+        app.router.add_get("/dashboard", self.handle_list_dashboard)
+        app.router.add_get("/dashboard/{name}", self.handle_dashboard)
+        app.cleanup_ctx.append(self.watch)
+        return app
+
+
+def _json_result(cursor: duckdb.DuckDBPyConnection, sql: str) -> Dict[str, Any]:
+    """Columns and rows of a statement."""
+    result = cursor.execute(sql)
+    columns = [column[0] for column in result.description]
+    return {"columns": columns, "rows": result.fetchall()}
+
+
+def _arrow_result(cursor: duckdb.DuckDBPyConnection, sql: str) -> Tuple[bytes, str]:
+    """A statement's result as an Arrow IPC stream (needs pyarrow)."""
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise web.HTTPNotAcceptable(text="Arrow output needs pyarrow installed")
+
+    table = cursor.execute(sql).fetch_arrow_table()
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes(), ARROW_CONTENT_TYPE
+
+
+async def serve(db_path: Path, host: str = "localhost", port: int = 8001,
+                pool_size: int = 4, poll_interval: float = 5.0) -> None:
+    """Serve the database until interrupted."""
+    if not published_path(db_path).exists():
+        print(f"{db_path} not found. Run analyze.py first.")
+        return
+
+    server = QueryServer(db_path, pool_size=pool_size, poll_interval=poll_interval)
+    if not await server.refresh():
+        print("Database is being written, will serve it once the load finishes")
+
+    runner = web.AppRunner(server.create_app())
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    print(f"Serving on http://{host}:{port}")
+
+    try:
+        await asyncio.Future()  # Run forever
+    finally:
+        await runner.cleanup()
+
+
+async def main() -> None:
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="Serve queries and dashboard over HTTP")
+    parser.add_argument("--db", type=Path, default=Path("strava_activities.duckdb"))
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--pool", type=int, default=4, help="read cursors")
+    parser.add_argument("--poll", type=float, default=5.0, help="seconds between checks")
+    args = parser.parse_args()
+
+    await serve(args.db, args.host, args.port, args.pool, args.poll)
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        print("\nDone!")
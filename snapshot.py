@@ -0,0 +1,185 @@
+"""
+Staged Loading
+
+analyze.py builds into a staging copy of the database, checks it, then
+publishes it in one step so readers never see a half-loaded database:
+
+    replace   os.replace() the staging file over strava_activities.duckdb
+    snapshot  move it to snapshots/<name>_<timestamp>.duckdb and point
+              snapshots/CURRENT at it; readers open the file CURRENT names
+
+The staging copy starts from the last published database, whichever mode
+published it, so persistent tables (heart rate zone thresholds and caches,
+dashboard build records) carry over. Publishing in replace mode (or loading
+in place) retires snapshots/CURRENT, so readers go back to the live file.
+
+Only the standard library is used here, so callers can decide whether a load is
+needed before importing DuckDB.
+"""
+
+import json
+import os
+import shutil
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# Published snapshots kept around for readers that still have an older one open
+KEEP_SNAPSHOTS = 3
+
+
+def wal_path(db_path: Path) -> Path:
+    """DuckDB's write-ahead log for a database file."""
+    return db_path.with_name(db_path.name + ".wal")
+
+
+def snapshots_dir(live: Path) -> Path:
+    """Directory holding the versioned snapshots of a database."""
+    return live.parent / "snapshots"
+
+
+def current_snapshot(live: Path) -> Optional[Path]:
+    """The snapshot snapshots/CURRENT points at, if snapshots are in use."""
+    pointer = snapshots_dir(live) / "CURRENT"
+    if not pointer.exists():
+        return None
+    snapshot = snapshots_dir(live) / pointer.read_text().strip()
+    return snapshot if snapshot.exists() else None
+
+
+def published_path(live: Path) -> Path:
+    """The database readers should open: the current snapshot or the live file."""
+    return current_snapshot(live) or live
+
+
+def retire_current(live: Path) -> None:
+    """Stop pointing readers at a snapshot once the live file is newer."""
+    (snapshots_dir(live) / "CURRENT").unlink(missing_ok=True)
+
+
+def prepare_staging(live: Path) -> Path:
+    """Create the staging database as a copy of the last published one."""
+    source = published_path(live)
+    if wal_path(source).exists():
+        raise RuntimeError(f"{source} is being written by another process")
+
+    staging = live.with_name(f"{live.stem}.staging{live.suffix}")
+    staging.unlink(missing_ok=True)
+    wal_path(staging).unlink(missing_ok=True)
+    if source.exists():
+        shutil.copyfile(source, staging)
+    return staging
+
+
+def prepare_in_place(live: Path) -> Path:
+    """Bring the live file up to the current snapshot before loading into it."""
+    snapshot = current_snapshot(live)
+    if snapshot is not None:
+        if wal_path(live).exists():
+            raise RuntimeError(f"{live} is being written by another process")
+        shutil.copyfile(snapshot, live)
+    return live
+
+
+def publish(staging: Path, live: Path, versioned: bool = False) -> Path:
+    """Atomically make the (closed, checkpointed) staging database visible."""
+    if wal_path(staging).exists():
+        raise RuntimeError(f"{staging} was not checkpointed before publishing")
+
+    if not versioned:
+        # A leftover WAL would be replayed on top of the new file
+        if wal_path(live).exists():
+            raise RuntimeError(f"{live} is being written by another process")
+        os.replace(staging, live)
+        retire_current(live)
+        return live
+
+    directory = snapshots_dir(live)
+    directory.mkdir(exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    snapshot = directory / f"{live.stem}_{stamp}{live.suffix}"
+    os.replace(staging, snapshot)
+
+    pointer = directory / "CURRENT"
+    tmp_pointer = directory / "CURRENT.tmp"
+    tmp_pointer.write_text(snapshot.name + "\n")
+    os.replace(tmp_pointer, pointer)
+
+    prune_snapshots(live)
+    return snapshot
+
+
+def prune_snapshots(live: Path, keep: int = KEEP_SNAPSHOTS) -> List[Path]:
+    """Delete all but the newest snapshots (never the current one)."""
+    current = current_snapshot(live)
+    snapshots = sorted(snapshots_dir(live).glob(f"{live.stem}_*{live.suffix}"))
+    removed = []
+    for snapshot in snapshots[:-keep] if keep else snapshots:
+        if snapshot != current:
+            snapshot.unlink(missing_ok=True)
+            removed.append(snapshot)
+    return removed
+
+
+def input_state(activities_dir: Path) -> Dict[str, Any]:
+    """Name, size and mtime of every export plus the stream/gear caches."""
+    exports = sorted(activities_dir.glob("*_export.json"))
+    if not exports:
+        return {}
+
+    state: Dict[str, Any] = {
+        "exports": [
+            [export.name, export.stat().st_size, export.stat().st_mtime_ns]
+            for export in exports
+        ]
+    }
+    for cache in ["streams", "gear"]:
+        directory = activities_dir / cache
+        if directory.exists():
+            # A directory's mtime changes whenever a file is added or removed
+            state[cache] = [directory.stat().st_mtime_ns, len(os.listdir(directory))]
+    return state
+
+
+def load_state_path(live: Path) -> Path:
+    """File recording the inputs of the last published load."""
+    return live.with_name(f".{live.stem}.load_state.json")
+
+
+def database_stamp(live: Path) -> List[Any]:
+    """Name, size and mtime of the published database.
+
+    Edits to its config tables (hr_zone_thresholds, gear_thresholds) change
+    the file, so they count as new inputs too.
+    """
+    database = published_path(live)
+    stat = database.stat()
+    return [database.name, stat.st_size, stat.st_mtime_ns]
+
+
+def is_up_to_date(live: Path, state: Dict[str, Any]) -> bool:
+    """Whether the published database was loaded from exactly these inputs."""
+    state_file = load_state_path(live)
+    if not state or not state_file.exists() or not published_path(live).exists():
+        return False
+    with open(state_file) as f:
+        saved = json.load(f)
+    stamp = saved.pop("database", None)
+    return saved == json.loads(json.dumps(state)) and stamp == database_stamp(live)
+
+
+def save_load_state(live: Path, state: Dict[str, Any]) -> None:
+    """Record the inputs of a load once it has been published."""
+    with open(load_state_path(live), "w") as f:
+        json.dump({**state, "database": database_stamp(live)}, f)
+
+
+def restamp_load_state(live: Path) -> None:
+    """Keep the load state current after publishing without a load."""
+    state_file = load_state_path(live)
+    if not state_file.exists():
+        return
+    with open(state_file) as f:
+        state = json.load(f)
+    state.pop("database", None)
+    save_load_state(live, state)
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Beyond Strava command line
+
+One entry point for the whole pipeline:
+
+    uv run --env-file .env strava.py sync   fetch new activities, then load them
+    uv run strava.py load                   merge the exports into DuckDB
+    uv run strava.py query running/fitness_trends
+    uv run strava.py dashboard --serve      refresh dashboard artifacts and serve them
+
+Heavy modules (httpx, aiohttp, duckdb) are only imported by the subcommand that
+needs them, and a load whose inputs did not change returns before DuckDB is
+even imported.
+"""
+
+import argparse
+import csv
+import os
+import sys
+from pathlib import Path
+
+from snapshot import input_state, is_up_to_date, published_path
+
+ACTIVITIES_DIR = Path("activities")
+DB_PATH = Path("strava_activities.duckdb")
+QUERIES_DIR = Path("queries")
+
+
+def cmd_sync(args: argparse.Namespace) -> int:
+    """Fetch new activities from Strava and load them."""
+    client_id = os.getenv("STRAVA_CLIENT_ID")
+    client_secret = os.getenv("STRAVA_CLIENT_SECRET")
+    if not client_id or not client_secret:
+        print("STRAVA_CLIENT_ID or STRAVA_CLIENT_SECRET not found")
+        print("Run with: uv run --env-file .env strava.py sync")
+        return 1
+
+    import asyncio
+
+    from fetch import StravaFetcher
+
+    fetcher = StravaFetcher(client_id, client_secret)
+    refresh_token = os.getenv("STRAVA_REFRESH_TOKEN")
+    fetched = None
+    if refresh_token:
+        fetched = asyncio.run(fetcher.sync(refresh_token, force=args.force))
+
+    if fetched is None:
+        # No usable refresh token: fall back to the browser flow
+        try:
+            asyncio.run(fetcher.start_auth_server())
+        except KeyboardInterrupt:
+            print("\nDone!")
+        return 0
+
+    if args.no_load:
+        return 0
+    return cmd_load(args)
+
+
+def cmd_load(args: argparse.Namespace) -> int:
+    """Load the exports, unless nothing changed since the last load."""
+    # With --dashboard, analyze.load refreshes the dashboard even when up to date
+    dashboard = getattr(args, "dashboard", False)
+    if (
+        not args.force
+        and not dashboard
+        and is_up_to_date(DB_PATH, input_state(ACTIVITIES_DIR))
+    ):
+        print(f"Nothing new to load, {published_path(DB_PATH)} is up to date")
+        return 0
+
+    from analyze import load
+
+    load(
+        ACTIVITIES_DIR,
+        dashboard=dashboard,
+        snapshot=getattr(args, "snapshot", False),
+        in_place=getattr(args, "in_place", False),
+        force=args.force,
+    )
+    return 0
+
+
+def cmd_query(args: argparse.Namespace) -> int:
+    """Run a query file against the published database."""
+    if args.list or not args.name:
+        for query_file in sorted(QUERIES_DIR.glob("*/*.sql")):
+            print(f"{query_file.parent.name}/{query_file.stem}")
+        return 0
+
+    query_file = QUERIES_DIR / f"{args.name.removesuffix('.sql')}.sql"
+    if not query_file.exists():
+        print(f"Unknown query {args.name}. List them with: strava.py query --list")
+        return 1
+
+    import duckdb
+
+    from analyze import split_statements
+    from dashboard import DashboardRegistry
+
+    statements = split_statements(query_file.read_text())
+    if args.statement:
+        statements = statements[args.statement - 1 : args.statement]
+
+    db_path = published_path(DB_PATH)
+    if not db_path.exists():
+        print(f"{db_path} not found. Run: strava.py load")
+        return 1
+
+    # Read-only, so a published snapshot is never modified and queries can run
+    # while another process has the database open
+    conn = duckdb.connect(str(db_path), read_only=True)
+    try:
+        for sql in statements:
+            stale = DashboardRegistry(conn).stale_for_sql(sql)
+            if stale:
+                print(
+                    f"Dashboard artifacts missing or outdated: {', '.join(stale)}. "
+                    "Refresh them with: strava.py dashboard",
+                    file=sys.stderr,
+                )
+            try:
+                result = conn.sql(sql)
+            except duckdb.CatalogException as e:
+                print(e, file=sys.stderr)
+                return 1
+            if args.csv:
+                writer = csv.writer(sys.stdout)
+                writer.writerow(result.columns)
+                writer.writerows(result.fetchall())
+            else:
+                result.show(max_rows=args.rows)
+    finally:
+        conn.close()
+    return 0
+
+
+def cmd_dashboard(args: argparse.Namespace) -> int:
+    """Bring the dashboard views and tables up to date, optionally serving them."""
+    db_path = published_path(DB_PATH)
+    if not db_path.exists():
+        print(f"{db_path} not found. Run: strava.py load")
+        return 1
+
+    if not args.serve:
+        from analyze import refresh_published_dashboard
+
+        db_path = refresh_published_dashboard(DB_PATH)
+        if db_path is None:
+            return 1
+        print(f"Launch dashboard with: duckdb -ui {db_path}")
+        return 0
+
+    # The server refreshes artifacts in its own snapshot copy
+    import asyncio
+
+    from serve import serve
+
+    try:
+        asyncio.run(serve(DB_PATH, port=args.port))
+    except KeyboardInterrupt:
+        print("\nDone!")
+    return 0
+
+
+def main() -> int:
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="Beyond Strava: sync, load and query")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    sync = commands.add_parser("sync", help="fetch new activities, then load them")
+    sync.add_argument(
+        "--force",
+        action="store_true",
+        help="fetch and load even if nothing is new",
+    )
+    sync.add_argument("--no-load", action="store_true", help="only fetch")
+    sync.set_defaults(func=cmd_sync)
+
+    load = commands.add_parser("load", help="merge the exports into DuckDB")
+    load.add_argument(
+        "--force",
+        action="store_true",
+        help="reload even if nothing changed",
+    )
+    load.add_argument(
+        "--dashboard",
+        action="store_true",
+        help="also build dashboard artifacts",
+    )
+    load.add_argument(
+        "--snapshot",
+        action="store_true",
+        help="publish a versioned snapshot",
+    )
+    load.add_argument(
+        "--in-place",
+        action="store_true",
+        help="write the live database directly",
+    )
+    load.set_defaults(func=cmd_load)
+
+    query = commands.add_parser("query", help="run a query from queries/")
+    query.add_argument("name", nargs="?", help="e.g. running/fitness_trends")
+    query.add_argument("--list", action="store_true", help="list available queries")
+    query.add_argument("--statement", type=int, help="only run the Nth statement")
+    query.add_argument(
+        "--csv",
+        action="store_true",
+        help="print CSV instead of a table",
+    )
+    query.add_argument("--rows", type=int, default=40, help="rows shown per table")
+    query.set_defaults(func=cmd_query)
+
+    dashboard = commands.add_parser(
+        "dashboard", help="refresh (and serve) the dashboard"
+    )
+    dashboard.add_argument(
+        "--serve",
+        action="store_true",
+        help="start the HTTP query server",
+    )
+    dashboard.add_argument("--port", type=int, default=8001)
+    dashboard.set_defaults(func=cmd_dashboard)
+
+    args = parser.parse_args()
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+"""
+Shared fixtures: a scratch working directory laid out the way fetch.py writes
+it (activities/*_export.json, activities/streams, activities/gear), and
+helpers to load it and query the published database.
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import duckdb
+import pytest
+
+from analyze import load
+from snapshot import published_path
+
+DB_PATH = Path("strava_activities.duckdb")
+
+
+def make_activity(activity_id: int, **fields: Any) -> Dict[str, Any]:
+    """A summary activity as returned by /athlete/activities, with overrides."""
+    activity = {
+        "id": activity_id,
+        "name": f"Activity {activity_id}",
+        "athlete": {"id": 1, "resource_state": 1},
+        "type": "Run",
+        "sport_type": "Run",
+        "start_date": "2026-01-01T08:00:00Z",
+        "start_date_local": "2026-01-01T09:00:00Z",
+        "distance": 10000.0,
+        "moving_time": 3000,
+        "elapsed_time": 3100,
+        "total_elevation_gain": 50.0,
+        "average_speed": 3.33,
+        "has_heartrate": True,
+        "average_heartrate": 150.0,
+        "max_heartrate": 175,
+        "suffer_score": 60,
+        "manual": False,
+    }
+    activity.update(fields)
+    return activity
+
+
+@pytest.fixture
+def workspace(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    """Run the test from an empty directory with an activities/ folder."""
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "activities").mkdir()
+    return tmp_path
+
+
+@pytest.fixture
+def write_export(workspace: Path) -> Callable[..., Path]:
+    """Write activities as an export file, optionally with a given mtime."""
+
+    def write(
+        activities: List[Dict[str, Any]],
+        name: str = "athlete_2026-01-01_export.json",
+        mtime: Optional[float] = None,
+    ) -> Path:
+        path = workspace / "activities" / name
+        path.write_text(json.dumps(activities))
+        if mtime is not None:
+            os.utime(path, (mtime, mtime))
+        return path
+
+    return write
+
+
+@pytest.fixture
+def write_stream(workspace: Path) -> Callable[..., Path]:
+    """Write a cached stream file for one activity."""
+
+    def write(activity_id: int, **streams: List[Any]) -> Path:
+        directory = workspace / "activities" / "streams"
+        directory.mkdir(exist_ok=True)
+        path = directory / f"{activity_id}.json"
+        path.write_text(json.dumps({"activity_id": activity_id, **streams}))
+        return path
+
+    return write
+
+
+@pytest.fixture
+def run_load(workspace: Path) -> Callable[..., None]:
+    """Load the workspace's exports into strava_activities.duckdb."""
+
+    def run(**options: Any) -> None:
+        load(Path("activities"), **options)
+
+    return run
+
+
+@pytest.fixture
+def query(workspace: Path) -> Callable[..., List[tuple]]:
+    """Rows of a statement against the published database."""
+
+    def run(sql: str, params: Optional[List[Any]] = None) -> List[tuple]:
+        conn = duckdb.connect(str(published_path(DB_PATH)), read_only=True)
+        try:
+            return conn.execute(sql, params or []).fetchall()
+        finally:
+            conn.close()
+
+    return run
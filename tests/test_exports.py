@@ -0,0 +1,89 @@
+import time
+
+import duckdb
+
+from snapshot import published_path
+from tests.conftest import DB_PATH, make_activity
+
+OLD = "athlete_2026-01-01_export.json"
+NEW = "athlete_2026-01-08_export.json"
+
+
+def names(query):
+    return query("SELECT id, name FROM activities ORDER BY id")
+
+
+def test_newer_export_wins_over_a_rewritten_older_one(write_export, run_load, query):
+    write_export([make_activity(1, name="Old")], name=OLD)
+    write_export([make_activity(1, name="New")], name=NEW)
+    run_load()
+    assert names(query) == [(1, "New")]
+
+    # Re-downloading the older export gives it the newest mtime
+    write_export(
+        [make_activity(1, name="Old, again")], name=OLD, mtime=time.time() + 60
+    )
+    run_load()
+    assert names(query) == [(1, "New")]
+
+
+def test_activity_removed_from_an_export_is_dropped(write_export, run_load, query):
+    write_export([make_activity(1), make_activity(2)])
+    run_load()
+
+    write_export([make_activity(1)])
+    run_load()
+
+    assert [row[0] for row in names(query)] == [1]
+    assert query("SELECT id FROM export_activities") == [(1,)]
+
+
+def test_removed_activity_falls_back_to_an_older_export(write_export, run_load, query):
+    write_export([make_activity(1, name="Old"), make_activity(2)], name=OLD)
+    write_export([make_activity(1, name="New")], name=NEW)
+    run_load()
+
+    write_export([make_activity(3)], name=NEW)
+    run_load()
+
+    assert names(query) == [(1, "Old"), (2, "Activity 2"), (3, "Activity 3")]
+    assert query("SELECT file FROM export_activities WHERE id = 1") == [(OLD,)]
+
+
+def test_incremental_merge_matches_a_rebuild(write_export, run_load, query):
+    write_export([make_activity(i, name=f"Old {i}") for i in (1, 2, 3)], name=OLD)
+    write_export([make_activity(i, name=f"New {i}") for i in (2, 3, 4)], name=NEW)
+    run_load()
+
+    write_export([make_activity(i, name=f"Old {i}!") for i in (1, 2)], name=OLD)
+    write_export([make_activity(i, name=f"New {i}") for i in (2, 4, 5)], name=NEW)
+    run_load()
+    merged = query(
+        "SELECT id, file, version, content_hash FROM export_activities ORDER BY id"
+    )
+
+    DB_PATH.unlink()
+    run_load(force=True)
+    assert (
+        query(
+            "SELECT id, file, version, content_hash FROM export_activities ORDER BY id"
+        )
+        == merged
+    )
+    assert [row[:3] for row in merged] == [
+        (1, OLD, 20260101),
+        (2, NEW, 20260108),
+        (4, NEW, 20260108),
+        (5, NEW, 20260108),
+    ]
+
+
+def test_mtime_versions_are_merged_again(write_export, run_load, query):
+    write_export([make_activity(1)])
+    run_load()
+    conn = duckdb.connect(str(published_path(DB_PATH)))
+    conn.execute("UPDATE export_activities SET version = 1767225600000000000")
+    conn.close()
+
+    run_load(force=True)
+    assert query("SELECT version FROM export_activities") == [(20260101,)]
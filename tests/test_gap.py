@@ -0,0 +1,75 @@
+import pytest
+
+from tests.conftest import make_activity
+
+FLAT_COST = 3.6
+
+
+def minetti_cost(grade):
+    return (
+        155.4 * grade**5
+        - 30.4 * grade**4
+        - 43.3 * grade**3
+        + 46.3 * grade**2
+        + 19.5 * grade
+        + FLAT_COST
+    )
+
+
+def test_flat_run_gap_equals_pace(write_export, write_stream, run_load, query):
+    write_export([make_activity(1)])
+    write_stream(
+        1,
+        time=list(range(0, 110, 10)),
+        distance=[30.0 * i for i in range(11)],
+        altitude=[100.0] * 11,
+        moving=[True] * 11,
+    )
+    run_load()
+
+    [(gap_speed, moving_time)] = query(
+        "SELECT gap_speed, moving_time FROM activity_gap WHERE activity_id = 1"
+    )
+    assert moving_time == 100
+    assert gap_speed == pytest.approx(3.0)
+
+
+def test_uphill_gap_follows_minetti(write_export, write_stream, run_load, query):
+    write_export([make_activity(1)])
+    # A steady 10% climb at 3 m/s
+    write_stream(
+        1,
+        time=list(range(0, 110, 10)),
+        distance=[30.0 * i for i in range(11)],
+        altitude=[100.0 + 3.0 * i for i in range(11)],
+        moving=[True] * 11,
+    )
+    run_load()
+
+    [(gap_speed, elevation_gain)] = query(
+        "SELECT gap_speed, elevation_gain FROM activity_gap WHERE activity_id = 1"
+    )
+    assert elevation_gain == pytest.approx(30.0)
+    assert gap_speed == pytest.approx(3.0 * minetti_cost(0.1) / FLAT_COST)
+
+
+def test_paused_distance_is_left_out(write_export, write_stream, run_load, query):
+    write_export([make_activity(1)])
+    # GPS drift while paused adds distance but no moving time
+    write_stream(
+        1,
+        time=list(range(0, 110, 10)),
+        distance=[30.0 * i for i in range(11)],
+        altitude=[100.0] * 11,
+        moving=[True] * 5 + [False] + [True] * 5,
+    )
+    run_load()
+
+    [(distance, moving_distance, moving_time, gap_speed)] = query(
+        """
+        SELECT distance, moving_distance, moving_time, gap_speed
+        FROM activity_gap WHERE activity_id = 1
+        """
+    )
+    assert (distance, moving_distance, moving_time) == (300.0, 270.0, 90)
+    assert gap_speed == pytest.approx(3.0)
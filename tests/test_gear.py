@@ -0,0 +1,60 @@
+from pathlib import Path
+
+from tests.conftest import DB_PATH, make_activity
+
+USAGE = "SELECT * FROM gear_usage ORDER BY gear_id"
+
+
+def test_incremental_gear_usage_matches_a_rebuild(write_export, run_load, query):
+    write_export(
+        [
+            make_activity(1, gear_id="g1"),
+            make_activity(2, gear_id="g1", distance=12000.0, moving_time=3600),
+            make_activity(3, gear_id="b1", sport_type="Ride", distance=40000.0),
+        ]
+    )
+    extra = write_export(
+        [make_activity(4, gear_id="g2")], name="athlete_2026-01-02_export.json"
+    )
+    run_load()
+
+    # Move a run to other shoes, correct a ride's distance, drop a file
+    write_export(
+        [
+            make_activity(1, gear_id="g1"),
+            make_activity(2, gear_id="g2", distance=12000.0, moving_time=3600),
+            make_activity(3, gear_id="b1", sport_type="Ride", distance=45000.0),
+        ]
+    )
+    extra.unlink()
+    run_load()
+    incremental = query(USAGE)
+
+    assert incremental == [
+        ("b1", 1, 45000.0, 3000, 50.0),
+        ("g1", 1, 10000.0, 3000, 50.0),
+        ("g2", 1, 12000.0, 3600, 50.0),
+    ]
+    Path(DB_PATH).unlink()
+    run_load()
+    assert query(USAGE) == incremental
+
+
+def test_threshold_alert_is_raised_once(write_export, run_load, query):
+    write_export([make_activity(i, gear_id="g1", distance=200_000.0) for i in (1, 2)])
+    run_load()
+    assert query("SELECT * FROM gear_alerts") == []
+
+    write_export([make_activity(i, gear_id="g1", distance=200_000.0) for i in (1, 2, 3)])
+    run_load()
+    assert query("SELECT gear_id, threshold_km, distance_km FROM gear_alerts") == [
+        ("g1", 500, 600.0)
+    ]
+
+    # Still short of 700 km: nothing new
+    write_export(
+        [make_activity(i, gear_id="g1", distance=200_000.0) for i in (1, 2, 3)]
+        + [make_activity(4, gear_id="g1", distance=50_000.0)]
+    )
+    run_load()
+    assert query("SELECT gear_id, threshold_km FROM gear_alerts") == [("g1", 500)]
@@ -0,0 +1,49 @@
+import duckdb
+
+from tests.conftest import make_activity
+
+
+def test_zone_seconds_from_stream(write_export, write_stream, run_load, query):
+    write_export([make_activity(1)])
+    # Each sample counts until the next one: 120 bpm (zone 1) for 10 s,
+    # 140 bpm (zone 2) for 10 s, 150 bpm (zone 3) for 20 s
+    write_stream(
+        1,
+        time=[0, 10, 20, 30, 40],
+        heartrate=[120, 140, 150, 150, 180],
+        moving=[True, True, True, True, True],
+    )
+    run_load()
+
+    assert query("SELECT zone_seconds FROM activity_hr_zones WHERE activity_id = 1") == [
+        ([10, 10, 20, 0, 0],)
+    ]
+
+
+def test_paused_samples_are_ignored(write_export, write_stream, run_load, query):
+    write_export([make_activity(1)])
+    write_stream(
+        1,
+        time=[0, 10, 20, 30],
+        heartrate=[120, 170, 120, 120],
+        moving=[True, False, True, True],
+    )
+    run_load()
+
+    assert query("SELECT zone_seconds FROM activity_hr_zones WHERE activity_id = 1") == [
+        ([20, 0, 0, 0, 0],)
+    ]
+
+
+def test_custom_zones_recompute_cache(write_export, write_stream, run_load, query):
+    write_export([make_activity(1)])
+    write_stream(1, time=[0, 10, 20], heartrate=[140, 140, 140], moving=[True] * 3)
+    run_load()
+    assert query("SELECT zone_seconds FROM activity_hr_zones") == [([0, 20, 0, 0, 0],)]
+
+    conn = duckdb.connect("strava_activities.duckdb")
+    conn.execute("UPDATE hr_zone_thresholds SET min_hr = 135 WHERE zone = 3")
+    conn.close()
+    run_load(force=True)
+
+    assert query("SELECT zone_seconds FROM activity_hr_zones") == [([0, 0, 20, 0, 0],)]
@@ -0,0 +1,78 @@
+import duckdb
+
+from snapshot import published_path
+from tests.conftest import DB_PATH, make_activity
+
+
+def edit(sql):
+    conn = duckdb.connect(str(published_path(DB_PATH)))
+    conn.execute(sql)
+    conn.close()
+
+
+def test_unchanged_inputs_skip_the_load(write_export, run_load, capsys):
+    write_export([make_activity(1)])
+    run_load()
+    stamp = DB_PATH.stat().st_mtime_ns
+    capsys.readouterr()
+
+    run_load()
+    assert "Nothing new to load" in capsys.readouterr().out
+    assert DB_PATH.stat().st_mtime_ns == stamp
+
+
+def test_new_export_is_loaded(write_export, run_load, query):
+    write_export([make_activity(1)])
+    run_load()
+    write_export([make_activity(1), make_activity(2)])
+    run_load()
+
+    assert query("SELECT count(*) FROM activities") == [(2,)]
+
+
+def test_zone_edits_are_picked_up_without_force(
+    write_export, write_stream, run_load, query
+):
+    write_export([make_activity(1)])
+    write_stream(1, time=[0, 10, 20], heartrate=[140, 140, 140], moving=[True] * 3)
+    run_load()
+
+    edit("UPDATE hr_zone_thresholds SET min_hr = 135 WHERE zone = 3")
+    run_load()
+
+    assert query("SELECT zone_seconds FROM activity_hr_zones") == [([0, 0, 20, 0, 0],)]
+
+
+def test_gear_threshold_edits_are_picked_up_without_force(
+    write_export, run_load, query
+):
+    write_export([make_activity(1, gear_id="g1", distance=60_000.0)])
+    run_load()
+    assert query("SELECT * FROM gear_alerts") == []
+
+    edit("INSERT INTO gear_thresholds VALUES ('shoe', 50)")
+    run_load()
+
+    assert query("SELECT gear_id, threshold_km FROM gear_alerts") == [("g1", 50)]
+
+
+def test_dashboard_refresh_publishes_a_new_file(write_export, run_load, query, capsys):
+    write_export([make_activity(1)])
+    run_load()
+
+    # A reader keeps the published file open; the refresh must not touch it
+    reader = duckdb.connect(str(DB_PATH), read_only=True)
+    run_load(dashboard=True)
+    assert "Rebuilt" in capsys.readouterr().out
+    assert not reader.execute(
+        "SELECT count(*) FROM duckdb_tables() WHERE table_name = 'dashboard_metrics'"
+    ).fetchone()[0]
+    reader.close()
+
+    assert query("SELECT metric_type FROM dashboard_metrics") == [("summary",)]
+
+    # The refreshed database still counts as up to date
+    run_load(dashboard=True)
+    out = capsys.readouterr().out
+    assert "Nothing new to load" in out
+    assert "Dashboard already up to date" in out
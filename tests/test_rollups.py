@@ -0,0 +1,91 @@
+import duckdb
+
+from tests.conftest import make_activity
+
+ROLLUP_FROM_ACTIVITIES = """
+    SELECT
+        start_date::DATE as day,
+        sport_type,
+        COALESCE(moving_time > 0, false) as timed,
+        COUNT(*),
+        SUM(distance),
+        SUM(moving_time::DOUBLE * moving_time),
+        MAX(average_heartrate)
+    FROM activities
+    GROUP BY ALL
+    ORDER BY ALL
+"""
+
+ROLLUP_CELLS = """
+    SELECT day, sport_type, timed, activities, distance_sum, moving_time_sumsq, heartrate_max
+    FROM daily_rollup
+    ORDER BY ALL
+"""
+
+
+def test_long_activities_do_not_overflow(write_export, run_load, query):
+    # moving_time * moving_time is past the INTEGER range above 46340 s
+    write_export([make_activity(1, moving_time=50000, elapsed_time=50000)])
+    run_load()
+
+    assert query("SELECT moving_time_sumsq FROM daily_rollup") == [(50000.0**2,)]
+
+
+def test_zero_duration_sessions_are_not_timed(write_export, run_load, query):
+    write_export(
+        [
+            make_activity(1, sport_type="WeightTraining", moving_time=3600),
+            make_activity(2, sport_type="WeightTraining", moving_time=0),
+        ]
+    )
+    run_load()
+
+    assert query(
+        "SELECT timed, activities FROM daily_rollup ORDER BY timed"
+    ) == [(False, 1), (True, 1)]
+
+
+def test_incremental_cells_match_full_rebuild(workspace, write_export, run_load, query):
+    write_export(
+        [
+            make_activity(1, start_date="2026-01-01T08:00:00Z"),
+            make_activity(2, start_date="2026-01-01T18:00:00Z"),
+            make_activity(3, start_date="2026-01-02T08:00:00Z", sport_type="Ride"),
+        ]
+    )
+    run_load()
+
+    # Move one activity to another day and sport, remove the export holding
+    # another, add a new one
+    write_export(
+        [
+            make_activity(4, start_date="2026-01-03T08:00:00Z"),
+        ],
+        name="athlete_2026-01-03_export.json",
+    )
+    run_load()
+    (workspace / "activities" / "athlete_2026-01-03_export.json").unlink()
+    write_export(
+        [
+            make_activity(1, start_date="2026-01-01T08:00:00Z"),
+            make_activity(2, start_date="2026-01-02T18:00:00Z", sport_type="Ride"),
+            make_activity(3, start_date="2026-01-02T08:00:00Z", sport_type="Ride"),
+            make_activity(5, start_date="2026-01-04T08:00:00Z", distance=5000.0),
+        ]
+    )
+    run_load()
+
+    assert query(ROLLUP_CELLS) == query(ROLLUP_FROM_ACTIVITIES)
+    assert query("SELECT COUNT(*) FROM daily_rollup WHERE day = '2026-01-03'") == [(0,)]
+
+
+def test_cube_from_older_databases_is_rebuilt(write_export, run_load, query):
+    write_export([make_activity(1), make_activity(2, sport_type="Ride")])
+    run_load()
+    conn = duckdb.connect("strava_activities.duckdb")
+    conn.execute("ALTER TABLE daily_rollup DROP COLUMN timed")
+    conn.close()
+
+    run_load(force=True)
+
+    assert query(ROLLUP_CELLS) == query(ROLLUP_FROM_ACTIVITIES)
@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+
+from dashboard import ARTIFACTS
+from serve import SNAPSHOTS_DIR, QueryServer
+from tests.conftest import DB_PATH, make_activity
+
+
+@pytest.fixture
+def loaded(write_export, write_stream, run_load):
+    write_export(
+        [
+            make_activity(1),
+            make_activity(2, start_date="2026-01-02T08:00:00Z", sport_type="Ride"),
+        ]
+    )
+    write_stream(1, time=[0, 10, 20], heartrate=[140, 150, 160], moving=[True] * 3)
+    run_load()
+
+
+def serve(check):
+    """Run `check(client, server)` against a server on the published database."""
+
+    async def run():
+        server = QueryServer(DB_PATH, pool_size=2, poll_interval=3600)
+        assert await server.refresh()
+        async with TestClient(TestServer(server.create_app())) as client:
+            await check(client, server)
+
+    asyncio.run(run())
+
+
+@pytest.mark.parametrize("name", [artifact.name for artifact in ARTIFACTS])
+def test_every_artifact_serves_json(loaded, name):
+    async def check(client, server):
+        response = await client.get(f"/dashboard/{name}")
+        assert response.status == 200, await response.text()
+        body = await response.json()
+        assert body["columns"]
+
+    serve(check)
+
+
+def test_etag_revalidation(loaded):
+    async def check(client, server):
+        response = await client.get("/dashboard/v_weekly_summary")
+        assert response.status == 200
+        etag = response.headers["ETag"]
+
+        response = await client.get(
+            "/dashboard/v_weekly_summary", headers={"If-None-Match": etag}
+        )
+        assert response.status == 304
+
+    serve(check)
+
+
+def test_snapshots_are_private_and_removed_on_shutdown(loaded):
+    async def check(client, server):
+        other = QueryServer(DB_PATH, pool_size=1, poll_interval=3600)
+        assert await other.refresh()
+        assert other.pool.path != server.pool.path
+        await other.pool.close()
+        assert server.pool.path.exists()
+
+    serve(check)
+    assert list(SNAPSHOTS_DIR.iterdir()) == []
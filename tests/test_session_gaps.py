@@ -0,0 +1,51 @@
+from datetime import datetime, timedelta
+
+from tests.conftest import make_activity
+
+ROLLING = """
+    SELECT activity_id, sessions_7d, sessions_28d, same_sport_sessions_7d, hours_7d
+    FROM session_gaps
+    ORDER BY start_date
+"""
+
+
+def session(activity_id, local_start, **fields):
+    """An activity starting at a local time, one hour ahead of UTC."""
+    local = datetime.fromisoformat(local_start)
+    return make_activity(
+        activity_id,
+        start_date=(local - timedelta(hours=1)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        start_date_local=local.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        **fields,
+    )
+
+
+def test_later_sessions_on_the_same_day_are_not_counted(write_export, run_load, query):
+    write_export(
+        [
+            session(1, "2025-12-30T09:00:00"),
+            session(2, "2026-01-01T08:00:00"),
+            session(3, "2026-01-01T18:00:00", sport_type="Ride", moving_time=3600),
+        ]
+    )
+    run_load()
+
+    assert query(ROLLING) == [
+        (1, 1, 1, 1, 3000 / 3600),
+        # The first session of the day sees the earlier run only
+        (2, 2, 2, 2, 6000 / 3600),
+        (3, 3, 3, 1, 9600 / 3600),
+    ]
+
+
+def test_windows_cover_local_calendar_days(write_export, run_load, query):
+    write_export(
+        [
+            session(1, "2025-12-25T23:00:00"),
+            session(2, "2026-01-01T08:00:00"),
+        ]
+    )
+    run_load()
+
+    # 2025-12-25 is seven days before 2026-01-01, so outside the 7-day window
+    assert [row[:3] for row in query(ROLLING)] == [(1, 1, 1), (2, 1, 2)]
@@ -0,0 +1,80 @@
+import random
+
+from tests.conftest import make_activity
+
+# Brute-force k nearest neighbours of each target, for comparison with the index
+EXACT = """
+    SELECT
+        t.activity_id,
+        list(
+            f.activity_id ORDER BY array_distance(f.features, t.features), f.activity_id
+        )[:?]
+    FROM activity_features t
+    JOIN activity_features f
+        ON f.sport_type = t.sport_type AND f.activity_id != t.activity_id
+    WHERE t.activity_id IN (SELECT UNNEST(?))
+    GROUP BY t.activity_id
+"""
+
+
+def runs(count, seed=7, start=1):
+    """Runs of varied distance, pace and effort."""
+    rng = random.Random(seed)
+    activities = []
+    for activity_id in range(start, start + count):
+        distance = rng.uniform(3000, 30000)
+        speed = rng.uniform(2.2, 4.5)
+        activities.append(
+            make_activity(
+                activity_id,
+                distance=round(distance, 1),
+                moving_time=int(distance / speed),
+                average_speed=round(speed, 3),
+                total_elevation_gain=round(rng.uniform(0, 800), 1),
+                average_heartrate=round(rng.uniform(120, 175), 1),
+                max_heartrate=rng.randint(160, 195),
+            )
+        )
+    return activities
+
+
+def recall(query, targets, k, nprobe):
+    exact = dict(query(EXACT, [k, targets]))
+    found = 0
+    for target in targets:
+        rows = query(
+            "SELECT activity_id FROM similar_activities(?, k := ?, nprobe := ?)",
+            [target, k, nprobe],
+        )
+        found += len({row[0] for row in rows} & set(exact[target]))
+    return found / (k * len(targets))
+
+
+def test_probing_every_cluster_is_exact(write_export, run_load, query):
+    write_export(runs(300))
+    run_load()
+    [(clusters,)] = query("SELECT COUNT(*) FROM feature_centroids")
+
+    assert recall(query, list(range(1, 301, 15)), k=10, nprobe=clusters) == 1.0
+
+
+def test_default_probes_find_most_neighbours(write_export, run_load, query):
+    write_export(runs(300))
+    run_load()
+
+    assert recall(query, list(range(1, 301, 15)), k=10, nprobe=3) >= 0.8
+
+
+def test_added_activities_are_indexed_without_retraining(
+    write_export, run_load, query
+):
+    write_export(runs(300))
+    run_load()
+    centroids = query("SELECT * FROM feature_centroids ORDER BY ALL")
+
+    write_export(runs(300) + runs(50, seed=8, start=301))
+    run_load()
+
+    assert query("SELECT * FROM feature_centroids ORDER BY ALL") == centroids
+    assert query("SELECT COUNT(*) FROM activity_features WHERE centroid IS NULL") == [(0,)]
+    assert recall(query, list(range(301, 351, 5)), k=10, nprobe=3) >= 0.8
@@ -0,0 +1,64 @@
+import duckdb
+
+from snapshot import KEEP_SNAPSHOTS, current_snapshot, published_path, snapshots_dir
+from tests.conftest import DB_PATH, make_activity
+
+
+def set_zone_3(path, min_hr):
+    conn = duckdb.connect(str(path))
+    conn.execute("UPDATE hr_zone_thresholds SET min_hr = ? WHERE zone = 3", [min_hr])
+    conn.close()
+
+
+def test_snapshot_load_points_current_at_new_file(write_export, run_load, query):
+    write_export([make_activity(1)])
+    run_load(snapshot=True)
+
+    snapshot = current_snapshot(DB_PATH)
+    assert snapshot is not None
+    assert snapshot.parent == snapshots_dir(DB_PATH)
+    assert published_path(DB_PATH) == snapshot
+    assert not DB_PATH.exists()
+    assert query("SELECT id FROM activities") == [(1,)]
+
+
+def test_old_snapshots_are_pruned(write_export, run_load):
+    write_export([make_activity(1)])
+    for _ in range(KEEP_SNAPSHOTS + 2):
+        run_load(snapshot=True, force=True)
+
+    snapshots = sorted(snapshots_dir(DB_PATH).glob("strava_activities_*.duckdb"))
+    assert len(snapshots) == KEEP_SNAPSHOTS
+    assert snapshots[-1] == current_snapshot(DB_PATH)
+
+
+def test_replace_load_starts_from_snapshot_and_retires_current(
+    write_export, run_load, query
+):
+    write_export([make_activity(1)])
+    run_load(snapshot=True)
+    set_zone_3(current_snapshot(DB_PATH), 135)
+
+    write_export([make_activity(1), make_activity(2)])
+    run_load()
+
+    assert current_snapshot(DB_PATH) is None
+    assert published_path(DB_PATH) == DB_PATH
+    assert query("SELECT count(*) FROM activities") == [(2,)]
+    # Persistent tables carry over from the snapshot
+    assert query("SELECT min_hr FROM hr_zone_thresholds WHERE zone = 3") == [(135,)]
+
+
+def test_in_place_load_starts_from_snapshot_and_retires_current(
+    write_export, run_load, query
+):
+    write_export([make_activity(1)])
+    run_load(snapshot=True)
+    set_zone_3(current_snapshot(DB_PATH), 135)
+
+    write_export([make_activity(1), make_activity(2)])
+    run_load(in_place=True)
+
+    assert current_snapshot(DB_PATH) is None
+    assert query("SELECT count(*) FROM activities") == [(2,)]
+    assert query("SELECT min_hr FROM hr_zone_thresholds WHERE zone = 3") == [(135,)]
@@ -0,0 +1,97 @@
+from pathlib import Path
+
+import pytest
+
+from tests.conftest import DB_PATH, make_activity
+
+SPLITS = """
+    SELECT split, distance, moving_time, gap_speed, source
+    FROM activity_splits
+    WHERE activity_id = ? AND unit = 'km'
+    ORDER BY split
+"""
+
+
+def steady_stream(write_stream, activity_id, meters, step=30.0, seconds=10):
+    """A flat stream at step / seconds m/s covering `meters`."""
+    samples = int(meters / step) + 1
+    write_stream(
+        activity_id,
+        time=[i * seconds for i in range(samples)],
+        distance=[i * step for i in range(samples)],
+        altitude=[100.0] * samples,
+        heartrate=[150] * samples,
+        moving=[True] * samples,
+    )
+
+
+def test_km_splits_are_exactly_1000_m(write_export, write_stream, run_load, query):
+    write_export([make_activity(1)])
+    # 30 m samples never land on a km boundary, so every split is interpolated
+    steady_stream(write_stream, 1, 2520)
+    run_load()
+
+    splits = query(SPLITS, [1])
+    assert [split for split, *_ in splits] == [1, 2, 3]
+    assert [distance for _, distance, *_ in splits] == pytest.approx([1000, 1000, 520])
+    assert [moving_time for _, _, moving_time, *_ in splits] == [333, 333, 173]
+    assert all(gap == pytest.approx(3.0) for *_, gap, _ in splits)
+
+
+def test_paused_distance_is_left_out_of_gap(write_export, write_stream, run_load, query):
+    write_export([make_activity(1)])
+    write_stream(
+        1,
+        time=list(range(0, 110, 10)),
+        distance=[30.0 * i for i in range(11)],
+        altitude=[100.0] * 11,
+        moving=[True] * 5 + [False] + [True] * 5,
+    )
+    run_load()
+
+    [(_, distance, moving_time, gap_speed, _)] = query(SPLITS, [1])
+    assert (distance, moving_time) == (300.0, 90)
+    assert gap_speed == pytest.approx(3.0)
+
+
+def test_strava_splits_without_stream(write_export, write_stream, run_load, query):
+    strava_split = {
+        "distance": 1000.0,
+        "elapsed_time": 310,
+        "elevation_difference": 2.0,
+        "moving_time": 300,
+        "split": 1,
+        "average_heartrate": 150.0,
+        "average_grade_adjusted_speed": 3.4,
+    }
+    write_export([make_activity(1, splits_metric=[strava_split])])
+    run_load()
+    assert query(SPLITS, [1]) == [(1, 1000.0, 300, 3.4, "strava")]
+
+    # A stream, once fetched, takes over
+    steady_stream(write_stream, 1, 1000)
+    run_load()
+    assert {source for *_, source in query(SPLITS, [1])} == {"stream"}
+
+
+def test_incremental_splits_match_a_rebuild(
+    write_export, write_stream, run_load, query
+):
+    write_export([make_activity(1), make_activity(2), make_activity(3)])
+    for activity_id in [1, 2, 3]:
+        steady_stream(write_stream, activity_id, 2000)
+    run_load()
+
+    # Change one stream, drop another and add a new activity
+    steady_stream(write_stream, 1, 3500, step=25.0)
+    Path("activities/streams/3.json").unlink()
+    write_export([make_activity(4)], name="athlete_2026-01-02_export.json")
+    steady_stream(write_stream, 4, 1200)
+    run_load()
+    all_splits = "SELECT * FROM activity_splits ORDER BY ALL"
+    incremental = query(all_splits)
+
+    Path(DB_PATH).unlink()
+    run_load(force=True)
+    assert incremental == query(all_splits)
+    assert {row[0] for row in incremental} == {1, 2, 4}
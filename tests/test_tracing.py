@@ -0,0 +1,18 @@
+import duckdb
+
+from tracing import Tracer
+
+
+def test_slow_query_profile_is_attached_and_cleaned_up():
+    tracer = Tracer(enabled=True, slow_query_ms=0)
+    conn = duckdb.connect()
+    tracer.profile_connection(conn)
+    tracer.execute(conn, "create", "CREATE TABLE t AS SELECT range AS i FROM range(1000)")
+
+    profile_file = tracer._profile_file
+    assert profile_file.exists()
+    assert "profile" in tracer.spans[-1].attrs
+
+    tracer.close()
+    assert not profile_file.exists()
+    assert not profile_file.parent.exists()
@@ -0,0 +1,236 @@
+"""
+Pipeline Tracing
+
+Lightweight spans for the fetch -> analyze pipeline. Each span records wall
+time plus counters such as rows, bytes and retries, and nests under the span
+that was active when it started (async-safe through contextvars).
+
+Configured through environment variables:
+
+    STRAVA_TRACE=1                print a per-stage summary table at exit
+    STRAVA_TRACE_FILE=trace.json  write a Chrome trace (chrome://tracing, Perfetto)
+    STRAVA_PROFILE_SLOW_MS=500    capture EXPLAIN ANALYZE for slower queries
+"""
+
+import atexit
+import functools
+import inspect
+import itertools
+import json
+import os
+import tempfile
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+# Counters that are summed per stage in the summary table
+COUNTERS = ["rows", "bytes", "retries"]
+
+
+class Span:
+    """A timed pipeline stage with free-form attributes."""
+
+    def __init__(self, span_id: int, name: str, parent: Optional[int], **attrs: Any):
+        self.id = span_id
+        self.name = name
+        self.parent = parent
+        self.attrs: Dict[str, Any] = dict(attrs)
+        self.start = time.perf_counter()
+        self.duration: Optional[float] = None
+
+    def set(self, **attrs: Any) -> None:
+        """Attach or overwrite attributes."""
+        self.attrs.update(attrs)
+
+    def add(self, counter: str, value: int = 1) -> None:
+        """Increment a numeric attribute."""
+        self.attrs[counter] = self.attrs.get(counter, 0) + value
+
+
+class Tracer:
+    """Collects spans and reports them as a summary table or JSON trace."""
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        trace_file: Optional[str] = None,
+        slow_query_ms: Optional[float] = None,
+    ):
+        self.print_summary = enabled
+        self.enabled = enabled or bool(trace_file)
+        self.trace_file = trace_file
+        self.slow_query_ms = slow_query_ms
+        self.spans: List[Span] = []
+        self.origin = time.perf_counter()
+        self._ids = itertools.count()
+        self._current: ContextVar[Optional[Span]] = ContextVar("span", default=None)
+        self._profile_dir: Optional[tempfile.TemporaryDirectory] = None
+        self._profile_file: Optional[Path] = None
+
+    @classmethod
+    def from_env(cls) -> "Tracer":
+        """Build a tracer from the STRAVA_TRACE* environment variables."""
+        slow_ms = os.getenv("STRAVA_PROFILE_SLOW_MS")
+        return cls(
+            enabled=os.getenv("STRAVA_TRACE", "") not in ("", "0"),
+            trace_file=os.getenv("STRAVA_TRACE_FILE") or None,
+            slow_query_ms=float(slow_ms) if slow_ms else None,
+        )
+
+    @contextmanager
+    def span(self, name: str, **attrs: Any) -> Iterator[Span]:
+        """Time the enclosed block as a child of the current span."""
+        parent = self._current.get()
+        span = Span(next(self._ids), name, parent.id if parent else None, **attrs)
+        token = self._current.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.set(error=type(e).__name__)
+            raise
+        finally:
+            span.duration = time.perf_counter() - span.start
+            self._current.reset(token)
+            if self.enabled:
+                self.spans.append(span)
+
+    def annotate(self, **attrs: Any) -> None:
+        """Attach attributes to the current span, if any."""
+        span = self._current.get()
+        if span is not None:
+            span.set(**attrs)
+
+    def traced(self, name: str) -> Callable:
+        """Decorator running a function or coroutine inside a span."""
+
+        def decorator(func: Callable) -> Callable:
+            if inspect.iscoroutinefunction(func):
+
+                @functools.wraps(func)
+                async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                    with self.span(name):
+                        return await func(*args, **kwargs)
+
+                return async_wrapper
+
+            @functools.wraps(func)
+            def wrapper(*args: Any, **kwargs: Any) -> Any:
+                with self.span(name):
+                    return func(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def profile_connection(self, conn: Any) -> None:
+        """Turn on DuckDB JSON profiling when slow query capture is configured."""
+        if self.slow_query_ms is None or not self.enabled:
+            return
+        if self._profile_dir is None:
+            self._profile_dir = tempfile.TemporaryDirectory(prefix="strava_profile_")
+            self._profile_file = Path(self._profile_dir.name) / "profile.json"
+        conn.execute("SET enable_profiling = 'json'")
+        conn.execute(f"SET profiling_output = '{self._profile_file}'")
+
+    def execute(
+        self,
+        conn: Any,
+        stage: str,
+        sql: str,
+        params: Optional[List[Any]] = None,
+        **attrs: Any,
+    ) -> Any:
+        """Run a DuckDB statement in a span, attaching its profile if slow."""
+        with self.span(stage, **attrs) as span:
+            result = conn.execute(sql, params) if params is not None else conn.execute(sql)
+
+        if (
+            self._profile_file
+            and span.duration * 1000 >= self.slow_query_ms
+            and self._profile_file.exists()
+        ):
+            with open(self._profile_file) as f:
+                span.set(profile=json.load(f))
+        return result
+
+    def summary(self) -> str:
+        """Per-stage table of calls, wall time and counters."""
+        stages: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+        for span in self.spans:
+            stage = stages[span.name]
+            stage["calls"] += 1
+            stage["total"] += span.duration or 0
+            stage["max"] = max(stage["max"], span.duration or 0)
+            for counter in COUNTERS:
+                stage[counter] += span.attrs.get(counter) or 0
+
+        lines = [
+            (
+                f"{'Stage':<48} {'Calls':>6} {'Total s':>9} {'Max s':>8} "
+                f"{'Rows':>10} {'Bytes':>12} {'Retries':>7}"
+            ),
+            "-" * 106,
+        ]
+        ordered = sorted(stages.items(), key=lambda item: item[1]["total"], reverse=True)
+        for name, stage in ordered:
+            lines.append(
+                f"{name[:48]:<48} {int(stage['calls']):>6} {stage['total']:>9.3f} "
+                f"{stage['max']:>8.3f} {int(stage['rows']):>10} "
+                f"{int(stage['bytes']):>12} {int(stage['retries']):>7}"
+            )
+
+        profiled = [span for span in self.spans if "profile" in span.attrs]
+        if profiled:
+            lines.append(f"\n{len(profiled)} slow statements profiled:")
+            for span in sorted(profiled, key=lambda s: s.duration or 0, reverse=True):
+                profile = span.attrs["profile"]
+                lines.append(
+                    f"   {span.name}: {span.duration:.3f}s, "
+                    f"{profile.get('cumulative_rows_scanned', 0)} rows scanned"
+                )
+            if not self.trace_file:
+                lines.append("   Set STRAVA_TRACE_FILE to keep the full query plans")
+        return "\n".join(lines)
+
+    def to_chrome_trace(self) -> Dict[str, Any]:
+        """Spans in the Chrome trace event format."""
+        events = [
+            {
+                "name": span.name,
+                "ph": "X",
+                "ts": (span.start - self.origin) * 1e6,
+                "dur": (span.duration or 0) * 1e6,
+                "pid": os.getpid(),
+                "tid": 0,
+                "args": {"id": span.id, "parent": span.parent, **span.attrs},
+            }
+            for span in self.spans
+        ]
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def close(self) -> None:
+        """Remove the DuckDB profiling output, if any was written."""
+        if self._profile_dir is not None:
+            self._profile_dir.cleanup()
+            self._profile_dir = None
+            self._profile_file = None
+
+    def report(self) -> None:
+        """Print the summary and/or write the JSON trace, as configured."""
+        self.close()
+        if not self.spans:
+            return
+        if self.trace_file:
+            with open(Path(self.trace_file), "w") as f:
+                json.dump(self.to_chrome_trace(), f, default=str)
+            print(f"Trace written to {self.trace_file}")
+        if self.print_summary:
+            print("\nPipeline timings")
+            print(self.summary())
+
+
+tracer = Tracer.from_env()
+atexit.register(tracer.report)